@@ -0,0 +1,184 @@
+#
+# Benchmark suite for model construction, solving and plotting
+#
+# Run from the repository root with ``python benchmarks/solver.py``. Each case is timed over several runs, and
+# its median time, number of right-hand side evaluations and peak traced memory are compared with the baseline
+# in solver_baseline.json. The script exits with status 1 if any case is slower, makes more evaluations or uses
+# more memory than the baseline by more than the allowed threshold. Use ``--update`` to record a new baseline,
+# and ``--filter`` to run only the cases whose name contains a string.
+#
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "solver_baseline.json")
+sys.path.insert(0, ROOT)
+
+from pkmodel.intravenous import Intravenous  # noqa: E402
+from pkmodel.params import ModelParams  # noqa: E402
+from pkmodel.subcutaneous import Subcutaneous  # noqa: E402
+from pkmodel.plot import plot  # noqa: E402
+
+
+MODELS = {"iv": Intravenous, "sc": Subcutaneous}
+METHODS = ["RK45", "LSODA", "analytic"]
+
+# Each solve varies one setting of the base case at a time: 1 h with cyclic dosing, 6 s steps and 2 peripheries
+BASE = {"run_time": 1.0, "time_step_length": 6.0, "num_peripheries": 2, "dose_on": 50, "dose_off": 100}
+VARIATIONS = {
+    "base": {},
+    "24h": {"run_time": 24.0},
+    "step60s": {"time_step_length": 60.0},
+    "16p": {"num_peripheries": 16},
+    "bolus": {"dose_on": 0, "dose_off": 0},
+}
+
+
+def model_parameters(**settings) -> dict:
+    """Constructor arguments for a benchmark model, with made-up volumes and rates for every periphery
+    """
+    parameters = dict(BASE, **settings)
+    P = parameters["num_peripheries"]
+    parameters["V_p_list"] = [1.0 + 0.5 * i for i in range(P)]
+    parameters["Q_p_list"] = [2.0 / (1 + i) for i in range(P)]
+    return parameters
+
+
+def cases() -> dict:
+    """The benchmark cases, by name. Each is a function which runs the case once and returns its number of
+    right-hand side evaluations
+    """
+    def solve(model_type, method, settings):
+        def run():
+            model = model_type(**model_parameters(**settings))
+            model.solve_equations(method=method)
+            return model.stats.nfev
+        return run
+
+    def construct(model_type, P):
+        def run():
+            for _ in range(100):
+                model_type(**model_parameters(num_peripheries=P))
+            return 0
+        return run
+
+    def construct_columns(model_type, P):
+        def run():
+            parameters = model_parameters(num_peripheries=P)
+            ModelParams(model_type, clearance_rate=[1.0] * 100, num_peripheries=P, V_p_list=parameters["V_p_list"],
+                        Q_p_list=parameters["Q_p_list"], run_time=parameters["run_time"],
+                        time_step_length=parameters["time_step_length"], dose_on=parameters["dose_on"],
+                        dose_off=parameters["dose_off"]).models()
+            return 0
+        return run
+
+    solutions = {
+        "base": Intravenous(**model_parameters()).solve_equations(method="analytic"),
+        "24h1s": Intravenous(**model_parameters(run_time=24.0, time_step_length=1.0)).solve_equations(
+            method="analytic"),
+    }
+    folder = tempfile.mkdtemp()
+
+    def draw(solution):
+        def run():
+            plot(solution, folder, "benchmark", headless=True)
+            return 0
+        return run
+
+    benchmarks = {}
+    for model_name, model_type in MODELS.items():
+        for P in [0, 2, 16]:
+            benchmarks["construct/{}/{}p x100".format(model_name, P)] = construct(model_type, P)
+            benchmarks["construct/{}/{}p params x100".format(model_name, P)] = construct_columns(model_type, P)
+        for method in METHODS:
+            for variation, settings in VARIATIONS.items():
+                name = "solve/{}/{}/{}".format(model_name, method, variation)
+                benchmarks[name] = solve(model_type, method, settings)
+    for variation, solution in solutions.items():
+        benchmarks["plot/iv/" + variation] = draw(solution)
+    return benchmarks
+
+
+def measure(run, repeats: int) -> dict:
+    """The median time (s), the number of right-hand side evaluations and the peak traced memory (bytes) of a
+    case. A first untimed run loads any lazily imported modules, and memory is traced in a separate run, as
+    tracing slows the code down
+    """
+    run()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        nfev = run()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"time": statistics.median(times), "nfev": nfev, "peak_memory": peak}
+
+
+def regressions(name: str, result: dict, reference: dict, threshold: float, slack: float) -> list[str]:
+    """The measures of a case which are worse than the baseline by more than the threshold
+    """
+    failures = []
+    if result["time"] > threshold * reference["time"] + slack:
+        failures.append("{} time regressed from {:.2f} ms to {:.2f} ms".format(
+            name, 1000 * reference["time"], 1000 * result["time"]))
+    if result["nfev"] > threshold * reference["nfev"]:
+        failures.append("{} RHS evaluations regressed from {} to {}".format(name, reference["nfev"], result["nfev"]))
+    if result["peak_memory"] > threshold * reference["peak_memory"] + 2 ** 16:
+        failures.append("{} peak memory regressed from {:.0f} kB to {:.0f} kB".format(
+            name, reference["peak_memory"] / 1024, result["peak_memory"] / 1024))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite for pkmodel")
+    parser.add_argument("--repeats", type=int, default=5, help="number of timed runs per case")
+    parser.add_argument("--threshold", type=float, default=1.5, help="allowed slowdown factor over the baseline")
+    parser.add_argument("--slack", type=float, default=0.005, help="allowed absolute slowdown (s) over the baseline")
+    parser.add_argument("--filter", default="", help="only run the cases whose name contains this string")
+    parser.add_argument("--update", action="store_true", help="record the measured results as the new baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as file:
+            baseline = json.load(file)
+
+    measured, failures = {}, []
+    for name, run in cases().items():
+        if args.filter not in name:
+            continue
+        result = measure(run, args.repeats)
+        measured[name] = result
+
+        line = "{:<32} {:9.2f} ms {:8d} RHS {:9.0f} kB".format(
+            name, 1000 * result["time"], result["nfev"], result["peak_memory"] / 1024)
+        reference = baseline.get(name)
+        if reference is not None and not args.update:
+            line += "   (baseline {:.2f} ms)".format(1000 * reference["time"])
+            failures.extend(regressions(name, result, reference, args.threshold, args.slack))
+        print(line)
+
+    if args.update:
+        baseline.update(measured)
+        with open(BASELINE, "w") as file:
+            json.dump(baseline, file, indent=4, sort_keys=True)
+            file.write("\n")
+
+    for failure in failures:
+        print("FAIL: " + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#
+# Startup-time benchmark for the pkmodel library and command line
+#
+# Run from the repository root with ``python benchmarks/startup.py``. Each command is timed in fresh
+# interpreters, and the median time on top of a bare interpreter start is compared with the baseline in
+# startup_baseline.json. The script exits with status 1 if any command is slower than the baseline by more
+# than the allowed threshold, or if a command loads matplotlib or scipy.integrate. Use ``--update`` to
+# record a new baseline.
+#
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "startup_baseline.json")
+
+# Modules which must only be imported once something is solved or plotted
+HEAVY_MODULES = ["matplotlib", "scipy.integrate"]
+
+COMMANDS = {
+    "import pkmodel": [sys.executable, "-c", "import pkmodel"],
+    "import pkmodel.main": [sys.executable, "-c", "import pkmodel.main"],
+    "simulation.py --help": [sys.executable, os.path.join(ROOT, "pkmodel", "simulation.py"), "--help"],
+}
+
+
+def time_command(command: list[str], repeats: int) -> float:
+    """The median wall time (s) of running a command in a fresh interpreter
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def heavy_modules_loaded(module: str) -> list[str]:
+    """The heavy modules which are loaded by importing `module`
+    """
+    code = "import sys, {}; print(','.join(m for m in {} if m in sys.modules))".format(module, HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return [name for name in output.stdout.strip().split(",") if name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-time benchmark for pkmodel")
+    parser.add_argument("--repeats", type=int, default=11, help="number of timed runs per command")
+    parser.add_argument("--threshold", type=float, default=1.5, help="allowed slowdown factor over the baseline")
+    parser.add_argument("--slack", type=float, default=0.02, help="allowed absolute slowdown (s) over the baseline")
+    parser.add_argument("--update", action="store_true", help="record the measured times as the new baseline")
+    args = parser.parse_args()
+
+    failures = []
+    for module in ["pkmodel", "pkmodel.main", "pkmodel.sweep"]:
+        loaded = heavy_modules_loaded(module)
+        if loaded:
+            failures.append("import {} loads {}".format(module, ", ".join(loaded)))
+
+    interpreter = time_command([sys.executable, "-c", "pass"], args.repeats)
+    measured = {name: time_command(command, args.repeats) - interpreter for name, command in COMMANDS.items()}
+
+    if args.update:
+        with open(BASELINE, "w") as file:
+            json.dump(measured, file, indent=4, sort_keys=True)
+            file.write("\n")
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as file:
+            baseline = json.load(file)
+
+    for name, seconds in measured.items():
+        reference = baseline.get(name)
+        line = "{:<24} {:8.1f} ms".format(name, 1000 * seconds)
+        if reference is not None:
+            line += "   (baseline {:.1f} ms)".format(1000 * reference)
+            if seconds > args.threshold * reference + args.slack:
+                message = "{} regressed from {:.1f} ms to {:.1f} ms"
+                failures.append(message.format(name, 1000 * reference, 1000 * seconds))
+        print(line)
+
+    for failure in failures:
+        print("FAIL: " + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,3 +9,8 @@ from .version_info import VERSION_INT, VERSION  # noqa
 
 # Import main classes
 from .model import Model    # noqa
+from .intravenous import Intravenous    # noqa
+from .subcutaneous import Subcutaneous    # noqa
+from .dosing import Bolus, Infusion, DosingSchedule    # noqa
+from .params import ModelParams    # noqa
+from .continuation import SolverState    # noqa
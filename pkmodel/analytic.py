@@ -0,0 +1,175 @@
+#
+# Closed-form solver for linear compartment models
+#
+import numpy as np
+from pkmodel.dosing import DosingSchedule
+
+
+class LinearPropagator:
+    """Exact propagator for the linear system dy/dt = A y + b u, where the dosing rate u is constant
+    over each dosing segment.
+
+    The system matrix is diagonalised once, after which the state at any number of time offsets is
+    evaluated with array operations. If the eigenvector matrix is (nearly) singular, which happens when
+    two compartments share the same elimination rate, the matrix exponential of the augmented system
+    is used instead. For a stack of system matrices this choice is made for each matrix separately.
+    """
+
+    def __init__(self, A: np.ndarray, b: np.ndarray, cond_limit: float = 1e8):
+        """
+        :param A: The system matrix, of shape (..., n, n)
+        :param b: The vector through which the dosing rate enters the system, of shape (..., n)
+        :param cond_limit: The largest eigenvector condition number for which the eigendecomposition is used
+        """
+        self.A = np.asarray(A, dtype=float)
+        self.b = np.broadcast_to(np.asarray(b, dtype=float), self.A.shape[:-1])
+
+        eigenvalues, V = np.linalg.eig(self.A)
+        self._use_expm = ~(np.linalg.cond(V) < cond_limit)
+
+        # Matrices without a usable eigendecomposition get identity eigenvectors, so that the modal
+        # path stays finite for them while their values are taken from the matrix exponential
+        V[self._use_expm] = np.eye(self.A.shape[-1])
+        eigenvalues[self._use_expm] = 0.0
+        self.eigenvalues, self.V = eigenvalues, V
+        self.V_inv = np.linalg.inv(V)
+        self._b_modal = np.einsum("...ij,...j->...i", self.V_inv, self.b)
+
+    @property
+    def diagonalisable(self) -> bool:
+        """Whether the propagator uses the eigendecomposition rather than the matrix exponential for every matrix
+        """
+        return not self._use_expm.any()
+
+    def evaluate(self, y0: np.ndarray, rate, s: np.ndarray) -> np.ndarray:
+        """Evaluate the state at time offsets `s` from a state `y0`, with a constant dosing rate
+
+        :param y0: The state at offset zero, of shape (..., n)
+        :param rate: The constant dosing rate, a float or an array of shape (...)
+        :param s: A 1D numpy array of non-negative time offsets (h)
+        :return: The states at each offset, of shape (..., n, len(s))
+        """
+        s = np.asarray(s, dtype=float)
+        rate = np.asarray(rate, dtype=float)[..., None]
+
+        if self._use_expm.all():
+            return self._evaluate_expm(self.A, self.b, y0, rate, s)
+
+        # In modal coordinates z = V^-1 y the system decouples into scalar equations
+        # dz/dt = lambda z + d u, with the solution z(s) = exp(lambda s) z0 + s phi_1(lambda s) d u
+        z0 = np.einsum("...ij,...j->...i", self.V_inv, y0)
+        x = self.eigenvalues[..., :, None] * s
+        z = np.exp(x) * z0[..., None] + s * _phi_1(x) * (self._b_modal * rate)[..., None]
+        y = np.einsum("...ij,...jk->...ik", self.V, z)
+        y = y.real if np.iscomplexobj(y) else y
+
+        if self._use_expm.any():
+            batch = y.shape[:-2]
+            mask = np.broadcast_to(self._use_expm, batch)
+            y[mask] = self._evaluate_expm(np.broadcast_to(self.A, batch + self.A.shape[-2:])[mask],
+                                          np.broadcast_to(self.b, batch + self.b.shape[-1:])[mask],
+                                          np.broadcast_to(y0, batch + self.b.shape[-1:])[mask],
+                                          np.broadcast_to(rate, batch + (1,))[mask], s)
+        return y
+
+    def step(self, y0: np.ndarray, rate, h: float) -> np.ndarray:
+        """Advance a state `y0` by a time `h` with a constant dosing rate
+
+        :return: The state after the step, of shape (..., n)
+        """
+        return self.evaluate(y0, rate, np.array([h]))[..., 0]
+
+    @staticmethod
+    def _evaluate_expm(A, b, y0, rate, s):
+        """Evaluate the state through the matrix exponential of the augmented system
+        [[A, b u], [0, 0]], whose last column carries the constant dosing input
+        """
+        import scipy.linalg
+
+        n = A.shape[-1]
+        batch = np.broadcast_shapes(A.shape[:-2], np.shape(y0)[:-1], rate.shape[:-1])
+
+        M = np.zeros(batch + (n + 1, n + 1))
+        M[..., :n, :n] = A
+        M[..., :n, n] = b * rate
+        z0 = np.zeros(batch + (n + 1,))
+        z0[..., :n] = y0
+        z0[..., n] = 1.0
+
+        # One matrix exponential per offset, evaluated as stacked calls over blocks of offsets
+        y = np.empty(batch + (n, len(s)))
+        for lo in range(0, len(s), _EXPM_BLOCK):
+            block = s[lo:lo + _EXPM_BLOCK]
+            propagators = scipy.linalg.expm(M[..., None, :, :] * block[:, None, None])
+            y[..., lo:lo + len(block)] = np.einsum("...kij,...j->...ik", propagators, z0)[..., :n, :]
+        return y
+
+
+# The number of time offsets for which matrix exponentials are stacked into one call
+_EXPM_BLOCK = 1024
+
+
+def _phi_1(x: np.ndarray) -> np.ndarray:
+    """The function phi_1(x) = (exp(x) - 1) / x, continuously extended with phi_1(0) = 1
+    """
+    small = np.abs(x) < 1e-8
+    safe_x = np.where(small, 1.0, x)
+    return np.where(small, 1.0 + x / 2, np.expm1(safe_x) / safe_x)
+
+
+def solve_linear(propagator: LinearPropagator, y0: np.ndarray, t_eval: np.ndarray,
+                 schedule: DosingSchedule, initial_bolus: bool = True) -> np.ndarray:
+    """Solve a linear compartment model exactly at the times `t_eval`
+
+    The state is propagated from one change of the dosing schedule to the next, with the infusion rate
+    held constant in between. Boluses are applied as jumps in the dosed compartment, so a bolus at time t
+    is included in the solution at t itself.
+
+    :param propagator: The propagator for the model's system matrix and dose vector
+    :param y0: The state at time t_eval[0], of shape (..., n)
+    :param t_eval: A sorted 1D numpy array of times (h) at which to evaluate the solution
+    :param schedule: The dosing schedule
+    :param initial_bolus: Whether the boluses given at t_eval[0] are still to be applied to y0. False when y0
+    already includes them, as when continuing a previous solution
+    :return: The states at each time, of shape (..., n, len(t_eval))
+    """
+    t_eval = np.asarray(t_eval, dtype=float)
+    boundaries, rates, bolus_amounts = schedule.pieces(t_eval[0], t_eval[-1])
+    if not initial_bolus:
+        bolus_amounts[0] = 0.0
+    b = propagator.b
+
+    state = np.array(y0, dtype=float)
+    y = np.empty(state.shape + (len(t_eval),))
+    indices = np.searchsorted(t_eval, boundaries, side="left")
+
+    for i in range(len(boundaries) - 1):
+        state = state + b * bolus_amounts[i]
+        lo, hi = indices[i], indices[i + 1]
+        if hi > lo:
+            y[..., lo:hi] = propagator.evaluate(state, rates[i], t_eval[lo:hi] - boundaries[i])
+        state = propagator.step(state, rates[i], boundaries[i + 1] - boundaries[i])
+
+    state = state + b * bolus_amounts[-1]
+    y[..., indices[-1]:] = state[..., None]
+    return y
+
+
+def solve_recurrence(Phi: np.ndarray, g: np.ndarray) -> np.ndarray:
+    """Solve the affine recurrence x_0 = g_0, x_k = Phi x_(k-1) + g_k for every k at once
+
+    The recurrence is unrolled by recursive doubling: after the pass with stride s = 2^d, each x_k holds the
+    sum of Phi^j g_(k-j) for j < 2s, so log2(K) passes of one matrix product each replace a loop over K steps.
+
+    :param Phi: The one-step transition matrix, of shape (n, n)
+    :param g: The terms added at each step, of shape (K, n)
+    :return: The states x_k, of shape (K, n)
+    """
+    x = np.array(g, dtype=float)
+    power = np.asarray(Phi, dtype=float)
+    stride = 1
+    while stride < len(x):
+        x[stride:] = x[stride:] + x[:-stride] @ power.T
+        power = power @ power
+        stride *= 2
+    return x
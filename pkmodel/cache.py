@@ -0,0 +1,221 @@
+#
+# Solution cache
+#
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+from pkmodel.continuation import SolverState
+from pkmodel.model import Model
+
+
+# The prefix of the arrays holding the final state of a solve in an on-disk entry
+_STATE = "__state__/"
+
+
+def solution_key(model: Model, **solver_settings) -> str:
+    """A content hash which identifies the solution of a model
+
+    :param model: The model to be solved
+    :param solver_settings: The keyword arguments passed to `solve_equations`. Their values must be JSON values,
+    numpy scalars or arrays, or a `SolverState` to start from
+    :return: A hexadecimal sha256 digest of the model type, its validated parameters, its dosing schedule and
+    the solver settings
+    """
+    description = {
+        "model": type(model).__name__,
+        "parameters": model.parameters(),
+        "dosing_schedule": repr(model.dosing_schedule),
+        "solver": solver_settings,
+    }
+    canonical = json.dumps(description, sort_keys=True, separators=(",", ":"), default=_canonical)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _canonical(value):
+    """Converts a solver setting that json cannot encode to a JSON value which identifies it
+    """
+    if isinstance(value, SolverState):
+        return {"t": value.t, "y": hashlib.sha256(value.y.tobytes()).hexdigest(), "shape": value.y.shape,
+                "dosing_time": value.dosing_time, "boluses_applied": value.boluses_applied}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return {"dtype": str(value.dtype), "shape": value.shape, "data": hashlib.sha256(value.tobytes()).hexdigest()}
+    raise TypeError("Solver setting of type {} cannot be part of a cache key".format(type(value).__name__))
+
+
+class SolutionCache:
+    """A memoization layer for `solve_equations`.
+
+    Solutions are kept in memory in least-recently-used order, up to a total number of bytes, and can also be
+    stored as .npz files in a directory, so that identical runs in other processes find them. Cached arrays are
+    read-only, as they are shared by every caller. The final `SolverState` of each solve is cached with it, so a
+    model served from the cache can still be continued, but its `stats` are only updated when it is actually solved.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2 ** 20, directory: str = None):
+        """
+        :param max_bytes: The largest total size (bytes) of the solutions held in memory
+        :param directory: A directory for the on-disk store. Defaults to None, in which case nothing is stored
+        on disk
+        """
+        if not isinstance(max_bytes, int):
+            raise TypeError("max_bytes must be an int")
+        if max_bytes < 0:
+            raise ValueError("max_bytes must be non-negative")
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def stats(self) -> dict:
+        """Counters for monitoring: memory and disk "hits" (where "disk_hits" counts the hits found on disk),
+        "misses", "evictions" from memory, and the current number of "entries" and "bytes" in memory
+        """
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+
+    def solve(self, model: Model, **solver_settings) -> dict:
+        """Returns the solution of a model, solving it only if no identical run has been cached
+
+        :param model: The model to be solved
+        :param solver_settings: Keyword arguments passed to `solve_equations`
+        :return: The dictionary of results from `solve_equations`. The model's `state` is set as by a solve
+        """
+        key = solution_key(model, **solver_settings)
+        entry = self._lookup(key)
+        if entry is None:
+            solution = model.solve_equations(**solver_settings)
+            return self.put(key, solution, model.state)
+        solution, state = entry
+        if state is not None:
+            model.state = SolverState(state.t, state.y, state.dosing_time, state.boluses_applied)
+        return solution
+
+    def get(self, key: str) -> dict:
+        """Looks a solution up in memory, and then on disk
+
+        :param key: The `solution_key` of the solution
+        :return: The solution, or None if it is not cached
+        """
+        entry = self._lookup(key)
+        return None if entry is None else entry[0]
+
+    def _lookup(self, key: str) -> tuple[dict, SolverState]:
+        """Looks a solution and its final state up in memory, and then on disk
+
+        :return: The solution and its final state, which is None if it was not stored, or None if it is not cached
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._entries[key]
+
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            self._insert(key, entry)
+        return entry
+
+    def put(self, key: str, solution: dict, state: SolverState = None) -> dict:
+        """Stores a solution in memory, and on disk if the cache has a directory
+
+        :param key: The `solution_key` of the solution
+        :param solution: The dictionary of results from `solve_equations`
+        :param state: The `state` of the model after the solve, restored on the model when the solution is served
+        :return: The read-only solution, as it is returned by later lookups
+        """
+        entry = ({name: _read_only(value) for name, value in solution.items()}, state)
+        if self.directory is not None:
+            self._save(key, entry)
+        with self._lock:
+            self._insert(key, entry)
+        return entry[0]
+
+    def clear(self) -> None:
+        """Empties the in-memory cache, leaving the on-disk store and the statistics untouched
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _insert(self, key: str, entry: tuple[dict, SolverState]) -> None:
+        """Adds a solution and its final state to the in-memory LRU and evicts the least recently used ones beyond
+        max_bytes. Must be called with the lock held
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        size = _size(entry)
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= _size(evicted)
+            self._stats["evictions"] += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".npz")
+
+    def _load(self, key: str) -> tuple[dict, SolverState]:
+        """Reads a solution and its final state from the on-disk store, or returns None if it is not there
+        """
+        if self.directory is None or not os.path.exists(self._path(key)):
+            return None
+        with np.load(self._path(key)) as stored:
+            solution = {name: _read_only(stored[name]) for name in stored.files if not name.startswith(_STATE)}
+            state = None
+            if _STATE + "y" in stored.files:
+                state = SolverState(stored[_STATE + "t"], stored[_STATE + "y"], stored[_STATE + "dosing_time"],
+                                    bool(stored[_STATE + "boluses_applied"]))
+        return solution, state
+
+    def _save(self, key: str, entry: tuple[dict, SolverState]) -> None:
+        """Writes a solution and its final state to the on-disk store. The file is written under a temporary name
+        and then renamed, so other processes never read a partially written solution
+        """
+        solution, state = entry
+        arrays = dict(solution)
+        if state is not None:
+            arrays.update({_STATE + "t": state.t, _STATE + "y": state.y, _STATE + "dosing_time": state.dosing_time,
+                           _STATE + "boluses_applied": state.boluses_applied})
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".npz.tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                np.savez(file, **arrays)
+            os.replace(temporary, self._path(key))
+        finally:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+
+
+def _size(entry: tuple[dict, SolverState]) -> int:
+    """The number of bytes of a cached solution. Its final state is a few floats, and is not counted
+    """
+    return sum(value.nbytes for value in entry[0].values())
+
+
+def _read_only(value) -> np.ndarray:
+    """A read-only view of an array, so a cached solution cannot be modified by one of its callers
+    """
+    view = np.asarray(value).view()
+    view.flags.writeable = False
+    return view
@@ -4,6 +4,9 @@ class Compartment:
     """Class representing a drug compartment
     """
 
+    # Compartments only hold a few floats, so they are stored in slots rather than a dictionary per instance
+    __slots__ = ("volume",)
+
     def __init__(self, volume):
         """Initialise compartment class
 
@@ -18,6 +21,8 @@ class Central(Compartment):
     """Class representing the central drug compartment
     """
 
+    __slots__ = ()
+
     def __init__(self, volume):
         """Initialise central compartment class
 
@@ -32,6 +37,8 @@ class Periphery(Compartment):
     """Class representing a periphery drug compartment
     """
 
+    __slots__ = ("transition_rate",)
+
     def __init__(self, volume, transition_rate):
         """Initialize periphery compartment class
 
@@ -48,6 +55,8 @@ class Dose(Compartment):
     """Class representing the dose_on compartment
     """
 
+    __slots__ = ("absorption_rate",)
+
     def __init__(self, volume, absorption_rate):
         """Initialise dose_on compartment class
 
@@ -0,0 +1,45 @@
+#
+# Resumable solver state
+#
+import numpy as np
+
+
+class SolverState:
+    """The state of a model at the end of a solve, from which a later solve can continue
+
+    A model's dosing schedule runs in its own time, which starts at 0 when a model is solved from the start. The
+    state records where the checkpoint falls in that time, so that continuing with the same schedule keeps the
+    dosing cycles in phase, while `restart_dosing` starts a new schedule at the checkpoint.
+    """
+
+    def __init__(self, t: float, y: np.ndarray, dosing_time: float, boluses_applied: bool = True):
+        """
+        :param t: The time (h) of the state
+        :param y: A numpy array with the drug amount in each compartment at time t
+        :param dosing_time: The time (h) since the start of the dosing schedule
+        :param boluses_applied: Whether y already includes the boluses given at dosing_time
+        """
+        self.t = float(t)
+        self.y = np.array(y, dtype=float)
+        self.dosing_time = float(dosing_time)
+        self.boluses_applied = boluses_applied
+
+    def dosing_phase(self, schedule) -> float:
+        """The time (h) since the start of the current dosing cycle of a schedule, or since the start of the
+        schedule if it does not repeat
+
+        :param schedule: A `DosingSchedule`
+        """
+        if schedule.period is None:
+            return self.dosing_time
+        return self.dosing_time % schedule.period
+
+    def restart_dosing(self) -> "SolverState":
+        """The same state with the dosing schedule starting again at time t, e.g. to branch into a different
+        regimen from a checkpoint. Any bolus the new schedule gives at its start is then still to be applied
+        """
+        return SolverState(self.t, self.y, 0.0, boluses_applied=False)
+
+    def __repr__(self) -> str:
+        return "SolverState(t={!r}, y={!r}, dosing_time={!r}, boluses_applied={!r})".format(
+            self.t, self.y, self.dosing_time, self.boluses_applied)
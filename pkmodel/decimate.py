@@ -0,0 +1,91 @@
+#
+# Downsampling of solutions for plots and previews
+#
+import numpy as np
+
+
+def minmax_indices(y: np.ndarray, pixels: int) -> np.ndarray:
+    """The indices of the first, last, smallest and largest values of each line in each of `pixels` buckets of
+    consecutive time steps. Drawn at one bucket per pixel column, these points give the same picture as every
+    point, so the peaks and troughs of each dosing cycle are kept exactly
+
+    :param y: The values of one or more lines, of shape (..., T)
+    :param pixels: The number of buckets
+    :return: The sorted indices of the time steps to keep, at most 4 * pixels per line
+    """
+    y = np.asarray(y, dtype=float)
+    T = y.shape[-1]
+    lines = y.reshape(-1, T)
+    size = -(-T // pixels)
+    num_buckets = -(-T // size)
+
+    # The last bucket is padded with its last value, whose index is then clipped back onto the last time step
+    padded = np.pad(lines, ((0, 0), (0, num_buckets * size - T)), mode="edge").reshape(len(lines), num_buckets, size)
+    starts = np.arange(num_buckets) * size
+    smallest = starts + np.argmin(padded, axis=-1)
+    largest = starts + np.argmax(padded, axis=-1)
+    ends = np.minimum(starts + size - 1, T - 1)
+    return np.unique(np.concatenate([starts, ends, np.minimum(smallest, T - 1).ravel(),
+                                     np.minimum(largest, T - 1).ravel()]))
+
+
+def lttb_indices(t: np.ndarray, y: np.ndarray, num_points: int) -> np.ndarray:
+    """The indices chosen by Largest-Triangle-Three-Buckets downsampling of one line. The first and last points
+    are kept, and from each bucket in between the point forming the largest triangle with the previous choice and
+    the mean of the next bucket
+
+    :param t: The time steps, of shape (T,)
+    :param y: The values of the line, of shape (T,)
+    :param num_points: The number of points to keep
+    :return: The sorted indices of the time steps to keep
+    """
+    t, y = np.asarray(t, dtype=float), np.asarray(y, dtype=float)
+    T = len(t)
+    if num_points >= T or num_points < 3:
+        return np.arange(T)
+
+    edges = np.linspace(1, T - 1, num_points - 1).astype(int)
+    selected = np.empty(num_points, dtype=int)
+    selected[0], selected[-1] = 0, T - 1
+    a = 0
+    for i in range(num_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            t_next, y_next = t[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            t_next, y_next = t[-1], y[-1]
+        area = np.abs((t[a] - t_next) * (y[lo:hi] - y[a]) - (t[a] - t[lo:hi]) * (y_next - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def decimate(data: dict, pixels: int = 1000, method: str = "minmax") -> dict:
+    """Downsamples a solution to about the detail that can be seen at a given width, for plots and previews. Every
+    line keeps the points chosen for it, and all lines share the union of those time steps
+
+    :param data: A dictionary like that of `solve_equations`, with the time steps "t" and arrays of shape (..., T)
+    :param pixels: The width in pixels. "minmax" keeps up to 4 points per pixel and line, and "lttb" 1 point per
+    pixel and line
+    :param method: "minmax" to keep the extremes of each pixel column, which draws the same picture as every
+    point, or "lttb" for Largest-Triangle-Three-Buckets, which keeps the overall shape with fewer points
+    :return: A dictionary with the same keys, holding the kept time steps. The data is returned unchanged when it
+    has no more points than the method would keep
+    """
+    if method not in ("minmax", "lttb"):
+        raise ValueError("method must be 'minmax' or 'lttb'")
+    if not isinstance(pixels, int):
+        raise TypeError("pixels must be an int")
+    if pixels < 1:
+        raise ValueError("pixels must be positive")
+
+    t = np.asarray(data["t"])
+    lines = np.concatenate([np.reshape(value, (-1, len(t))) for key, value in data.items() if key != "t"])
+    if len(t) <= (4 if method == "minmax" else 1) * pixels:
+        return data
+
+    if method == "minmax":
+        indices = minmax_indices(lines, pixels)
+    else:
+        indices = np.unique(np.concatenate([lttb_indices(t, line, pixels) for line in lines]))
+    return {key: np.take(value, indices, axis=-1) for key, value in data.items()}
@@ -0,0 +1,201 @@
+#
+# Dosing schedules
+#
+import numpy as np
+
+
+class Bolus:
+    """An instantaneous dose, added to the dosed compartment at a single time
+    """
+
+    def __init__(self, time: float, amount: float):
+        """
+        :param time: The time (h) at which the dose is given
+        :param amount: The amount of drug (ng) given
+        """
+        if not isinstance(time, (float, int)) or not isinstance(amount, (float, int)):
+            raise TypeError("Bolus time and amount must be floats")
+        if time < 0 or amount < 0:
+            raise ValueError("Bolus time and amount must be non-negative")
+        self.time = float(time)
+        self.amount = float(amount)
+
+    def __repr__(self):
+        return "Bolus(time={}, amount={})".format(self.time, self.amount)
+
+
+class Infusion:
+    """A dose administered at a constant rate between a start and a stop time
+    """
+
+    def __init__(self, start: float, stop: float, rate: float):
+        """
+        :param start: The time (h) at which the infusion starts
+        :param stop: The time (h) at which the infusion stops, which may be infinite
+        :param rate: The rate of dosage (ng/h) while the infusion runs
+        """
+        if not all(isinstance(x, (float, int)) for x in (start, stop, rate)):
+            raise TypeError("Infusion start, stop and rate must be floats")
+        if not 0 <= start < stop or rate < 0:
+            raise ValueError("Infusions must start at a non-negative time before they stop, with a non-negative rate")
+        self.start = float(start)
+        self.stop = float(stop)
+        self.rate = float(rate)
+
+    def __repr__(self):
+        return "Infusion(start={}, stop={}, rate={})".format(self.start, self.stop, self.rate)
+
+
+class DosingSchedule:
+    """A schedule of boluses and infusions, which can be repeated in cycles.
+
+    The solvers integrate piecewise between the times at which the schedule changes, applying boluses as
+    jumps in the state, so the dosing never appears as a discontinuity inside an integration step.
+    """
+
+    def __init__(self, doses: list = None, period: float = None, num_cycles: int = None):
+        """
+        :param doses: A list of `Bolus` and `Infusion` objects. With a period, their times are relative to
+        the start of each cycle
+        :param period: The length (h) of a dosing cycle. Defaults to None, in which case the doses are given once
+        :param num_cycles: The number of cycles. Defaults to None, in which case the cycles repeat indefinitely
+        """
+        doses = [] if doses is None else list(doses)
+        if not all(isinstance(dose, (Bolus, Infusion)) for dose in doses):
+            raise TypeError("doses must be a list of Bolus and Infusion objects")
+
+        if period is not None:
+            if not isinstance(period, (float, int)):
+                raise TypeError("period must be a float")
+            if period <= 0:
+                raise ValueError("period must be greater than 0")
+            if any(dose.stop > period if isinstance(dose, Infusion) else dose.time >= period for dose in doses):
+                raise ValueError("Doses must lie within a single dosing cycle")
+            period = float(period)
+        if num_cycles is not None:
+            if not isinstance(num_cycles, int):
+                raise TypeError("num_cycles must be an int")
+            if num_cycles < 0:
+                raise ValueError("num_cycles must be non-negative")
+
+        self.doses = doses
+        self.period = period
+        self.num_cycles = num_cycles
+
+        infusions = [dose for dose in doses if isinstance(dose, Infusion)]
+        boluses = [dose for dose in doses if isinstance(dose, Bolus)]
+        self._starts = np.array([dose.start for dose in infusions])
+        self._stops = np.array([dose.stop for dose in infusions])
+        self._rates = np.array([dose.rate for dose in infusions])
+        self._bolus_times = np.array([dose.time for dose in boluses])
+        self._bolus_amounts = np.array([dose.amount for dose in boluses])
+
+    @classmethod
+    def from_time_steps(cls, dose_per_time_step: float, dose_on: int, dose_off: int,
+                        time_step_length: float) -> "DosingSchedule":
+        """Builds the schedule described by the `Model` dosing parameters. With dose_on = 0 there is a single dose
+        of dose_per_time_step at time 0. Otherwise the drug is administered at a rate of dose_per_time_step for
+        dose_on time steps out of every dose_on + dose_off, continuously if dose_off = 0
+
+        :param dose_per_time_step: The magnitude of dosage
+        :param dose_on: The number of time-steps the drug is administered at a time
+        :param dose_off: The number of time-steps for which drug is not administered at a time
+        :param time_step_length: The length (s) of an individual time-step
+        """
+        if dose_on == 0:
+            return cls([Bolus(0.0, dose_per_time_step)])
+        if dose_off == 0:
+            return cls([Infusion(0.0, float("inf"), dose_per_time_step)])
+
+        time_step_hours = time_step_length / 3600
+        return cls([Infusion(0.0, dose_on * time_step_hours, dose_per_time_step)],
+                   period=(dose_on + dose_off) * time_step_hours)
+
+    def __repr__(self):
+        return "DosingSchedule(doses={}, period={}, num_cycles={})".format(self.doses, self.period, self.num_cycles)
+
+    def _cycle_starts(self, t_start: float, t_end: float, lookback: float = 0.0) -> np.ndarray:
+        """The start times of the cycles that overlap [t_start - lookback, t_end]
+        """
+        if self.period is None:
+            return np.zeros(1)
+        first = max(int(np.floor((t_start - lookback) / self.period)), 0)
+        last = int(np.floor(t_end / self.period))
+        if self.num_cycles is not None:
+            last = min(last, self.num_cycles - 1)
+        return np.arange(first, last + 1) * self.period
+
+    def infusions(self, t_start: float, t_end: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The infusions that overlap the interval [t_start, t_end]
+
+        :return: Numpy arrays of the start times, stop times and rates of each infusion
+        """
+        if len(self._rates) == 0:
+            return np.zeros(0), np.zeros(0), np.zeros(0)
+        lookback = self._stops.max() if self.period is not None else 0.0
+        cycles = self._cycle_starts(t_start, t_end, lookback)[:, None]
+        starts, stops = (cycles + self._starts).ravel(), (cycles + self._stops).ravel()
+        rates = np.broadcast_to(self._rates, (len(cycles), len(self._rates))).ravel()
+        overlap = (starts <= t_end) & (stops > t_start)
+        return starts[overlap], stops[overlap], rates[overlap]
+
+    def boluses(self, t_start: float, t_end: float) -> tuple[np.ndarray, np.ndarray]:
+        """The boluses given in the interval [t_start, t_end]
+
+        :return: Numpy arrays of the time and amount of each bolus
+        """
+        if len(self._bolus_amounts) == 0:
+            return np.zeros(0), np.zeros(0)
+        cycles = self._cycle_starts(t_start, t_end)[:, None]
+        times = (cycles + self._bolus_times).ravel()
+        amounts = np.broadcast_to(self._bolus_amounts, (len(cycles), len(self._bolus_amounts))).ravel()
+        inside = (times >= t_start) & (times <= t_end)
+        return times[inside], amounts[inside]
+
+    def total_dose(self, t_start: float, t_end: float) -> float:
+        """The total amount (ng) given by the boluses and infusions in the interval [t_start, t_end]
+        """
+        starts, stops, rates = self.infusions(t_start, t_end)
+        infused = rates * np.clip(np.minimum(stops, t_end) - np.maximum(starts, t_start), 0.0, None)
+        _, amounts = self.boluses(t_start, t_end)
+        return float(infused.sum() + amounts.sum())
+
+    def event_times(self, t_start: float, t_end: float) -> np.ndarray:
+        """The sorted times strictly inside (t_start, t_end) at which an infusion starts or stops or a bolus is given
+        """
+        starts, stops, _ = self.infusions(t_start, t_end)
+        times, _ = self.boluses(t_start, t_end)
+        events = np.unique(np.concatenate([starts, stops, times]))
+        return events[(events > t_start) & (events < t_end)]
+
+    def pieces(self, t_start: float, t_end: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Splits [t_start, t_end] into pieces over which the dosing rate is constant
+
+        :return: The sorted boundaries of the pieces, starting at t_start and ending at t_end, the infusion rate
+        on each piece, and the total bolus amount given at each boundary
+        """
+        boundaries = np.unique(np.concatenate([[t_start], self.event_times(t_start, t_end), [t_end]]))
+
+        # The rate is constant on each piece, so it is evaluated at the midpoints, away from the edges
+        rates = self.rate((boundaries[:-1] + boundaries[1:]) / 2)
+
+        times, amounts = self.boluses(t_start, t_end)
+        bolus_amounts = np.zeros(len(boundaries))
+        np.add.at(bolus_amounts, np.searchsorted(boundaries, times), amounts)
+        return boundaries, rates, bolus_amounts
+
+    def rate(self, t) -> np.ndarray:
+        """The total infusion rate (ng/h) at the times `t`, with each infusion running on [start, stop)
+        """
+        t = np.asarray(t, dtype=float)
+        if self.period is None:
+            tau, active = t, np.ones(t.shape, dtype=bool)
+        else:
+            cycle = np.floor(t / self.period)
+            tau = t - cycle * self.period
+            active = cycle >= 0
+            if self.num_cycles is not None:
+                active &= cycle < self.num_cycles
+
+        running = (tau[..., None] >= self._starts) & (tau[..., None] < self._stops)
+        return active * (running * self._rates).sum(axis=-1)
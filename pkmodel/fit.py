@@ -0,0 +1,197 @@
+#
+# Parameter estimation from observed concentrations
+#
+import numpy as np
+from pkmodel.analytic import LinearPropagator, solve_linear
+from pkmodel.model import Model
+from pkmodel.subcutaneous import Subcutaneous
+
+
+class FitResult:
+    """The parameters estimated for each subject of a fit
+    """
+
+    def __init__(self, parameters: dict, cost: np.ndarray, converged: np.ndarray, iterations: np.ndarray):
+        """
+        :param parameters: A dictionary with "CL", "V_c" and, for the Subcutaneous model, "k_a" of shape (N,),
+        and "V_p" and "Q_p" of shape (N, num_peripheries)
+        :param cost: Half the sum of squared concentration residuals of each subject, of shape (N,)
+        :param converged: Whether the fit of each subject converged, of shape (N,)
+        :param iterations: The number of iterations taken for each subject, of shape (N,)
+        """
+        self.parameters = parameters
+        self.cost = cost
+        self.converged = converged
+        self.iterations = iterations
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.parameters[key]
+
+
+def fit(model: Model, t: np.ndarray, concentrations: np.ndarray, max_iterations: int = 100,
+        tolerance: float = 1e-10, chunk_size: int = 256) -> FitResult:
+    """Estimates CL, V_c, V_p_list, Q_p_list and, for the Subcutaneous model, k_a from observed central
+    concentrations, for one subject or many subjects at once.
+
+    Every subject is fitted by Levenberg-Marquardt on the logarithms of the parameters, which keeps them
+    positive. All subjects are advanced together with array operations, and the gradients come from the forward
+    sensitivity equations dS/dt = A S + (dA/dp) y, solved exactly with the state through the matrix
+    exponential of the block-triangular system, so no finite differences are needed.
+
+    :param model: A model whose type, number of peripheries and dosing schedule are shared by every subject.
+    Its parameters are the initial guess, and must be positive
+    :param t: The observation times (h), a sorted array of shape (T,)
+    :param concentrations: The observed central concentrations (ng/mL), of shape (T,) or (N, T). Missing
+    observations are NaN
+    :param max_iterations: The largest number of iterations for each subject
+    :param tolerance: The relative decrease in cost or change in log-parameters below which a fit has converged
+    :param chunk_size: The number of subjects propagated together, which bounds the temporary memory
+    :return: A `FitResult`, with a leading subject axis of length N, or 1 for a single subject
+    """
+    t = np.asarray(t, dtype=float)
+    observed = np.atleast_2d(np.asarray(concentrations, dtype=float))
+    if t.ndim != 1 or observed.shape[-1] != len(t) or observed.ndim != 2:
+        raise ValueError("concentrations must have one column for each observation time")
+    if np.any(np.diff(t) < 0) or t[0] < 0:
+        raise ValueError("Observation times must be sorted and non-negative")
+
+    theta = np.log(np.tile(_parameter_vector(model), (len(observed), 1)))
+    damping = np.full(len(observed), 1e-3)
+    converged = np.zeros(len(observed), dtype=bool)
+    iterations = np.zeros(len(observed), dtype=int)
+
+    predicted, sensitivity = _predict(model, theta, t, chunk_size)
+    residuals, jacobian = _residuals(predicted, sensitivity, observed)
+    cost = 0.5 * np.sum(residuals ** 2, axis=-1)
+
+    for _ in range(max_iterations):
+        active = np.flatnonzero(~converged)
+        if len(active) == 0:
+            break
+        iterations[active] += 1
+
+        # Each subject takes a damped Gauss-Newton step on its own normal equations
+        J, r = jacobian[active], residuals[active]
+        H = np.einsum("nti,ntj->nij", J, J)
+        diagonal = np.diagonal(H, axis1=-2, axis2=-1)
+        scale = diagonal + 1e-12 * diagonal.max(axis=-1, keepdims=True)
+        H = H + damping[active, None, None] * np.einsum("ni,ij->nij", scale, np.eye(H.shape[-1]))
+        step = np.linalg.solve(H, -np.einsum("nti,nt->ni", J, r)[..., None])[..., 0]
+
+        trial = theta[active] + step
+        trial_predicted, trial_sensitivity = _predict(model, trial, t, chunk_size)
+        trial_residuals, trial_jacobian = _residuals(trial_predicted, trial_sensitivity, observed[active])
+        trial_cost = 0.5 * np.sum(trial_residuals ** 2, axis=-1)
+
+        accepted = trial_cost < cost[active]
+        done = accepted & (cost[active] - trial_cost <= tolerance * cost[active])
+        done |= np.max(np.abs(step), axis=-1) <= tolerance
+        keep = active[accepted]
+        theta[keep], cost[keep] = trial[accepted], trial_cost[accepted]
+        residuals[keep], jacobian[keep] = trial_residuals[accepted], trial_jacobian[accepted]
+        damping[active] = np.where(accepted, damping[active] / 10, damping[active] * 10)
+        converged[active[done]] = True
+
+    return FitResult(_parameter_dict(model, np.exp(theta)), cost, converged, iterations)
+
+
+def _parameter_vector(model: Model) -> np.ndarray:
+    """The fitted parameters of a model, in the order CL, V_c, V_p_list, Q_p_list and k_a
+    """
+    values = [model.CL, model.V_c] + list(model.V_p_list) + list(model.Q_p_list)
+    if isinstance(model, Subcutaneous):
+        values.append(model.k_a)
+    values = np.array(values, dtype=float)
+    if not np.all(values > 0):
+        raise ValueError("The initial parameters must be positive to be fitted")
+    return values
+
+
+def _parameter_dict(model: Model, p: np.ndarray) -> dict:
+    """Splits parameter vectors of shape (N, m) into named arrays
+    """
+    P = model.num_peripheries
+    parameters = {"CL": p[:, 0], "V_c": p[:, 1], "V_p": p[:, 2:2 + P], "Q_p": p[:, 2 + P:2 + 2 * P]}
+    if isinstance(model, Subcutaneous):
+        parameters["k_a"] = p[:, -1]
+    return parameters
+
+
+def _system_matrices(model: Model, p: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The system matrices and their derivatives with respect to the logarithm of each parameter
+
+    :return: The matrices A of shape (N, n, n), and dA/dlog(p) of shape (N, m, n, n)
+    """
+    parameters = _parameter_dict(model, p)
+    CL, V_c, V_p, Q_p = parameters["CL"], parameters["V_c"], parameters["V_p"], parameters["Q_p"]
+    P = V_p.shape[-1]
+    if isinstance(model, Subcutaneous):
+        A = Subcutaneous.batch_system_matrix(CL, V_c, V_p, Q_p, parameters["k_a"])
+    else:
+        A = Model.batch_central_matrix(CL, V_c, V_p, Q_p)
+
+    # Every entry of A is a sum of monomials in the parameters, so p dA/dp keeps the terms in which p appears
+    c = A.shape[-1] - 1 - P
+    dA = np.zeros((len(p), p.shape[-1]) + A.shape[-2:])
+    dA[:, 0, c, c] = -CL / V_c
+    dA[:, 1, c, c] = (CL + Q_p.sum(axis=-1)) / V_c
+    peripheries = c + 1 + np.arange(P)
+    dA[:, 1, peripheries, c] = -Q_p / V_c[:, None]
+    for i, j in enumerate(peripheries):
+        dA[:, 2 + i, c, j] = -Q_p[:, i] / V_p[:, i]
+        dA[:, 2 + i, j, j] = Q_p[:, i] / V_p[:, i]
+        dA[:, 2 + P + i, c, c] = -Q_p[:, i] / V_c
+        dA[:, 2 + P + i, c, j] = Q_p[:, i] / V_p[:, i]
+        dA[:, 2 + P + i, j, c] = Q_p[:, i] / V_c
+        dA[:, 2 + P + i, j, j] = -Q_p[:, i] / V_p[:, i]
+    if isinstance(model, Subcutaneous):
+        dA[:, -1, 0, 0] = -parameters["k_a"]
+        dA[:, -1, 1, 0] = parameters["k_a"]
+    return A, dA
+
+
+def _predict(model: Model, theta: np.ndarray, t: np.ndarray, chunk_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """The central concentrations at the times `t` and their derivatives with respect to the log-parameters
+
+    :return: The concentrations, of shape (N, T), and their sensitivities, of shape (N, T, m)
+    """
+    p = np.exp(theta)
+    A, dA = _system_matrices(model, p)
+    N, m, n = dA.shape[:3]
+    c = n - 1 - model.num_peripheries
+
+    # The state and its sensitivities form one linear system with a block lower-triangular matrix, which shares
+    # the eigenvalues of A and so is defective. Its exact matrix exponential is always used
+    augmented = np.zeros((N, m + 1, n, m + 1, n))
+    augmented[:, np.arange(m + 1), :, np.arange(m + 1), :] = A[None]
+    augmented[:, 1:, :, 0, :] = dA
+    augmented = augmented.reshape(N, n * (m + 1), n * (m + 1))
+    b = np.zeros(n * (m + 1))
+    b[:n] = model.dose_vector()
+    y0 = np.zeros(n * (m + 1))
+    y0[:n] = model.initial_state()
+
+    # The solution starts from the initial state at time 0, which is dropped if it was not observed
+    times = t if t[0] == 0 else np.insert(t, 0, 0.0)
+    z = np.empty((N, n * (m + 1), len(times)))
+    for lo in range(0, N, chunk_size):
+        propagator = LinearPropagator(augmented[lo:lo + chunk_size], b, cond_limit=0.0)
+        z[lo:lo + chunk_size] = solve_linear(propagator, np.broadcast_to(y0, propagator.b.shape), times,
+                                             model.dosing_schedule)
+    z = z[..., len(times) - len(t):].reshape(N, m + 1, n, len(t))
+
+    V_c = p[:, 1, None]
+    predicted = z[:, 0, c] / V_c
+    sensitivity = np.moveaxis(z[:, 1:, c] / V_c[:, None], 1, -1)
+    sensitivity[..., 1] -= predicted
+    return predicted, sensitivity
+
+
+def _residuals(predicted: np.ndarray, sensitivity: np.ndarray,
+               observed: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The residuals and their Jacobian, with missing observations contributing nothing
+    """
+    missing = np.isnan(observed)
+    residuals = np.where(missing, 0.0, predicted - observed)
+    jacobian = np.where(missing[..., None], 0.0, sensitivity)
+    return residuals, jacobian
@@ -0,0 +1,108 @@
+#
+# Solver instrumentation
+#
+import contextlib
+
+
+# These Runge-Kutta methods make two right-hand side evaluations to start, and then one per stage for each attempted
+# step. DOP853 is left out, as it makes extra evaluations to interpolate between steps
+RUNGE_KUTTA_STAGES = {"RK23": 3, "RK45": 6}
+
+_callbacks = []
+_count_steps = False
+
+
+class SolveStats:
+    """The statistics of one solve of a model
+    """
+
+    def __init__(self, model: str, method: str, construction_time: float = 0.0, integration_time: float = 0.0,
+                 output_time: float = 0.0, nfev: int = 0, njev: int = 0, nlu: int = 0, steps: int = 0,
+                 rejected_steps: int = None, segments: int = 0, boluses: int = 0):
+        """
+        :param model: The name of the model type
+        :param method: The solver method
+        :param construction_time: The wall time (s) taken to construct the model
+        :param integration_time: The wall time (s) taken to integrate the model
+        :param output_time: The wall time (s) taken to build the dictionary of results
+        :param nfev: The number of right-hand side evaluations
+        :param njev: The number of Jacobian evaluations
+        :param nlu: The number of LU decompositions
+        :param steps: The number of accepted solver steps. Numerical solves only count them while
+        `counting_steps()`, and report 0 otherwise
+        :param rejected_steps: The number of rejected solver steps. This is only known for the Runge-Kutta methods
+        while steps are counted, and is None otherwise
+        :param segments: The number of pieces of constant dosing rate integrated separately
+        :param boluses: The number of boluses applied
+        """
+        self.model = model
+        self.method = method
+        self.construction_time = construction_time
+        self.integration_time = integration_time
+        self.output_time = output_time
+        self.nfev = nfev
+        self.njev = njev
+        self.nlu = nlu
+        self.steps = steps
+        self.rejected_steps = rejected_steps
+        self.segments = segments
+        self.boluses = boluses
+
+    def as_dict(self) -> dict:
+        """The statistics as a dictionary, e.g. to be forwarded to a metrics system
+        """
+        return dict(vars(self))
+
+    def __repr__(self) -> str:
+        return "SolveStats({})".format(", ".join("{}={!r}".format(key, value) for key, value in vars(self).items()))
+
+
+def add_callback(callback) -> None:
+    """Registers a function which is called as callback(stats) with the `SolveStats` of every `solve_equations`
+
+    :param callback: A function of one argument
+    """
+    _callbacks.append(callback)
+
+
+def remove_callback(callback) -> None:
+    """Unregisters a function added with `add_callback`
+    """
+    _callbacks.remove(callback)
+
+
+def set_step_counting(enabled: bool) -> None:
+    """Counts the accepted and rejected steps of numerical solves even when no callback is registered. Counting
+    attaches an event to `solve_ivp`, which slows the integration down, so it is otherwise off
+
+    :param enabled: Whether to count the steps
+    """
+    global _count_steps
+    _count_steps = bool(enabled)
+
+
+def counting_steps() -> bool:
+    """Whether numerical solves count their steps: when a callback is registered or `set_step_counting` is on
+    """
+    return _count_steps or len(_callbacks) > 0
+
+
+def emit(stats: SolveStats) -> None:
+    """Passes the statistics of a solve to every registered callback
+    """
+    for callback in list(_callbacks):
+        callback(stats)
+
+
+@contextlib.contextmanager
+def collect():
+    """A context manager which gathers the `SolveStats` of the solves made inside it
+
+    :return: The list to which the statistics are appended
+    """
+    stats = []
+    add_callback(stats.append)
+    try:
+        yield stats
+    finally:
+        remove_callback(stats.append)
@@ -1,6 +1,7 @@
 import numpy as np
-import scipy
-from model import Model
+from pkmodel.dosing import DosingSchedule
+from pkmodel.model import Model
+from pkmodel.continuation import SolverState
 
 #
 # Intravenous class
@@ -14,7 +15,8 @@ class Intravenous(Model):
     def __init__(self, clearance_rate: float = 1.0, dose_per_time_step: float = 1.0, dose_on: int = 0,
                  dose_off: int = 0, V_c: float = 1.0,
                  num_peripheries: int = 1, V_p_list: list[float] = None,
-                 Q_p_list: list[float] = None, run_time: float = 1.0, time_step_length: float = 1.0):
+                 Q_p_list: list[float] = None, run_time: float = 1.0, time_step_length: float = 1.0,
+                 dosing_schedule: DosingSchedule = None):
         """
 
         :param clearance_rate: Defaults to 1.0
@@ -22,55 +24,87 @@ class Intravenous(Model):
         :param num_peripheries: Defaults to 1
         :param V_p_list: Defaults to None, but then this is handled by the base class
         :param Q_p_list: Defaults to None, but then this is handled by the base class
+        :param dosing_schedule: Defaults to None, but then this is handled by the base class
         """
         super().__init__(clearance_rate, dose_per_time_step, dose_on, dose_off, V_c, num_peripheries, V_p_list,
-                         Q_p_list, run_time, time_step_length)
+                         Q_p_list, run_time, time_step_length, dosing_schedule)
 
     def add_compartments(self) -> None:
         super().add_compartments()
 
     def rhs_ode(self, t: np.array, y: list[np.array]):
-        """This method returns a list of right-hand sides for the ODEs defined in the intravenous
+        """This method returns the right-hand sides for the ODEs defined in the intravenous
         model. This will include one central compartment equation and some periphery equations
 
         :param t: A numpy array of time steps for the problem
         :param y: A list of numpy arrays for each compartment. The first element is the Central data
         and the rest of the elements are Periphery compartments
-        :return:
+        :return: A numpy array with the rate of change of the drug amount in each compartment
         """
-        q_c, q_p_list = y[0], y[1:]
-        X = self.X
+        # The ODEs are linear, so the right-hand side is a single matrix-vector product with the system matrix,
+        # plus the dosing rate into the first compartment
+        dy_dt = self.rhs_operator() @ y
+        dy_dt[0] += self.dosing(t)
+        return dy_dt
 
-        # This is adapting prototype.py to make a list of transitions for each periphery compartment
-        # instead of just one transition, using a list comprehension
-        transition_list = [self.Q_p_list[i] * (q_c / self.V_c - q_p_list[i] / self.V_p_list[i])
-                           for i in range(len(q_p_list))]
+    def initial_state(self) -> np.ndarray:
+        """All compartments initially contain no drug
 
-        # The central compartment ODE
-        dqc_dt = self.dosing(t, X) - q_c / self.V_c * self.CL - sum(transition_list)
+        :return: A numpy array with one zero for the Central compartment and one for each Periphery compartment
+        """
+        return np.zeros(1 + self.num_peripheries)
+
+    def system_matrix(self) -> np.ndarray:
+        """The intravenous ODEs are linear in the compartment amounts, dy/dt = A y + dosing(t) e_0, where the
+        state y is ordered as in `rhs_ode`
 
-        # A list of periphery compartment ODEs
-        dqp_dt_list = transition_list
-        return [dqc_dt] + dqp_dt_list
+        :return: The matrix A of the Central and Periphery compartments
+        """
+        return self.central_matrix()
 
-    def solve_equations(self) -> dict:
+    def solve_equations(self, method: str = "RK45", start: SolverState = None) -> dict:
         """Here we use the Intravenous ODE model to solve the problem
 
-        :return: A dictionary of numpy arrays containing the amount of drug in each compartment for each time step
+        :param method: "analytic" for the exact matrix-exponential solution, "fixed-step" for the exact solution at
+        multiples of time_step_length, or a `scipy.integrate.solve_ivp` method
+        :param start: A `SolverState` to continue from, such as the `state` of an earlier solve. The run then
+        covers run_time hours from start.t, and its first time step is the start state. Defaults to None, which
+        starts from no drug at time 0
+        :return: A dictionary of numpy arrays containing the amount of drug in each compartment for each time step.
+        The statistics of the solve are left in `stats` and passed to the instrumentation callbacks, and the state
+        at the last time step is left in `state`
+        """
+        t_eval, y = self._run(method, start)
+        return self._output(t_eval, y)
+
+    def solution_dict(self, t: np.ndarray, y: np.ndarray) -> dict:
+        """This returns the solution as a dictionary containing the time steps and the
+        different drug amounts over time for each compartment
+
+        :param t: A numpy array of time steps
+        :param y: A numpy array of drug amounts, of shape (..., compartments, time steps)
+        """
+        return {"t": t, "Central": y[..., 0, :], "Peripheries": y[..., 1:, :]}
+
+    @classmethod
+    def solve_population(cls, CL, V_c, V_p=None, Q_p=None, dose_per_time_step: float = 1.0, dose_on: int = 0,
+                         dose_off: int = 0, run_time: float = 1.0, time_step_length: float = 1.0,
+                         dosing_schedule: DosingSchedule = None, chunk_size: int = 1024) -> dict:
+        """Solves the Intravenous model exactly for a population of N subjects in one call. The parameter arrays
+        are validated as a whole, and all subjects are propagated together with array operations instead of
+        constructing and solving one model per subject
+
+        :param CL: The clearance rates (mL/h), a float or an array of shape (N,)
+        :param V_c: The central compartment volumes (mL), a float or an array of shape (N,)
+        :param V_p: The periphery compartment volumes (mL), an array of shape (N, P). Defaults to no peripheries
+        :param Q_p: The periphery transition rates (mL/h), an array of shape (N, P)
+        :param chunk_size: The number of subjects propagated together, which bounds the temporary memory
+        :return: A dictionary like that of `solve_equations`, whose entries are views of a single
+        (N, compartments, time steps) array: "Central" has shape (N, T) and "Peripheries" shape (N, P, T)
         """
-        # Here we set up the time steps, and we set all initial compartment drug amount to zero
-        num_time_steps = int(self.run_time * 3600 / self.time_step_length)
-        t_eval = np.linspace(0, self.run_time, num_time_steps)
-
-        # This contains initial data for all the peripheries
-        y0 = np.array([0.0] * (1 + self.num_peripheries))
-
-        solution = scipy.integrate.solve_ivp(
-            fun=lambda t, y: self.rhs_ode(t, y),
-            t_span=[t_eval[0], t_eval[-1]],
-            y0=y0, t_eval=t_eval
-        )
-
-        # This returns the solution as a dictionary containing the time steps and the
-        # different drug amounts over time for each compartment
-        return {"t": solution.t, "Central": solution.y[0], "Peripheries": solution.y[1:]}
+        CL, V_c, V_p, Q_p = cls.population_arrays(CL, V_c, V_p, Q_p)
+        template = cls(dose_per_time_step=dose_per_time_step, dose_on=dose_on, dose_off=dose_off,
+                       num_peripheries=V_p.shape[-1], run_time=run_time, time_step_length=time_step_length,
+                       dosing_schedule=dosing_schedule)
+        A = cls.batch_central_matrix(CL, V_c, V_p, Q_p)
+        return cls._solve_population(template, A, chunk_size)
@@ -1,30 +1,50 @@
-from intravenous import Intravenous
-from subcutaneous import Subcutaneous
-from plot import plot
+from pkmodel.intravenous import Intravenous
+from pkmodel.subcutaneous import Subcutaneous
+
+
+def build_model(model_type: str, clearance: float, dose_rate: float, dose_on: int, dose_off: int,
+                V_central: float, n_peripheries: int, V_peripheries: list[float], Q_peripheries: list[float],
+                drug_volume: float, drug_absorption: float, run_time: float, time_step: float):
+    """Constructs a model from the command-line parameters, without solving it
+
+    :return: An `Intravenous` or `Subcutaneous` model
+    """
+    if model_type == "Intravenous":
+        return Intravenous(clearance_rate=clearance, dose_per_time_step=dose_rate, dose_on=dose_on,
+                           dose_off=dose_off, V_c=V_central, num_peripheries=n_peripheries,
+                           V_p_list=V_peripheries, Q_p_list=Q_peripheries, run_time=run_time,
+                           time_step_length=time_step)
+
+    elif model_type == "Subcutaneous":
+        return Subcutaneous(clearance_rate=clearance, dose_per_time_step=dose_rate, dose_on=dose_on,
+                            dose_off=dose_off, V_c=V_central, num_peripheries=n_peripheries,
+                            V_p_list=V_peripheries, Q_p_list=Q_peripheries, V_0=drug_volume,
+                            absorption_rate=drug_absorption, run_time=run_time,
+                            time_step_length=time_step)
+
+    else:
+        raise ValueError("Unrecognised model type. Available options: 'Intravenous', 'Subcutaneous'")
 
 
 def run_model(model_type: str, clearance: float, dose_rate: float, dose_on: int, dose_off: int,
               V_central: float, n_peripheries: int, V_peripheries: list[float], Q_peripheries: list[float],
               drug_volume: float, drug_absorption: float, run_time: float, time_step: float,
-              plot_folder: str, title: str):
+              plot_folder: str, title: str, render: bool = True, headless: bool = False) -> dict:
     """Runs the model. This function is called by simulation.py
+
+    :param render: Whether to plot the results. With False, nothing is drawn or saved
+    :param headless: Whether to plot on an Agg canvas without pyplot, for batch runs without a display
+    :return: The dictionary of results from `solve_equations`
     """
-    if model_type == "Intravenous":
-        model = Intravenous(clearance_rate=clearance, dose_per_time_step=dose_rate, dose_on=dose_on,
-                            dose_off=dose_off, V_c=V_central, num_peripheries=n_peripheries,
-                            V_p_list=V_peripheries, Q_p_list=Q_peripheries, run_time=run_time,
-                            time_step_length=time_step)
-        results = model.solve_equations()
-        plot(data=results, plot_folder=plot_folder, title=title)
+    model = build_model(model_type, clearance, dose_rate, dose_on, dose_off, V_central, n_peripheries,
+                        V_peripheries, Q_peripheries, drug_volume, drug_absorption, run_time, time_step)
+    results = model.solve_equations()
 
-    elif model_type == "Subcutaneous":
-        model = Subcutaneous(clearance_rate=clearance, dose_per_time_step=dose_rate, dose_on=dose_on,
-                             dose_off=dose_off, V_c=V_central, num_peripheries=n_peripheries,
-                             V_p_list=V_peripheries, Q_p_list=Q_peripheries, V_0=drug_volume,
-                             absorption_rate=drug_absorption, run_time=run_time,
-                             time_step_length=time_step)
-        results = model.solve_equations()
-        plot(data=results, plot_folder=plot_folder, title=title)
+    if render:
+        from pkmodel.plot import plot
+
+        plot(data=results, plot_folder=plot_folder, title=title, headless=headless)
+    return results
 
 #     # Some manual testing cases - Basic arguments
 #
@@ -0,0 +1,138 @@
+#
+# Streaming non-compartmental metrics
+#
+import collections
+import numpy as np
+from pkmodel.model import Model
+
+
+class NCAMetrics:
+    """Accumulates non-compartmental summaries of the central concentration from consecutive blocks of a solution,
+    without keeping the trajectory.
+
+    The metrics are the trapezoidal area under the curve "AUC" (ng h/mL), the peak concentration "Cmax" and its
+    time "Tmax", the terminal "half_life" from a log-linear fit to the last `tail_points` time steps after Tmax,
+    and the "troughs", the lowest concentration of each complete dosing cycle.
+    """
+
+    def __init__(self, V_c: float, period: float = None, tail_points: int = 5):
+        """
+        :param V_c: The volume (mL) of the central compartment, which turns drug amounts into concentrations
+        :param period: The period (h) of the dosing cycles. Defaults to None, in which case no troughs are found
+        :param tail_points: The number of final time steps used for the terminal half-life, at least 3
+        """
+        if not isinstance(tail_points, int):
+            raise TypeError("tail_points must be an int")
+        if tail_points < 3:
+            raise ValueError("tail_points must be at least 3")
+
+        self.V_c = V_c
+        self.period = period
+        self.auc = 0.0
+        self.c_max, self.t_max = -np.inf, np.nan
+        self.troughs = []
+        self._last = None
+        self._tail = collections.deque(maxlen=tail_points)
+        self._cycle, self._cycle_min = None, np.inf
+
+    def update(self, t: np.ndarray, central: np.ndarray) -> None:
+        """Adds the next block of time steps
+
+        :param t: The times (h) of the block, following on from the previous block
+        :param central: The drug amount (ng) in the central compartment at each time
+        """
+        t = np.asarray(t, dtype=float)
+        c = np.asarray(central, dtype=float) / self.V_c
+        if len(t) == 0:
+            return
+
+        # The trapezoid between the blocks joins the last time step of the previous block to this one
+        if self._last is not None:
+            t, c = np.insert(t, 0, self._last[0]), np.insert(c, 0, self._last[1])
+        self.auc += float(np.sum(np.diff(t) * (c[1:] + c[:-1]) / 2))
+        if self._last is not None:
+            t, c = t[1:], c[1:]
+
+        peak = np.argmax(c)
+        if c[peak] > self.c_max:
+            self.c_max, self.t_max = float(c[peak]), float(t[peak])
+        self._tail.extend(zip(t[-self._tail.maxlen:], c[-self._tail.maxlen:]))
+        self._last = (t[-1], c[-1])
+
+        if self.period is not None:
+            self._update_troughs(t, c)
+
+    def _update_troughs(self, t: np.ndarray, c: np.ndarray) -> None:
+        """Takes the minimum over each dosing cycle in the block, and records the cycles which are complete
+        """
+        cycles = np.floor(t / self.period).astype(int)
+        starts = np.flatnonzero(np.diff(cycles, prepend=cycles[0] - 1))
+        for cycle, minimum in zip(cycles[starts], np.minimum.reduceat(c, starts)):
+            if cycle == self._cycle:
+                self._cycle_min = min(self._cycle_min, minimum)
+                continue
+            if self._cycle is not None:
+                self.troughs.append(float(self._cycle_min))
+            self._cycle, self._cycle_min = cycle, minimum
+
+    def observe(self, blocks):
+        """Adds each block of a stream as it passes, so metrics can be gathered while the blocks are consumed
+        elsewhere, e.g. `store.append(metrics.observe(model.iter_solution()))`
+
+        :param blocks: An iterable of dictionaries like that of `solve_equations`
+        :return: A generator of the same blocks
+        """
+        for block in blocks:
+            self.update(block["t"], block["Central"])
+            yield block
+
+    def result(self) -> dict:
+        """The metrics of the time steps added so far
+
+        :return: A dictionary with the "AUC", "Cmax", "Tmax", "half_life" and "troughs". The half-life is NaN
+        if the concentration is not falling over the tail points after Tmax
+        """
+        tail = np.array([(t, c) for t, c in self._tail if t > self.t_max and c > 0]).reshape(-1, 2)
+        half_life = np.nan
+        if len(tail) >= 3:
+            slope = np.polyfit(tail[:, 0], np.log(tail[:, 1]), 1)[0]
+            if slope < 0:
+                half_life = float(np.log(2) / -slope)
+
+        c_max = self.c_max if np.isfinite(self.c_max) else np.nan
+        return {"AUC": self.auc, "Cmax": c_max, "Tmax": self.t_max, "half_life": half_life,
+                "troughs": np.array(self.troughs)}
+
+
+def compute_metrics(model: Model, auc: str = "trapezoidal", chunk_size: int = 65536, method: str = "RK45",
+                    tail_points: int = 5) -> dict:
+    """Solves a model block by block with `iter_solution` and summarises its central concentration
+
+    :param model: The model to be solved
+    :param auc: "trapezoidal" for the area under the time steps, or "exact" for the area under the exact
+    solution. As dy/dt = A y + b u, the exact area is the central row of A^-1 (y(T) - y(0) - b D), where D is the
+    total dose, so it only needs the final state. It requires A to be invertible, so the drug must be eliminated
+    (clearance_rate > 0) and, for the Subcutaneous model, absorbed (absorption_rate > 0)
+    :param chunk_size: The number of time steps in each block
+    :param method: The solver method, as for `solve_equations`
+    :param tail_points: The number of final time steps used for the terminal half-life
+    :return: The dictionary of `NCAMetrics.result`
+    """
+    if auc not in ("trapezoidal", "exact"):
+        raise ValueError("auc must be 'trapezoidal' or 'exact'")
+    if auc == "exact" and (model.CL == 0 or np.linalg.cond(model.system_matrix()) > 1 / np.finfo(float).eps):
+        raise ValueError("The exact AUC requires a positive clearance_rate and absorption_rate, so that the system "
+                         + "matrix is invertible")
+
+    metrics = NCAMetrics(model.V_c, model.dosing_schedule.period, tail_points)
+    last = None
+    for last in metrics.observe(model.iter_solution(chunk_size=chunk_size, method=method)):
+        pass
+    result = metrics.result()
+
+    if auc == "exact" and last is not None:
+        # iter_solution leaves the state at the last time step in model.state
+        dosed = model.initial_state() + model.dose_vector() * model.dosing_schedule.total_dose(0.0, model.state.t)
+        area = np.linalg.solve(model.system_matrix(), model.state.y - dosed)
+        result["AUC"] = float(model.solution_dict(np.zeros(1), area[:, None])["Central"][0]) / model.V_c
+    return result
@@ -1,13 +1,28 @@
 #
 # Model class
 #
+import time
 import numpy as np
+from pkmodel.analytic import LinearPropagator, solve_linear, solve_recurrence
 from pkmodel.compartment import Central, Periphery
+from pkmodel.continuation import SolverState
+from pkmodel.dosing import DosingSchedule
+from pkmodel.instrumentation import RUNGE_KUTTA_STAGES, SolveStats, counting_steps, emit
+
+
+# Methods of `scipy.integrate.solve_ivp` which use the Jacobian of the ODEs
+IMPLICIT_METHODS = ("BDF", "Radau", "LSODA")
+
+# The stiffness ratio above which `method="auto"` integrates implicitly
+STIFFNESS_THRESHOLD = 1000.0
+
+# The number of peripheries from which the right-hand side uses a sparse system matrix
+SPARSE_PERIPHERIES = 128
 
 
 class Model:
     """A Pharmokinetic (PK) model
-    This is the base class, which will always contain one central compartment and 0-2 periphery
+    This is the base class, which will always contain one central compartment and any number of periphery
     compartments. The `Intravenous` and `Subcutaneous` Models will inherit from this class, implementing
     their own versions of the `add_compartments` and `solve_equations` methods.
 
@@ -17,7 +32,7 @@ class Model:
     def __init__(self, clearance_rate: float = 1.0, dose_per_time_step: float = 1.0, dose_on: int = 0,
                  dose_off: int = 0, V_c: float = 1.0, num_peripheries: int = 1,
                  V_p_list: list[float] = None, Q_p_list: list[float] = None,
-                 run_time: float = 1.0, time_step_length: float = 1.0):
+                 run_time: float = 1.0, time_step_length: float = 1.0, dosing_schedule: DosingSchedule = None):
         """
 
         :param clearance_rate: The constant clearance rate (mL/h) from the central compartment
@@ -28,14 +43,17 @@ class Model:
         :param dose_off: The number of time-steps for which drug is not
         administered at a time
         :param V_c: The constant volume (mL) of the central compartment
-        :param num_peripheries: The number of periphery compartments (0-2 inclusive)
+        :param num_peripheries: The number of periphery compartments (0 or more)
         :param V_p_list: The list of volumes (mL) of the different periphery compartments
         :param Q_p_list: The list of transition rates (mL/h) between the central compartment and
         each periphery compartment
         :param run_time: The simulated time (h) that the model runs for
         :param time_step_length: The length (s) of an individual time-step
+        :param dosing_schedule: A `DosingSchedule` of boluses and infusions. Defaults to None, in which case
+        the schedule is built from dose_per_time_step, dose_on and dose_off
 
         """
+        construction_start = time.perf_counter()
 
         # Checks for the clearance_rate, dose_rate and central volume
         if isinstance(clearance_rate, (float, int)) and isinstance(dose_per_time_step, (float, int)) \
@@ -61,10 +79,10 @@ class Model:
 
         # Checks for the number of peripheries
         if isinstance(num_peripheries, int):
-            if 0 <= num_peripheries <= 2:
+            if 0 <= num_peripheries:
                 self.num_peripheries = num_peripheries
             else:
-                raise ValueError("num_peripheries must lie between 0 and 2 inclusive")
+                raise ValueError("num_peripheries must be non-negative")
         else:
             raise TypeError("num_peripheries must be an int")
 
@@ -119,8 +137,65 @@ class Model:
         else:
             raise TypeError("time_step_length must be a float")
 
-        self.compartments = {}
-        self.add_compartments()
+        # Checks for the dosing schedule
+        if dosing_schedule is None:
+            dosing_schedule = DosingSchedule.from_time_steps(self.X, self.dose_on, self.dose_off,
+                                                             self.time_step_length)
+        elif not isinstance(dosing_schedule, DosingSchedule):
+            raise TypeError("dosing_schedule must be a DosingSchedule")
+        self._finish_construction(dosing_schedule, construction_start)
+
+    @classmethod
+    def from_parameters(cls, parameters: dict, dosing_schedule: DosingSchedule = None) -> "Model":
+        """Constructs a model from parameters which are already validated, skipping the checks of `__init__`
+
+        :param parameters: A dictionary like that of `parameters()`, e.g. from a row of `ModelParams`
+        :param dosing_schedule: A `DosingSchedule`. Defaults to None, in which case the schedule is built from the
+        X, dose_on and dose_off parameters
+        :return: A model of this type
+        """
+        construction_start = time.perf_counter()
+        model = cls.__new__(cls)
+        model.__dict__.update(parameters)
+        if dosing_schedule is None:
+            dosing_schedule = DosingSchedule.from_time_steps(model.X, model.dose_on, model.dose_off,
+                                                             model.time_step_length)
+        model._finish_construction(dosing_schedule, construction_start)
+        return model
+
+    def _finish_construction(self, dosing_schedule: DosingSchedule, construction_start: float) -> None:
+        """Sets the state of a model which is not one of its parameters
+        """
+        self.dosing_schedule = dosing_schedule
+
+        # The compartment objects are not used by the solvers, so they are only built if `compartments` is read
+        self._compartments = None
+        self._rhs_operator = None
+
+        # The statistics of the last solve, which are also passed to the instrumentation callbacks, and the
+        # state it ended in, from which a later solve can continue
+        self.stats = None
+        self.state = None
+        self.construction_time = time.perf_counter() - construction_start
+
+    def parameters(self) -> dict:
+        """The validated parameters of the model, which together with its dosing schedule determine its solution
+
+        :return: A dictionary from parameter names to floats, ints and lists of floats
+        """
+        return {"CL": self.CL, "X": self.X, "dose_on": self.dose_on, "dose_off": self.dose_off, "V_c": self.V_c,
+                "num_peripheries": self.num_peripheries, "V_p_list": list(self.V_p_list),
+                "Q_p_list": list(self.Q_p_list), "run_time": self.run_time, "time_step_length": self.time_step_length}
+
+    @property
+    def compartments(self) -> dict:
+        """The `Central`, `Periphery` and `Dose` compartments of the model, built by `add_compartments` when first
+        read
+        """
+        if self._compartments is None:
+            self._compartments = {}
+            self.add_compartments()
+        return self._compartments
 
     def add_compartments(self) -> None:
         """The general model will add a `Central` compartment and a number of `Periphery` compartments
@@ -135,25 +210,441 @@ class Model:
             Q_p_i = self.Q_p_list[i]
             self.compartments["Peripheries"].append(Periphery(V_p_i, Q_p_i))
 
-    def solve_equations(self) -> dict:
+    def solve_equations(self, method: str = "RK45") -> dict:
         """Here we will solve the equations for the given model, but we don't wish for this to be ever called from this
         base class, so raise a NotImplementedError if this method is called!
         """
         raise NotImplementedError("Cannot call `solve_equations` from Model base class, must do so from a subclass")
 
+    def _run(self, method: str, start: SolverState = None) -> tuple[np.ndarray, np.ndarray]:
+        """Integrates the model over its time steps for `solve_equations`, from the initial state or from a
+        `SolverState`, and leaves the state at the last time step in `state`
+
+        :return: The time steps and the drug amount in each compartment (rows) at each time (columns)
+        """
+        t_eval = self.time_points(method)
+        if start is None:
+            y = self.integrate(t_eval, self.initial_state(), method=method)
+            offset = 0.0
+        else:
+            y0 = self._start_state(start)
+            # The dosing schedule is evaluated in its own time, and the solution is reported from start.t on
+            y = self.integrate(t_eval + start.dosing_time, y0, method=method, initial_bolus=not start.boluses_applied)
+            offset = start.t - start.dosing_time
+            t_eval = t_eval + start.t
+        self.state = SolverState(t_eval[-1], y[:, -1], t_eval[-1] - offset)
+        return t_eval, y
+
+    def _start_state(self, start: SolverState) -> np.ndarray:
+        """Checks that a `SolverState` can start this model
+
+        :return: The drug amount in each compartment at the start
+        """
+        if not isinstance(start, SolverState):
+            raise TypeError("start must be a SolverState")
+        if start.y.shape != self.initial_state().shape:
+            raise ValueError("The start state must have one drug amount per compartment of the model")
+        return start.y
+
+    def _output(self, t_eval: np.ndarray, y: np.ndarray) -> dict:
+        """Builds the dictionary of results of `solve_equations`, completing and emitting the statistics of the
+        solve started by `integrate`
+        """
+        start = time.perf_counter()
+        solution = self.solution_dict(t_eval, y)
+        self.stats.output_time = time.perf_counter() - start
+        self.stats.construction_time = self.construction_time
+        emit(self.stats)
+        return solution
+
+    def iter_solution(self, chunk_size: int = 65536, method: str = "RK45", start: SolverState = None):
+        """Solves the model over the same time steps as `solve_equations`, one block of time steps at a time. Only
+        one block is held in memory, so the memory used does not grow with the run time. Once every block has been
+        generated, the state at the last time step is left in `state`
+
+        :param chunk_size: The number of time steps in each block. The last block may be shorter
+        :param method: The solver method, as for `solve_equations`
+        :param start: A `SolverState` to continue from, as for `solve_equations`
+        :return: A generator of dictionaries like that of `solve_equations`, each covering the next block of
+        time steps
+        """
+        if not isinstance(chunk_size, int):
+            raise TypeError("chunk_size must be an int")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+
+        # The time steps are generated block by block, exactly as `time_points` would place them
+        if method == "fixed-step":
+            num_time_steps = self._num_fixed_steps()
+            step = self.time_step_length / 3600
+        else:
+            num_time_steps = int(self.run_time * 3600 / self.time_step_length)
+            step = self.run_time / (num_time_steps - 1) if num_time_steps > 1 else 0.0
+
+        # Blocks are integrated in the time of the dosing schedule, and reported from start.t on
+        if start is None:
+            state, t_start, dosing_start, initial_bolus = self.initial_state(), 0.0, 0.0, True
+        else:
+            state, t_start, dosing_start = self._start_state(start), start.t, start.dosing_time
+            initial_bolus = not start.boluses_applied
+
+        t_last = None
+        for lo in range(0, num_time_steps, chunk_size):
+            hi = min(lo + chunk_size, num_time_steps)
+            t = np.arange(lo, hi) * step
+            if hi == num_time_steps and num_time_steps > 1 and method != "fixed-step":
+                t[-1] = self.run_time
+            t = t + dosing_start
+
+            if t_last is None:
+                y = self.integrate(t, state, method=method, initial_bolus=initial_bolus)
+            else:
+                # The block is integrated on from the last time step of the previous one, whose state already
+                # includes any bolus given at that time
+                y = self.integrate(np.insert(t, 0, t_last), state, method=method, initial_bolus=False)[:, 1:]
+            state, t_last = y[:, -1], t[-1]
+            yield self.solution_dict(t + (t_start - dosing_start), y)
+        self.state = SolverState(t_last + (t_start - dosing_start), state, t_last)
+
     def rhs_ode(self, t: np.array, y: list[np.array]):
         """We leave the implementation to subclasses, so raise a NotImplementedError here
         """
         raise NotImplementedError("Cannot call `rhs` from Model base class, must do so from a subclass")
 
-    def dosing(self, t: np.array, X: float) -> np.array:
-        """Here we solve for the dosing function to find the rate for the magnitude of dosage
+    def rhs_operator(self):
+        """The system matrix in the form used by `rhs_ode`, built on the first call and reused afterwards.
+        The compartments form a star around the Central compartment, so the matrix has only
+        3 * num_peripheries + 1 non-zero entries, and from SPARSE_PERIPHERIES peripheries onwards it is stored
+        as a sparse matrix
+
+        :return: A numpy array, or a `scipy.sparse.csr_array`
+        """
+        if self._rhs_operator is None:
+            A = self.system_matrix()
+            if self.num_peripheries >= SPARSE_PERIPHERIES:
+                import scipy.sparse
+
+                A = scipy.sparse.csr_array(A)
+            self._rhs_operator = A
+        return self._rhs_operator
+
+    def make_rhs(self, rate: float = 0.0):
+        """Builds a right-hand side specialised for a constant dosing rate, with the system matrix and the dosing
+        term computed once. It is used by `integrate` on each piece of the dosing schedule
+
+        :param rate: The dosing rate (ng/h) into the first compartment
+        :return: A function rhs(t, y, out=None) for `scipy.integrate.solve_ivp`. y may be a state of shape (n,),
+        or a stack of states of shape (n, k) for vectorized evaluation. With `out`, the derivatives are written
+        into that preallocated array without allocating. Without it, a new array is returned, as solve_ivp keeps
+        references to the derivatives it is given
+
+        `integrate` passes neither: every solve_ivp step still allocates its derivatives, and solve_ivp is not
+        given vectorized=True, which it only uses to approximate Jacobians by finite differences, while the implicit
+        methods here are given the exact `jacobian`. The stacked and `out` forms are for callers that evaluate
+        the right-hand side themselves
+        """
+        A = self.rhs_operator()
+        dose = self.dose_vector() * rate
+        dose_column = dose[:, None]
+        dense = isinstance(A, np.ndarray)
+
+        def rhs(t, y, out=None):
+            if out is None:
+                out = A @ y
+            elif dense:
+                np.matmul(A, y, out=out)
+            else:
+                out[...] = A @ y
+            out += dose if out.ndim == 1 else dose_column
+            return out
+
+        return rhs
+
+    def initial_state(self) -> np.ndarray:
+        """We leave the implementation to subclasses, so raise a NotImplementedError here
+        """
+        raise NotImplementedError("Cannot call `initial_state` from Model base class, must do so from a subclass")
+
+    def system_matrix(self) -> np.ndarray:
+        """We leave the implementation to subclasses, so raise a NotImplementedError here
+        """
+        raise NotImplementedError("Cannot call `system_matrix` from Model base class, must do so from a subclass")
+
+    def central_matrix(self) -> np.ndarray:
+        """Builds the matrix of the linear system formed by the Central and Periphery compartments, so that
+        d/dt [q_c, q_p1, ...] = A @ [q_c, q_p1, ...] when no drug is administered
+
+        :return: A (1 + num_peripheries) x (1 + num_peripheries) numpy array
+        """
+        return self.batch_central_matrix(self.CL, self.V_c, self.V_p_list, self.Q_p_list)
+
+    @staticmethod
+    def batch_central_matrix(CL: np.ndarray, V_c: np.ndarray, V_p: np.ndarray, Q_p: np.ndarray) -> np.ndarray:
+        """Builds the Central and Periphery system matrices for many parameter sets at once
+
+        :param CL: The clearance rates (mL/h), of shape (N,)
+        :param V_c: The central compartment volumes (mL), of shape (N,)
+        :param V_p: The periphery compartment volumes (mL), of shape (N, num_peripheries)
+        :param Q_p: The periphery transition rates (mL/h), of shape (N, num_peripheries)
+        :return: A numpy array of shape (N, 1 + num_peripheries, 1 + num_peripheries)
+        """
+        CL, V_c = np.asarray(CL, dtype=float), np.asarray(V_c, dtype=float)
+        V_p, Q_p = np.asarray(V_p, dtype=float), np.asarray(Q_p, dtype=float)
+        num_peripheries = V_p.shape[-1]
+
+        A = np.zeros(CL.shape + (1 + num_peripheries, 1 + num_peripheries))
+        A[..., 0, 0] = -(CL + Q_p.sum(axis=-1)) / V_c
+        A[..., 0, 1:] = Q_p / V_p
+        A[..., 1:, 0] = Q_p / V_c[..., None]
+        diagonal = np.arange(1, 1 + num_peripheries)
+        A[..., diagonal, diagonal] = -Q_p / V_p
+        return A
+
+    def solution_dict(self, t: np.ndarray, y: np.ndarray) -> dict:
+        """We leave the implementation to subclasses, so raise a NotImplementedError here
+        """
+        raise NotImplementedError("Cannot call `solution_dict` from Model base class, must do so from a subclass")
+
+    @staticmethod
+    def population_arrays(CL, V_c, V_p=None, Q_p=None,
+                          shape: tuple = ()) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Validates the parameters of a whole population at once, with the same rules as `__init__`
+
+        :param CL: The clearance rates (mL/h), a float or an array of shape (N,)
+        :param V_c: The central compartment volumes (mL), a float or an array of shape (N,)
+        :param V_p: The periphery compartment volumes (mL), an array of shape (N, num_peripheries) or
+        (num_peripheries,). Defaults to None, which means there are no peripheries
+        :param Q_p: The periphery transition rates (mL/h), with the same shape as V_p
+        :param shape: The shape of any other per-subject parameter, such as the absorption rates, which also sets N
+        :return: The float arrays CL, V_c, V_p and Q_p, broadcast to a common number of subjects N
+        """
+        if V_p is None:
+            V_p = np.zeros((0,))
+        if Q_p is None:
+            Q_p = np.zeros((0,))
+        arrays = [np.asarray(x) for x in (CL, V_c, V_p, Q_p)]
+
+        if any(x.dtype.kind not in "iuf" for x in arrays):
+            raise TypeError("Input fluxes and volumes must be floats")
+        CL, V_c, V_p, Q_p = [x.astype(float) for x in arrays]
+
+        if CL.ndim > 1 or V_c.ndim > 1 or V_p.ndim not in (1, 2) or V_p.shape != Q_p.shape:
+            raise ValueError("CL and V_c must have one value per subject, and V_p and Q_p one row per subject")
+        num_subjects = np.broadcast_shapes(CL.shape, V_c.shape, V_p.shape[:-1], shape) or (1,)
+        CL, V_c = np.broadcast_to(CL, num_subjects), np.broadcast_to(V_c, num_subjects)
+        V_p = np.broadcast_to(V_p, num_subjects + V_p.shape[-1:])
+        Q_p = np.broadcast_to(Q_p, num_subjects + Q_p.shape[-1:])
+
+        if not (np.all(CL >= 0) and np.all(V_c > 0) and np.all(V_p > 0) and np.all(Q_p >= 0)):
+            raise ValueError("Fluxes cannot be negative and volumes must be positive")
+        if not all(np.all(np.isfinite(x)) for x in (CL, V_c, V_p, Q_p)):
+            raise ValueError("Fluxes and volumes must be finite")
+        return CL, V_c, V_p, Q_p
+
+    @classmethod
+    def _solve_population(cls, template: "Model", A: np.ndarray, chunk_size: int) -> dict:
+        """Solves the model exactly for many parameter sets that share the dosing and time settings of `template`
+
+        :param template: A model holding the shared dosing and time settings
+        :param A: The system matrices of every parameter set, of shape (N, n, n)
+        :param chunk_size: The number of parameter sets propagated together
+        :return: The `solution_dict` of the population, with a leading axis of length N
+        """
+        t_eval = template.time_points()
+        b = template.dose_vector()
+
+        y = np.empty(A.shape[:-1] + t_eval.shape)
+        for lo in range(0, len(A), chunk_size):
+            propagator = LinearPropagator(A[lo:lo + chunk_size], b)
+            y0 = np.zeros(propagator.b.shape)
+            y[lo:lo + chunk_size] = solve_linear(propagator, y0, t_eval, template.dosing_schedule)
+
+        return template.solution_dict(t_eval, y)
+
+    def dose_vector(self) -> np.ndarray:
+        """The vector through which the dosing function enters the ODEs. In both models the drug is
+        administered into the first compartment of the state vector
+
+        :return: A numpy array with one entry per compartment
+        """
+        b = np.zeros_like(self.initial_state())
+        b[0] = 1.0
+        return b
+
+    def time_points(self, method: str = None) -> np.ndarray:
+        """The times (h) at which the solution is evaluated, one per time step
+
+        :param method: The solver method. The "fixed-step" method is evaluated at multiples of time_step_length
+        up to run_time, and the others at evenly spaced times from 0 to run_time
+        """
+        if method == "fixed-step":
+            return np.arange(self._num_fixed_steps()) * (self.time_step_length / 3600)
+        num_time_steps = int(self.run_time * 3600 / self.time_step_length)
+        return np.linspace(0, self.run_time, num_time_steps)
+
+    def _num_fixed_steps(self) -> int:
+        """The number of multiples of time_step_length from 0 to run_time inclusive
+        """
+        return int(np.floor(self.run_time * 3600 / self.time_step_length + 1e-9)) + 1
+
+    def integrate(self, t_eval: np.ndarray, y0: np.ndarray, method: str = "RK45",
+                  initial_bolus: bool = True) -> np.ndarray:
+        """Integrates the model ODEs from the state `y0` at time t_eval[0]. The integration is split at every
+        change of the dosing schedule, and boluses are applied as jumps in the state between the pieces
+
+        :param t_eval: A numpy array of times (h) at which to evaluate the solution
+        :param y0: A numpy array with the initial drug amount in each compartment
+        :param method: "analytic" to propagate the linear system exactly through its matrix exponential,
+        "fixed-step" to propagate it exactly over a grid of time steps with `fixed_step`, "auto" to choose
+        between explicit and implicit integration with `select_method`, or any method accepted by
+        `scipy.integrate.solve_ivp`. Implicit methods are given the constant `jacobian`
+        :param initial_bolus: Whether the boluses given at t_eval[0] are still to be applied to y0. False when y0
+        already includes them, as when continuing a previous solution
+        :return: A numpy array with the drug amount in each compartment (rows) at each time (columns)
+        """
+        start = time.perf_counter()
+        if method == "auto":
+            method = self.select_method()
+
+        boundaries, rates, bolus_amounts = self.dosing_schedule.pieces(t_eval[0], t_eval[-1])
+        if not initial_bolus:
+            bolus_amounts[0] = 0.0
+        self.stats = SolveStats(type(self).__name__, method, segments=len(boundaries) - 1,
+                                boluses=int(np.count_nonzero(bolus_amounts)))
+
+        if method == "analytic":
+            propagator = LinearPropagator(self.system_matrix(), self.dose_vector())
+            y = solve_linear(propagator, y0, t_eval, self.dosing_schedule, initial_bolus)
+            self.stats.integration_time = time.perf_counter() - start
+            return y
+        if method == "fixed-step":
+            y = self.fixed_step(t_eval, y0, initial_bolus)
+            self.stats.steps = len(t_eval) - 1
+            self.stats.integration_time = time.perf_counter() - start
+            return y
+
+        # scipy.integrate is slow to import, so it is only loaded when a numerical solve is needed
+        from scipy.integrate import solve_ivp
+
+        indices = np.searchsorted(t_eval, boundaries, side="left")
+        b = self.dose_vector()
+        # The Jacobian is constant, so it is computed once and handed to the implicit methods as a callable
+        jacobian = self.jacobian()
+        options = {"jac": lambda t, y: jacobian} if method in IMPLICIT_METHODS else {}
+
+        # solve_ivp checks its events once at the start and then after every accepted step, so an event
+        # which never triggers counts the steps. Events slow every step down, so this is only done on request
+        checks = [0]
+        count = counting_steps()
+
+        def count_steps(t, y):
+            checks[0] += 1
+            return 1.0
+
+        if count:
+            options["events"] = count_steps
+
+        state = np.array(y0, dtype=float)
+        y = np.empty(state.shape + (len(t_eval),))
+        for i in range(len(boundaries) - 1):
+            state = state + b * bolus_amounts[i]
+            t_a, t_b = boundaries[i], boundaries[i + 1]
+            lo, hi = indices[i], indices[i + 1]
+
+            # The ODEs only depend on time through the dosing rate, which is constant on each piece,
+            # so each piece gets a right-hand side specialised for its rate
+            solution = solve_ivp(
+                fun=self.make_rhs(rates[i]),
+                t_span=[t_a, t_b],
+                y0=state, t_eval=np.append(t_eval[lo:hi], t_b), method=method, **options
+            )
+            y[:, lo:hi] = solution.y[:, :-1]
+            state = solution.y[:, -1]
+            self.stats.nfev += int(solution.nfev)
+            self.stats.njev += int(solution.njev)
+            self.stats.nlu += int(solution.nlu)
+
+        state = state + b * bolus_amounts[-1]
+        y[:, indices[-1]:] = state[:, None]
+
+        if count:
+            self.stats.steps = checks[0] - (len(boundaries) - 1)
+        if count and method in RUNGE_KUTTA_STAGES:
+            attempts = (self.stats.nfev - 2 * (len(boundaries) - 1)) // RUNGE_KUTTA_STAGES[method]
+            self.stats.rejected_steps = attempts - self.stats.steps
+        self.stats.integration_time = time.perf_counter() - start
+        return y
+
+    def fixed_step(self, t_eval: np.ndarray, y0: np.ndarray, initial_bolus: bool = True) -> np.ndarray:
+        """Propagates the model exactly over consecutive time steps of time_step_length. Every step applies the
+        same transition matrix Phi = exp(A h) and an affine dose term Gamma u_k, where u_k is the dosing rate
+        over step k and Gamma is the response to a unit rate over one step, so the whole run is a single
+        vectorized recurrence. The dosing schedule must only change on the time steps, as with dose_on and
+        dose_off
+
+        :param t_eval: Consecutive multiples of time_step_length (h), such as `time_points("fixed-step")`
+        :param y0: A numpy array with the initial drug amount in each compartment
+        :param initial_bolus: Whether the boluses given at t_eval[0] are still to be applied to y0
+        :return: A numpy array with the drug amount in each compartment (rows) at each time (columns)
+        """
+        import scipy.linalg
+
+        h = self.time_step_length / 3600
+        t_eval = np.asarray(t_eval, dtype=float)
+        if not np.allclose((t_eval - t_eval[0]) / h, np.arange(len(t_eval)), rtol=0, atol=1e-6):
+            raise ValueError("The fixed-step method needs consecutive time steps of time_step_length")
+        events = (self.dosing_schedule.event_times(t_eval[0], t_eval[-1]) - t_eval[0]) / h
+        if not np.allclose(events, np.round(events), rtol=0, atol=1e-6):
+            raise ValueError("The fixed-step method needs every dosing event on a time step")
+
+        # The transition matrix and the response to a unit dosing rate come from one augmented exponential
+        A, b = self.system_matrix(), self.dose_vector()
+        n = len(b)
+        M = np.zeros((n + 1, n + 1))
+        M[:n, :n], M[:n, n] = A, b
+        step = scipy.linalg.expm(M * h)
+        Phi, Gamma = step[:n, :n], step[:n, n]
+
+        times, amounts = self.dosing_schedule.boluses(t_eval[0], t_eval[-1])
+        boluses = np.zeros(len(t_eval))
+        np.add.at(boluses, np.round((times - t_eval[0]) / h).astype(int), amounts)
+        if not initial_bolus:
+            boluses[0] = 0.0
+
+        g = b * boluses[:, None]
+        g[0] += y0
+        g[1:] += Gamma * self.dosing_schedule.rate(t_eval[:-1] + h / 2)[:, None]
+        return solve_recurrence(Phi, g).T
+
+    def jacobian(self, t: float = None, y: np.ndarray = None) -> np.ndarray:
+        """The Jacobian of `rhs_ode` with respect to the compartment amounts. The ODEs are linear, so this is the
+        constant system matrix, whatever the time and state
+
+        :param t: The time (h), which does not affect the Jacobian
+        :param y: The drug amount in each compartment, which does not affect the Jacobian
+        """
+        return self.system_matrix()
+
+    def stiffness_ratio(self) -> float:
+        """The ratio of the fastest to the slowest decay rate of the model, where the slowest rate is at least
+        1 / run_time, since slower modes barely change over the simulated time
+
+        :return: A float of at least 1. Large ratios mean the ODEs are stiff
+        """
+        rates = -np.linalg.eigvals(self.system_matrix()).real
+        fastest = max(rates.max(), 0.0)
+        slowest = max(rates[rates > 1e-12 * fastest].min(initial=np.inf), 1 / self.run_time)
+        return max(fastest / slowest, 1.0) if np.isfinite(slowest) else 1.0
+
+    def select_method(self) -> str:
+        """Chooses the integration method for `method="auto"`: the implicit "BDF" method when the stiffness
+        ratio exceeds STIFFNESS_THRESHOLD, and the explicit "RK45" method otherwise
+        """
+        return "BDF" if self.stiffness_ratio() > STIFFNESS_THRESHOLD else "RK45"
+
+    def dosing(self, t: np.array) -> np.array:
+        """Here we solve for the dosing function to find the rate of dosage from the infusions of the dosing schedule.
+        Boluses are not part of the rate, as they are applied as jumps in the state by the solvers
         :param t: The time frame
-        :param X: The magnitude of dosage in ng
         """
-        if self.dose_on == 0:
-            return int(10000000000000 / self.time_step_length) * (X * (t == 0))
-        else:
-            num_time_steps = int(self.run_time * 3600 / self.time_step_length)
-            return X * ((num_time_steps - 1) * t % (self.dose_on
-                                                    + self.dose_off) < self.dose_on)
+        return self.dosing_schedule.rate(t)
@@ -0,0 +1,158 @@
+#
+# Struct-of-arrays model parameters
+#
+import numpy as np
+from pkmodel.dosing import DosingSchedule
+from pkmodel.intravenous import Intravenous
+from pkmodel.subcutaneous import Subcutaneous
+
+
+class ModelParams:
+    """The validated parameters of N models of one type, held as one numpy column per parameter
+
+    The columns are checked with the rules of `Model.__init__`, but with one array comparison per parameter rather
+    than Python checks per model, and each model is then built with `Model.from_parameters` without repeating them.
+    Models built this way only create their compartment objects if `compartments` is read.
+    """
+
+    def __init__(self, model_type: type = Intravenous, clearance_rate=1.0, dose_per_time_step=1.0, dose_on=0,
+                 dose_off=0, V_c=1.0, num_peripheries: int = 1, V_p_list=None, Q_p_list=None, V_0=1.0,
+                 absorption_rate=1.0, run_time=1.0, time_step_length=1.0):
+        """
+        Each parameter is a single value shared by every model, or an array with one value per model. V_p_list and
+        Q_p_list have one row of num_peripheries values per model, or a single row shared by every model.
+
+        :param model_type: `Intravenous` or `Subcutaneous`
+        :param num_peripheries: The number of periphery compartments of every model
+        :param V_0: The Dose compartment volumes (mL), only used by the Subcutaneous model
+        :param absorption_rate: The absorption rates (/h), only used by the Subcutaneous model
+        The other parameters are those of `Model.__init__`
+        """
+        if model_type not in (Intravenous, Subcutaneous):
+            raise ValueError("Unrecognised model type. Available options: 'Intravenous', 'Subcutaneous'")
+        if not isinstance(num_peripheries, int):
+            raise TypeError("num_peripheries must be an int")
+        if num_peripheries < 0:
+            raise ValueError("num_peripheries must be non-negative")
+        if V_p_list is None:
+            V_p_list = np.ones(num_peripheries)
+        if Q_p_list is None:
+            Q_p_list = np.ones(num_peripheries)
+
+        CL, X, V_c = _floats([clearance_rate, dose_per_time_step, V_c], "Input fluxes and volumes must be floats")
+        if not (np.all(CL >= 0) and np.all(X >= 0) and np.all(V_c > 0)):
+            raise ValueError("Fluxes cannot be negative and volumes must be positive")
+
+        dose_on, dose_off = [np.asarray(x) for x in (dose_on, dose_off)]
+        if dose_on.dtype.kind not in "iu" or dose_off.dtype.kind not in "iu":
+            raise TypeError("dose_on and dose_off must be ints")
+        if not (np.all(dose_on >= 0) and np.all(dose_off >= 0)):
+            raise ValueError("Dosage points must be non-negative")
+
+        V_p, Q_p = _floats([V_p_list, Q_p_list], "Input rates and volumes must be floats")
+        if V_p.ndim not in (1, 2) or Q_p.ndim not in (1, 2) \
+                or V_p.shape[-1] != num_peripheries or Q_p.shape[-1] != num_peripheries:
+            raise ValueError("There must be exactly " + str(num_peripheries) + " periphery volumes and fluxes each")
+        if not (np.all(V_p > 0) and np.all(Q_p >= 0)):
+            raise ValueError("Fluxes cannot be negative and volumes must be positive")
+
+        run_time, time_step_length = _floats([run_time, time_step_length], "run_time and time_step_length must be "
+                                             + "floats")
+        if not np.all(run_time > 0):
+            raise ValueError("run_time must be greater than 0")
+        if not (np.all(time_step_length > 0) and np.all(time_step_length <= 60)):
+            raise ValueError("time_step_length must be positive and no longer than a minute")
+
+        V_0, k_a = _floats([V_0, absorption_rate], "Dose compartment volume and absorption rate must be floats")
+        if not (np.all(V_0 > 0) and np.all(k_a >= 0)):
+            raise ValueError("Fluxes must be non-negative and volumes must be positive")
+
+        columns = {"CL": CL, "X": X, "dose_on": dose_on, "dose_off": dose_off, "V_c": V_c, "run_time": run_time,
+                   "time_step_length": time_step_length, "V_0": V_0, "k_a": k_a}
+        if any(column.ndim > 1 for column in columns.values()):
+            raise ValueError("Each parameter must have at most one value per model")
+        try:
+            N = np.broadcast_shapes(*(column.shape for column in columns.values()), V_p.shape[:-1], Q_p.shape[:-1])
+        except ValueError:
+            raise ValueError("Every parameter array must have the same number of models")
+        N = N or (1,)
+
+        self.model_type = model_type
+        self.num_peripheries = num_peripheries
+        self.columns = {name: np.broadcast_to(column, N) for name, column in columns.items()}
+        self.columns["V_p"] = np.broadcast_to(V_p, N + (num_peripheries,))
+        self.columns["Q_p"] = np.broadcast_to(Q_p, N + (num_peripheries,))
+        if model_type is not Subcutaneous:
+            del self.columns["V_0"], self.columns["k_a"]
+
+    @classmethod
+    def from_records(cls, model_type: type, records: list[dict]) -> "ModelParams":
+        """Builds the columns from a list of dictionaries of constructor arguments, e.g. from `parameter_grid`.
+        Every record must give the same arguments
+
+        :param model_type: `Intravenous` or `Subcutaneous`
+        :param records: A list of dictionaries of model constructor arguments
+        """
+        if len(records) == 0:
+            raise ValueError("There must be at least one record")
+        names = set(records[0])
+        if any(set(record) != names for record in records):
+            raise ValueError("Every record must give the same parameters")
+        shared = {}
+        if "num_peripheries" in names:
+            values = {record["num_peripheries"] for record in records}
+            if len(values) > 1:
+                raise ValueError("Every record must have the same num_peripheries")
+            shared["num_peripheries"] = values.pop()
+            names.remove("num_peripheries")
+        return cls(model_type, **shared, **{name: [record[name] for record in records] for name in names})
+
+    def __len__(self) -> int:
+        return len(self.columns["CL"])
+
+    def __getitem__(self, index: int):
+        """The model built from the parameters in one row of the columns
+        """
+        return self.model_type.from_parameters(self._row(index))
+
+    def __iter__(self):
+        return iter(self.models())
+
+    def models(self) -> list:
+        """Builds a model for every row of the columns. Rows with the same dosing and time step share one
+        `DosingSchedule`
+
+        :return: A list of `Intravenous` or `Subcutaneous` models
+        """
+        # The columns are converted to Python values once, rather than element by element
+        names = [name for name in self.columns if name not in ("V_p", "Q_p")]
+        rows = zip(*(self.columns[name].tolist() for name in names), self.columns["V_p"].tolist(),
+                   self.columns["Q_p"].tolist())
+        schedules = {}
+        models = []
+        for *values, V_p, Q_p in rows:
+            parameters = dict(zip(names, values), num_peripheries=self.num_peripheries, V_p_list=V_p, Q_p_list=Q_p)
+            key = (parameters["X"], parameters["dose_on"], parameters["dose_off"], parameters["time_step_length"])
+            if key not in schedules:
+                schedules[key] = DosingSchedule.from_time_steps(*key)
+            models.append(self.model_type.from_parameters(parameters, schedules[key]))
+        return models
+
+    def _row(self, index: int) -> dict:
+        """The parameters of one model, as returned by its `parameters()`
+        """
+        parameters = {name: column[index].item() for name, column in self.columns.items()
+                      if name not in ("V_p", "Q_p")}
+        parameters["num_peripheries"] = self.num_peripheries
+        parameters["V_p_list"] = self.columns["V_p"][index].tolist()
+        parameters["Q_p_list"] = self.columns["Q_p"][index].tolist()
+        return parameters
+
+
+def _floats(values: list, message: str) -> list[np.ndarray]:
+    """Converts values to float arrays, raising a TypeError with the message if any is not numeric
+    """
+    arrays = [np.asarray(x) for x in values]
+    if any(x.dtype.kind not in "iuf" for x in arrays):
+        raise TypeError(message)
+    return [x.astype(float) for x in arrays]
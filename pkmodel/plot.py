@@ -1,11 +1,13 @@
 """Plot graphs"""
 
-import matplotlib.pylab as plt
+import concurrent.futures
 import os
 import time
+from pkmodel.decimate import decimate
 
 
-def plot(data: dict, plot_folder: str = "/plots", title: str = ""):
+def plot(data: dict, plot_folder: str = "/plots", title: str = "", headless: bool = False,
+         pixels: int = None) -> str:
 
     """function to plot model outcome and save plots
 
@@ -13,12 +15,38 @@ def plot(data: dict, plot_folder: str = "/plots", title: str = ""):
         data (dict): dictionary storing all plot data
         plot_folder (str): location for plots
         title (str): optional title for the output png doc
+        headless (bool): render on an Agg canvas without pyplot, and never show the figure
+        pixels (int): width in pixels to which the lines are downsampled with `decimate`, keeping the extremes
+            of each pixel column. By default the width of the figure, and with 0 every point is plotted
+
+    Returns:
+        str: path of the saved png
     """
 
+    # matplotlib is slow to import, so it is only loaded once something is plotted
+    if headless:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        # An explicit Figure on an Agg canvas is independent of the global pyplot state
+        fig = Figure()
+        FigureCanvasAgg(fig)
+    else:
+        import matplotlib.pylab as plt
+
+        fig = plt.figure()
+    ax = fig.add_subplot()
+
+    # Long runs have far more time steps than the figure has pixels, so only the points that can be seen are drawn
+    if pixels is None:
+        pixels = int(fig.get_figwidth() * fig.dpi)
+    if pixels > 0:
+        data = decimate(data, pixels)
+
     t = data["t"]
 
     q_c = data["Central"]
-    plt.plot(t, q_c, label="Central")
+    ax.plot(t, q_c, label="Central")
 
     if "Peripheries" in data:
 
@@ -26,7 +54,7 @@ def plot(data: dict, plot_folder: str = "/plots", title: str = ""):
 
         i = 1
         for p in q_p:
-            plt.plot(t, p, label="Peripheral " + str(i))
+            ax.plot(t, p, label="Peripheral " + str(i))
             i += 1
 
     model_type = "Intravenous"
@@ -34,21 +62,56 @@ def plot(data: dict, plot_folder: str = "/plots", title: str = ""):
     if "Dose" in data:
 
         q_d = data["Dose"]
-        plt.plot(t, q_d, label="Dose")
+        ax.plot(t, q_d, label="Dose")
         model_type = "Subcutaneous"
 
-    plt.legend()
-    plt.ylabel('drug mass [ng]')
-    plt.xlabel('time [h]')
+    ax.legend()
+    ax.set_ylabel('drug mass [ng]')
+    ax.set_xlabel('time [h]')
 
-    plt.title("Drug Quantity over Time: " + model_type + " Model")
+    ax.set_title("Drug Quantity over Time: " + model_type + " Model")
 
     if not os.path.exists(plot_folder):
-        os.makedirs(plot_folder)
+        os.makedirs(plot_folder, exist_ok=True)
 
     if title == "":
         title = str(time.strftime("%H%M%S"))
 
     destination = plot_folder + "/" + model_type.lower() + "_" + title + ".png"
-    plt.savefig(destination)
-    plt.show()
+    fig.savefig(destination)
+
+    if not headless:
+        plt.show()
+        plt.close(fig)
+
+    return destination
+
+
+def plot_many(data: list[dict], plot_folder: str = "/plots", titles: list[str] = None,
+              max_workers: int = None, pixels: int = None) -> list[str]:
+
+    """function to render many model outcomes headlessly in a pool of worker processes
+
+    Args:
+        data (list[dict]): dictionaries storing the plot data of each outcome
+        plot_folder (str): location for plots
+        titles (list[str]): titles for the output png docs, by default the index of each outcome
+        max_workers (int): number of worker processes, by default one per CPU. With 1, the plots are
+            rendered in the current process
+        pixels (int): width in pixels to which the lines are downsampled, as for `plot`
+
+    Returns:
+        list[str]: paths of the saved pngs, in the order of `data`
+    """
+
+    if titles is None:
+        titles = [str(i) for i in range(len(data))]
+    if len(titles) != len(data):
+        raise ValueError("There must be exactly one title for each outcome")
+
+    if max_workers == 1:
+        return [plot(d, plot_folder, title, headless=True, pixels=pixels) for d, title in zip(data, titles)]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(plot, d, plot_folder, title, True, pixels) for d, title in zip(data, titles)]
+        return [future.result() for future in futures]
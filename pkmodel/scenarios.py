@@ -0,0 +1,233 @@
+#
+# Batch runs of scenario files
+#
+import concurrent.futures
+import csv
+import json
+import os
+import numpy as np
+from pkmodel.main import build_model, run_model
+
+
+# The parameters of a scenario, with the values used when neither the scenario nor the command line gives them.
+# These are the defaults of simulation.py
+DEFAULTS = {
+    "model_type": None,
+    "clearance": 1.0,
+    "dose_rate": 1.0,
+    "dose_on": 0,
+    "dose_off": 0,
+    "V_central": 1.0,
+    "n_peripheries": 1,
+    "V_peripheries": None,
+    "Q_peripheries": None,
+    "drug_volume": 1.0,
+    "drug_absorption": 1.0,
+    "run_time": 1.0,
+    "time_step": 1.0,
+    "title": "",
+}
+
+_TYPES = {
+    "model_type": str,
+    "clearance": float,
+    "dose_rate": float,
+    "dose_on": int,
+    "dose_off": int,
+    "V_central": float,
+    "n_peripheries": int,
+    "V_peripheries": list,
+    "Q_peripheries": list,
+    "drug_volume": float,
+    "drug_absorption": float,
+    "run_time": float,
+    "time_step": float,
+    "title": str,
+}
+
+
+def load_scenarios(path: str) -> list[dict]:
+    """Reads the scenarios of a JSON, CSV or YAML file
+
+    A JSON or YAML file holds a list of scenarios, each a mapping from the parameter names of `DEFAULTS` to
+    values. A CSV file has one scenario per row, with the parameter names as its header. Empty cells are left
+    out, and lists such as V_peripheries are written as "[1.0, 2.0]".
+
+    :param path: The path of a .json, .csv, .yaml or .yml file
+    :return: A list of dictionaries of parameters, not yet validated
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path) as file:
+            scenarios = json.load(file)
+    elif extension in [".yaml", ".yml"]:
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Reading YAML scenario files needs the PyYAML package")
+        with open(path) as file:
+            scenarios = yaml.safe_load(file)
+    elif extension == ".csv":
+        with open(path, newline="") as file:
+            scenarios = [{key: value for key, value in row.items() if value not in ["", None]}
+                         for row in csv.DictReader(file)]
+    else:
+        raise ValueError("Scenario files must be .json, .csv, .yaml or .yml")
+
+    if not isinstance(scenarios, list) or not all(isinstance(scenario, dict) for scenario in scenarios):
+        raise ValueError("A scenario file must hold a list of scenarios")
+    return scenarios
+
+
+def validate_scenarios(scenarios: list[dict], defaults: dict = None) -> list[dict]:
+    """Checks every scenario before any is run, so that all the problems of a file are reported at once
+
+    :param scenarios: A list of dictionaries of parameters, e.g. from `load_scenarios`. Strings, as read from
+    CSV files, are converted to the type of each parameter
+    :param defaults: Values for the parameters missing from a scenario, e.g. those given on the command line.
+    Defaults to `DEFAULTS`
+    :return: A list of complete dictionaries of parameters, with an untitled scenario titled by its index
+    """
+    defaults = dict(DEFAULTS, **(defaults or {}))
+    validated, problems = [], []
+    for index, scenario in enumerate(scenarios):
+        try:
+            unknown = sorted(set(scenario) - set(DEFAULTS))
+            if unknown:
+                raise ValueError("unknown parameters " + ", ".join(unknown))
+            parameters = dict(defaults)
+            for name, value in scenario.items():
+                parameters[name] = _convert(name, value)
+            if not parameters["title"]:
+                parameters["title"] = "scenario_{}".format(index)
+            build_model(**{name: value for name, value in parameters.items() if name != "title"})
+        except (TypeError, ValueError) as error:
+            problems.append("Scenario {}: {}".format(index, error))
+        else:
+            validated.append(parameters)
+
+    if problems:
+        raise ValueError("\n".join(problems))
+    return validated
+
+
+def _convert(name: str, value):
+    """Converts the value of a parameter to its type, parsing strings read from CSV files
+    """
+    kind = _TYPES[name]
+    if value is None or isinstance(value, kind) and not isinstance(value, bool):
+        return value
+    if kind is list:
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                raise ValueError("{} should be a list of numbers such as [1.0, 2.0]".format(name))
+        if not isinstance(value, list) or not all(isinstance(item, (int, float)) for item in value):
+            raise ValueError("{} should be a list of numbers such as [1.0, 2.0]".format(name))
+        return [float(item) for item in value]
+    if kind is str:
+        return str(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("{} should be a number".format(name))
+    if kind is int:
+        if not number.is_integer():
+            raise ValueError("{} should be an integer".format(name))
+        return int(number)
+    return number
+
+
+def run_scenarios(scenarios: list[dict], output: str, plot_folder: str = None, max_workers: int = None,
+                  chunksize: int = None, progress=None) -> dict:
+    """Solves validated scenarios across a pool of processes and writes their results to one file
+
+    :param scenarios: A list of complete dictionaries of parameters, from `validate_scenarios`
+    :param output: The path of the results file. A .csv file holds one row per scenario and time step, with the
+    scenario index, the time and the drug amount in each compartment. A .npz file holds the arrays of each
+    scenario under keys such as "3/Central", and the scenarios as JSON under "scenarios"
+    :param plot_folder: The folder to plot each scenario into, headless and named by its title. Defaults to None,
+    which draws no plots
+    :param max_workers: The number of worker processes. Defaults to None, which uses one per CPU. With 1, the
+    scenarios run in the current process
+    :param chunksize: The number of scenarios sent to a worker at a time. Defaults to None, which spreads the
+    scenarios over about four chunks per worker
+    :param progress: An optional function called as progress(done, total) after each chunk completes
+    :return: A dictionary from the index of each failed scenario to its error message
+    """
+    if os.path.splitext(output)[1].lower() not in [".csv", ".npz"]:
+        raise ValueError("The results file must be .csv or .npz")
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(scenarios) // (4 * max_workers))
+    indexed = list(enumerate(scenarios))
+    chunks = [indexed[lo:lo + chunksize] for lo in range(0, len(indexed), chunksize)]
+
+    outcomes = []
+    if max_workers == 1:
+        for chunk in chunks:
+            outcomes.extend(_run_chunk(chunk, plot_folder))
+            if progress is not None:
+                progress(len(outcomes), len(scenarios))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_run_chunk, chunk, plot_folder) for chunk in chunks]
+            for future in concurrent.futures.as_completed(futures):
+                outcomes.extend(future.result())
+                if progress is not None:
+                    progress(len(outcomes), len(scenarios))
+
+    outcomes.sort(key=lambda outcome: outcome[0])
+    results = {index: solution for index, solution, _ in outcomes if solution is not None}
+    write_results(output, scenarios, results)
+    return {index: message for index, _, message in outcomes if message is not None}
+
+
+def _run_chunk(chunk: list[tuple[int, dict]], plot_folder: str) -> list[tuple[int, dict, str]]:
+    """Runs a chunk of (index, scenario) pairs in a worker process
+
+    :return: A list of (index, solution, error message) tuples, where either the solution or the message is None.
+    A scenario whose plot cannot be written fails like an invalid one
+    """
+    outcomes = []
+    for index, scenario in chunk:
+        try:
+            solution = run_model(**scenario, plot_folder=plot_folder, render=plot_folder is not None, headless=True)
+        except (OSError, TypeError, ValueError) as error:
+            outcomes.append((index, None, "{}: {}".format(type(error).__name__, error)))
+        else:
+            outcomes.append((index, solution, None))
+    return outcomes
+
+
+def write_results(output: str, scenarios: list[dict], results: dict) -> None:
+    """Writes the solutions of a batch run to one .csv or .npz file, as described in `run_scenarios`
+
+    :param output: The path of the results file
+    :param scenarios: The scenarios of the run
+    :param results: A dictionary from the index of each solved scenario to its solution
+    """
+    if output.lower().endswith(".npz"):
+        arrays = {"scenarios": np.array(json.dumps(scenarios))}
+        for index, solution in results.items():
+            for key, value in solution.items():
+                arrays["{}/{}".format(index, key)] = value
+        np.savez(output, **arrays)
+        return
+
+    # Every scenario gets the same columns, with NaN for the compartments it does not have
+    num_peripheries = max([len(solution["Peripheries"]) for solution in results.values()], default=0)
+    header = ["scenario", "t", "Central", "Dose"] + ["Periphery {}".format(i + 1) for i in range(num_peripheries)]
+    with open(output, "w") as file:
+        file.write(",".join(header) + "\n")
+        for index, solution in results.items():
+            block = np.full((len(solution["t"]), len(header)), np.nan)
+            block[:, 0] = index
+            block[:, 1] = solution["t"]
+            block[:, 2] = solution["Central"]
+            if "Dose" in solution:
+                block[:, 3] = solution["Dose"]
+            block[:, 4:4 + len(solution["Peripheries"])] = np.transpose(solution["Peripheries"])
+            np.savetxt(file, block, delimiter=",", fmt="%.10g")
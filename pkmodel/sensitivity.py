@@ -0,0 +1,201 @@
+#
+# Global sensitivity analysis
+#
+import numpy as np
+from pkmodel.model import Model
+from pkmodel.subcutaneous import Subcutaneous
+
+
+def exposure(solution: dict, parameters: dict) -> np.ndarray:
+    """The default output of a sensitivity analysis: the trapezoidal area under the central concentration curve
+
+    :param solution: A population solution from `solve_population`
+    :param parameters: The parameter arrays of the population, by name
+    :return: The AUC (ng h/mL) of each subject
+    """
+    t, c = solution["t"], solution["Central"] / parameters["V_c"][:, None]
+    return np.sum(np.diff(t) * (c[:, 1:] + c[:, :-1]) / 2, axis=-1)
+
+
+def parameter_names(model: Model) -> list[str]:
+    """The names of the parameters of a model which can be varied over a population: "CL", "V_c", "V_p_1",
+    "Q_p_1", ..., for each periphery, and "k_a" for the Subcutaneous model
+    """
+    names = ["CL", "V_c"] + ["{}_{}".format(name, i + 1) for name in ("V_p", "Q_p")
+                             for i in range(model.num_peripheries)]
+    if isinstance(model, Subcutaneous):
+        names.append("k_a")
+    return names
+
+
+def population_parameters(model: Model, names: list[str], X: np.ndarray) -> dict:
+    """The keyword arrays of `solve_population` for N subjects which vary the named parameters of a template
+
+    :param model: The template model, whose values are used for the parameters which are not named
+    :param names: The varied parameters, from `parameter_names`
+    :param X: Parameter values of shape (N, len(names))
+    :return: A dictionary with the arrays "CL", "V_c", "V_p", "Q_p" and, for the Subcutaneous model, "k_a"
+    """
+    N = len(X)
+    parameters = {"CL": np.full(N, model.CL), "V_c": np.full(N, model.V_c),
+                  "V_p": np.tile(np.array(model.V_p_list, dtype=float), (N, 1)),
+                  "Q_p": np.tile(np.array(model.Q_p_list, dtype=float), (N, 1))}
+    if isinstance(model, Subcutaneous):
+        parameters["k_a"] = np.full(N, model.k_a)
+    for j, name in enumerate(names):
+        if name[:3] in ("V_p", "Q_p"):
+            parameters[name[:3]][:, int(name[4:]) - 1] = X[:, j]
+        else:
+            parameters[name] = X[:, j]
+    return parameters
+
+
+class SensitivityAnalysis:
+    """Sobol and Morris sensitivity analyses of a model output over ranges of its parameters.
+
+    The parameters which can be varied are "CL", "V_c", "V_p_1", "Q_p_1", ..., for each periphery, and "k_a" for
+    the Subcutaneous model. The others keep the values of the template model. Samples are solved in batches with
+    `solve_population`, and every output is cached by its parameter values, so repeated points and repeated
+    analyses reuse earlier evaluations.
+    """
+
+    def __init__(self, model: Model, bounds: dict, output=exposure, chunk_size: int = 1024):
+        """
+        :param model: The template model, whose type, dosing, time settings and fixed parameters are used
+        :param bounds: A dictionary from parameter name to its (lower, upper) bounds
+        :param output: A function output(solution, parameters) returning one value per subject of a population
+        solution, where `parameters` holds the parameter arrays by name. Defaults to `exposure`
+        :param chunk_size: The number of samples solved together, which bounds the temporary memory
+        """
+        names = parameter_names(model)
+        if len(bounds) == 0 or any(name not in names for name in bounds):
+            raise ValueError("Parameters to vary must be chosen from " + ", ".join(names))
+        if any(not lower < upper for lower, upper in bounds.values()):
+            raise ValueError("The lower bound of each parameter must be below its upper bound")
+
+        self.model = model
+        self.names = list(bounds)
+        self.lower = np.array([bounds[name][0] for name in self.names], dtype=float)
+        self.upper = np.array([bounds[name][1] for name in self.names], dtype=float)
+        self.output = output
+        self.chunk_size = chunk_size
+        self._cache = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def evaluate(self, X: np.ndarray) -> np.ndarray:
+        """The output for each row of parameter values, solving only the rows which are not cached
+
+        :param X: Parameter values of shape (N, number of varied parameters), in the order of `names`
+        :return: A numpy array of shape (N,)
+        """
+        X = np.asarray(X, dtype=float)
+        keys = [row.tobytes() for row in X]
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in self._cache and key not in missing:
+                missing[key] = i
+        self.stats["hits"] += len(keys) - len(missing)
+        self.stats["misses"] += len(missing)
+
+        rows = list(missing.values())
+        for lo in range(0, len(rows), self.chunk_size):
+            chunk = rows[lo:lo + self.chunk_size]
+            for key, value in zip((keys[i] for i in chunk), self._solve(X[chunk])):
+                self._cache[key] = value
+        return np.array([self._cache[key] for key in keys])
+
+    def _solve(self, X: np.ndarray) -> np.ndarray:
+        """Solves a batch of samples with `solve_population` and applies the output function
+        """
+        model = self.model
+        parameters = population_parameters(model, self.names, X)
+        solution = type(model).solve_population(
+            **parameters, run_time=model.run_time, time_step_length=model.time_step_length,
+            dosing_schedule=model.dosing_schedule, chunk_size=self.chunk_size
+        )
+        return self.output(solution, parameters)
+
+    def _scale(self, U: np.ndarray) -> np.ndarray:
+        """Maps points of the unit hypercube onto the parameter bounds
+        """
+        return self.lower + U * (self.upper - self.lower)
+
+    def sobol(self, num_samples: int = 1024, num_bootstrap: int = 100, confidence: float = 0.95,
+              seed: int = None) -> dict:
+        """First-order and total Sobol indices from a Saltelli design of N (d + 2) evaluations, for d varied
+        parameters. The indices use the Saltelli (2010) and Jansen estimators, and their confidence intervals
+        come from resampling the N base samples
+
+        :param num_samples: The number N of base samples, ideally a power of 2
+        :param num_bootstrap: The number of bootstrap resamples for the confidence intervals
+        :param confidence: The confidence level of the intervals
+        :param seed: A seed for the scrambled Sobol sequence and the bootstrap
+        :return: A dictionary with the parameter "names", the first-order indices "S1" and total indices "ST",
+        each of shape (d,), and their intervals "S1_conf" and "ST_conf", of shape (d, 2)
+        """
+        # scipy.stats is slow to import, so it is only loaded when samples are drawn
+        from scipy.stats import qmc
+
+        d = len(self.names)
+        U = qmc.Sobol(d=2 * d, scramble=True, seed=seed).random(num_samples)
+        A, B = self._scale(U[:, :d]), self._scale(U[:, d:])
+        AB = np.repeat(A[None], d, axis=0)
+        AB[np.arange(d), :, np.arange(d)] = B.T
+
+        f = self.evaluate(np.concatenate([A, B, AB.reshape(-1, d)]))
+        f_A, f_B, f_AB = f[:num_samples], f[num_samples:2 * num_samples], f[2 * num_samples:].reshape(d, -1)
+
+        def indices(rows):
+            variance = np.var(np.concatenate([f_A[rows], f_B[rows]]))
+            first = np.mean(f_B[rows] * (f_AB[:, rows] - f_A[rows]), axis=-1) / variance
+            total = 0.5 * np.mean((f_A[rows] - f_AB[:, rows]) ** 2, axis=-1) / variance
+            return first, total
+
+        S1, ST = indices(np.arange(num_samples))
+        rng = np.random.default_rng(seed)
+        resampled = [indices(rng.integers(num_samples, size=num_samples)) for _ in range(num_bootstrap)]
+        bounds = [50 * (1 - confidence), 50 * (1 + confidence)]
+        S1_conf = np.percentile([first for first, _ in resampled], bounds, axis=0).T
+        ST_conf = np.percentile([total for _, total in resampled], bounds, axis=0).T
+        return {"names": self.names, "S1": S1, "ST": ST, "S1_conf": S1_conf, "ST_conf": ST_conf}
+
+    def morris(self, num_trajectories: int = 50, num_levels: int = 4, num_bootstrap: int = 100,
+               confidence: float = 0.95, seed: int = None) -> dict:
+        """Morris elementary effects from r one-at-a-time trajectories on a grid of levels, with r (d + 1)
+        evaluations. The effects are measured in units of each parameter's range
+
+        :param num_trajectories: The number r of trajectories
+        :param num_levels: The number of grid levels of each parameter, an even number of at least 2
+        :param num_bootstrap: The number of bootstrap resamples of the trajectories for the confidence intervals
+        :param confidence: The confidence level of the intervals
+        :param seed: A seed for the trajectories and the bootstrap
+        :return: A dictionary with the parameter "names", the mean effect "mu", the mean absolute effect
+        "mu_star" and the standard deviation "sigma" of the effects, each of shape (d,), and the interval
+        "mu_star_conf", of shape (d, 2)
+        """
+        if num_levels < 2 or num_levels % 2 != 0:
+            raise ValueError("num_levels must be an even number of at least 2")
+        d, r = len(self.names), num_trajectories
+        rng = np.random.default_rng(seed)
+        delta = num_levels / (2 * (num_levels - 1))
+
+        # Each trajectory starts on the grid where every step of +delta or -delta stays in the unit hypercube,
+        # and then moves the parameters one at a time in a random order
+        base = rng.integers(num_levels // 2, size=(r, d)) / (num_levels - 1)
+        direction = rng.choice([-1.0, 1.0], size=(r, d))
+        order = np.argsort(rng.random((r, d)), axis=-1)
+        start = base + delta * (direction < 0)
+        moves = np.zeros((r, d + 1, d))
+        moves[np.arange(r)[:, None], np.arange(1, d + 1), order] = delta * np.take_along_axis(direction, order, -1)
+        U = start[:, None, :] + np.cumsum(moves, axis=1)
+
+        f = self.evaluate(self._scale(U.reshape(-1, d))).reshape(r, d + 1)
+        effects = np.empty((r, d))
+        np.put_along_axis(effects, order, np.diff(f, axis=-1) / (delta * np.take_along_axis(direction, order, -1)),
+                          axis=-1)
+
+        resampled = [np.abs(effects[rng.integers(r, size=r)]).mean(axis=0) for _ in range(num_bootstrap)]
+        bounds = [50 * (1 - confidence), 50 * (1 + confidence)]
+        return {"names": self.names, "mu": effects.mean(axis=0), "mu_star": np.abs(effects).mean(axis=0),
+                "sigma": effects.std(axis=0, ddof=1) if r > 1 else np.zeros(d),
+                "mu_star_conf": np.percentile(resampled, bounds, axis=0).T}
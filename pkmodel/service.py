@@ -0,0 +1,381 @@
+#
+# Asyncio simulation service
+#
+# Run with ``python -m pkmodel.service --port 8765`` or ``--socket /tmp/pkmodel.sock``. Clients send one JSON
+# request per line, {"id": ..., "parameters": {...}}, where the parameters are those of `main.run_model` as in a
+# scenario file. The response to each request is streamed back as JSON lines with the same id: blocks of the
+# solution, with "t" and the drug amount in each compartment, and then {"id": ..., "done": true, "metrics": {...}},
+# or a single {"id": ..., "error": "..."}. The solutions are exact, from `solve_population`, rather than the RK45
+# integration of `run_model`, so they differ from those of simulation.py by up to its solver tolerances.
+#
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import json
+import os
+import time
+import numpy as np
+from pkmodel.scenarios import validate_scenarios
+from pkmodel.sweep import MODEL_TYPES
+
+
+# The largest line the server and client read, as a block of a streamed solution is sent on one line
+LINE_LIMIT = 2 ** 24
+
+
+class _Request:
+    """A validated request waiting for its solution
+    """
+
+    def __init__(self, request_id, parameters: dict, received: float, future: asyncio.Future):
+        self.id = request_id
+        self.parameters = parameters
+        self.received = received
+        self.future = future
+        self.batch_size = 0
+        self.solve_start = None
+        self.solve_end = None
+
+        # Requests can share a vectorized solve when only their compartment parameters differ
+        self.key = tuple(parameters[name] for name in ("model_type", "dose_rate", "dose_on", "dose_off", "run_time",
+                                                       "time_step", "n_peripheries"))
+
+
+class SimulationService:
+    """A server which solves models for clients over a local TCP or Unix socket
+
+    Requests that arrive within `window` seconds of each other are coalesced, and those with the same model type,
+    dosing, time settings and number of peripheries are solved together with `solve_population`, so that many small
+    requests share the cost of one vectorized solve. The solves run in a pool of worker processes, and at most one
+    batch per worker is in flight. Once `max_pending` requests are waiting, the server stops reading from the
+    clients until they are taken, and every block of a response waits for the client to accept the previous one.
+    """
+
+    def __init__(self, window: float = 0.005, max_batch: int = 256, max_pending: int = 1024, max_workers: int = None,
+                 chunk_size: int = 4096):
+        """
+        :param window: The time (s) to wait for further requests after the first of a batch arrives
+        :param max_batch: The largest number of requests coalesced at once
+        :param max_pending: The number of requests which may wait to be batched before reading is paused
+        :param max_workers: The number of worker processes. Defaults to None, which uses one per CPU. With 1, the
+        solves run in a thread of the current process
+        :param chunk_size: The number of time steps in each streamed block of a response
+        """
+        if window < 0:
+            raise ValueError("window must be non-negative")
+        if max_batch < 1 or max_pending < 1 or chunk_size < 1:
+            raise ValueError("max_batch, max_pending and chunk_size must be positive")
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.chunk_size = chunk_size
+
+        # The latency metrics of the most recent requests
+        self.metrics = collections.deque(maxlen=10000)
+        self.address = None
+        self._server = None
+        self._executor = None
+        self._tasks = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, path: str = None) -> None:
+        """Starts listening, on a Unix socket if `path` is given and otherwise on a TCP port
+
+        :param host: The TCP host
+        :param port: The TCP port. Defaults to 0, which picks a free port. The address is left in `address`
+        :param path: The path of a Unix socket
+        """
+        self._queue = asyncio.Queue(self.max_pending)
+        self._slots = asyncio.Semaphore(self.max_workers)
+        if self.max_workers == 1:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        else:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+        self._spawn(self._collect())
+
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=path, limit=LINE_LIMIT)
+            self.address = path
+        else:
+            self._server = await asyncio.start_server(self._handle, host=host, port=port, limit=LINE_LIMIT)
+            self.address = self._server.sockets[0].getsockname()[:2]
+
+    async def close(self) -> None:
+        """Stops listening, cancels the work in progress and shuts the worker pool down
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> "SimulationService":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def latency_summary(self) -> dict:
+        """Summarises the latency (s) of the recent requests, from receipt to the end of their response
+
+        :return: A dictionary with the "count" of requests and the "mean", "p50", "p95" and "max" latencies
+        """
+        latencies = np.array([metrics["latency"] for metrics in self.metrics])
+        if len(latencies) == 0:
+            return {"count": 0}
+        p50, p95 = np.percentile(latencies, [50, 95])
+        return {"count": len(latencies), "mean": float(latencies.mean()), "p50": float(p50), "p95": float(p95),
+                "max": float(latencies.max())}
+
+    def _spawn(self, coroutine) -> asyncio.Task:
+        """Runs a coroutine as a task which is cancelled by `close`
+        """
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Reads the requests of one client, and starts a response for each
+        """
+        lock = asyncio.Lock()
+        responses = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received = time.perf_counter()
+                request_id = None
+                try:
+                    message = json.loads(line)
+                    request_id = message.get("id")
+                    parameters = validate_scenarios([message.get("parameters", {})])[0]
+                except (AttributeError, TypeError, ValueError) as error:
+                    await self._send(writer, lock, {"id": request_id, "error": str(error)})
+                    continue
+
+                request = _Request(request_id, parameters, received, asyncio.get_running_loop().create_future())
+                # While max_pending requests are waiting, this blocks, and the client is no longer read
+                await self._queue.put(request)
+                responses.append(self._spawn(self._respond(request, writer, lock)))
+            await asyncio.gather(*responses, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _collect(self) -> None:
+        """Gathers the queued requests into batches, and solves each group of compatible requests together
+        """
+        while True:
+            batch = [await self._queue.get()]
+            if self.window > 0:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            groups = collections.defaultdict(list)
+            for request in batch:
+                groups[request.key].append(request)
+            for group in groups.values():
+                # At most one batch per worker is in flight, so the queue fills up when the workers fall behind
+                await self._slots.acquire()
+                self._spawn(self._solve(group))
+
+    async def _solve(self, group: list[_Request]) -> None:
+        """Solves a group of compatible requests in the worker pool
+        """
+        start = time.perf_counter()
+        try:
+            solutions = await asyncio.get_running_loop().run_in_executor(
+                self._executor, solve_batch, [request.parameters for request in group])
+        except Exception as error:
+            for request in group:
+                if not request.future.done():
+                    request.future.set_exception(error)
+        else:
+            end = time.perf_counter()
+            for request, solution in zip(group, solutions):
+                request.batch_size, request.solve_start, request.solve_end = len(group), start, end
+                if not request.future.done():
+                    request.future.set_result(solution)
+        finally:
+            self._slots.release()
+
+    async def _respond(self, request: _Request, writer: asyncio.StreamWriter, lock: asyncio.Lock) -> None:
+        """Streams the solution of a request back to its client in blocks of time steps
+        """
+        try:
+            solution = await request.future
+        except Exception as error:
+            await self._send(writer, lock, {"id": request.id, "error": "{}: {}".format(type(error).__name__, error)})
+            return
+
+        T = len(solution["t"])
+        for lo in range(0, T, self.chunk_size):
+            block = {key: value[..., lo:lo + self.chunk_size].tolist() for key, value in solution.items()}
+            await self._send(writer, lock, dict(block, id=request.id))
+
+        metrics = {"batch_size": request.batch_size, "queue_time": request.solve_start - request.received,
+                   "solve_time": request.solve_end - request.solve_start,
+                   "latency": time.perf_counter() - request.received}
+        self.metrics.append(metrics)
+        await self._send(writer, lock, {"id": request.id, "done": True, "metrics": metrics})
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, lock: asyncio.Lock, message: dict) -> None:
+        """Writes one line to a client, waiting until the client has taken the earlier ones
+        """
+        async with lock:
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+
+
+def solve_batch(scenarios: list[dict]) -> list[dict]:
+    """Solves scenarios which share their model type, dosing, time settings and number of peripheries with one call
+    to `solve_population`. This runs in the worker processes of `SimulationService`. The solutions are exact, where
+    `run_model` integrates the same model with RK45
+
+    :param scenarios: Validated dictionaries of the parameters of `main.run_model`, from `validate_scenarios`
+    :return: The solution of each scenario, a dictionary like that of `solve_equations`
+    """
+    first = scenarios[0]
+    num_peripheries = first["n_peripheries"]
+    columns = {
+        "CL": [scenario["clearance"] for scenario in scenarios],
+        "V_c": [scenario["V_central"] for scenario in scenarios],
+        "V_p": np.reshape([scenario["V_peripheries"] or [1.0] * num_peripheries for scenario in scenarios],
+                          (len(scenarios), num_peripheries)),
+        "Q_p": np.reshape([scenario["Q_peripheries"] or [1.0] * num_peripheries for scenario in scenarios],
+                          (len(scenarios), num_peripheries)),
+    }
+    if first["model_type"] == "Subcutaneous":
+        columns["k_a"] = [scenario["drug_absorption"] for scenario in scenarios]
+
+    solution = MODEL_TYPES[first["model_type"]].solve_population(
+        **columns, dose_per_time_step=first["dose_rate"], dose_on=first["dose_on"], dose_off=first["dose_off"],
+        run_time=first["run_time"], time_step_length=first["time_step"], chunk_size=len(scenarios)
+    )
+    return [{key: value if key == "t" else np.ascontiguousarray(value[i]) for key, value in solution.items()}
+            for i in range(len(scenarios))]
+
+
+class SimulationClient:
+    """A client of `SimulationService`, which can have many requests in flight over one connection
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count()
+        self._pending = {}
+        self._closed = False
+        # The metrics of the last request whose response was completed
+        self.last_metrics = None
+        self._listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, address) -> "SimulationClient":
+        """Connects to a service
+
+        :param address: The `address` of the service: the path of a Unix socket, or a (host, port) pair
+        """
+        if isinstance(address, str):
+            reader, writer = await asyncio.open_unix_connection(address, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(*address, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def stream(self, parameters: dict):
+        """Sends a request, and yields the blocks of its solution as they arrive
+
+        :param parameters: The parameters of `main.run_model` to override, as in a scenario file
+        :return: An asynchronous generator of dictionaries with "t" and the drug amount in each compartment for
+        the next block of time steps. A ValueError is raised if the service rejects the request, and a
+        ConnectionError if the connection closes before the response is complete
+        """
+        if self._closed:
+            raise ConnectionError("The connection to the service is closed")
+        request_id = next(self._ids)
+        messages = asyncio.Queue()
+        self._pending[request_id] = messages
+        self._writer.write(json.dumps({"id": request_id, "parameters": parameters}).encode() + b"\n")
+        await self._writer.drain()
+        try:
+            while True:
+                message = await messages.get()
+                if message.get("closed"):
+                    raise ConnectionError("The connection to the service closed before the response was complete")
+                if "error" in message:
+                    raise ValueError(message["error"])
+                if message.get("done"):
+                    self.last_metrics = message["metrics"]
+                    return
+                del message["id"]
+                yield {key: np.array(value) for key, value in message.items()}
+        finally:
+            del self._pending[request_id]
+
+    async def simulate(self, parameters: dict) -> dict:
+        """Sends a request and waits for its whole solution
+
+        :param parameters: The parameters of `main.run_model` to override, as in a scenario file
+        :return: A dictionary like that of `solve_equations`
+        """
+        blocks = [block async for block in self.stream(parameters)]
+        return {key: np.concatenate([block[key] for block in blocks], axis=-1) for key in blocks[0]}
+
+    async def close(self) -> None:
+        """Closes the connection
+        """
+        self._listener.cancel()
+        self._writer.close()
+        await asyncio.gather(self._listener, return_exceptions=True)
+
+    async def _listen(self) -> None:
+        """Passes each line from the service to the request with its id. When the connection ends, every request
+        still waiting is told so
+        """
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get("id") in self._pending:
+                    await self._pending[message["id"]].put(message)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._closed = True
+            for messages in self._pending.values():
+                messages.put_nowait({"closed": True})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve pkmodel simulations over a local socket")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument("--socket", default=None, help="path of a Unix socket to listen on instead of TCP")
+    parser.add_argument("--window", type=float, default=0.005, help="time (s) over which requests are coalesced")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    async def serve():
+        service = SimulationService(window=args.window, max_workers=args.workers)
+        await service.start(host=args.host, port=args.port, path=args.socket)
+        print("Serving on {}".format(service.address))
+        async with service:
+            await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
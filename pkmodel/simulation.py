@@ -1,152 +1,229 @@
+import cProfile
 import getopt
+import json
 import sys
 import os
+import pstats
 import re
-from pkmodel.main import run_model
 
 
-CL = 1.0
-dose = 1.0
-dose_on = 0
-dose_off = 0
-Vc = 1.0
-N = 1
-Vp = None
-Qp = None
-V0 = 1.0
-absorption = 1.0
-run_time = 1.0
-t = 1.0
-plot = "/plots"
-title = ""
-
 dirname = os.path.dirname(os.path.realpath(__file__))
 list_regex = r"^\[-?\d+(?:\.\d+)?(?:,\s*-?\d+(?:\.\d+)?)*\]$"
 
-argv = sys.argv[1:]
-try:
-    options, args = getopt.getopt(argv, "hm:c:d:s:e:v:n:V:Q:D:a:r:t:f:T:",
-                                  [
-                                      "help",
-                                      "model-type=",
-                                      "clearance=",
-                                      "dose-rate=",
-                                      "dose-on=",
-                                      "dose-off=",
-                                      "V-central=",
-                                      "n-peripheries=",
-                                      "V-peripheries=",
-                                      "Q-peripheries=",
-                                      "drug-volume=",
-                                      "drug-absorption=",
-                                      "run-time=",
-                                      "time-step=",
-                                      "plot-folder=",
-                                      "title=",
-                                  ])
-except:
-    print("Error: incorrect arguments provided. Use '--help' option for help.")
-    sys.exit()
-if len(options) == 0:
-    print("Error: incorrect arguments provided. Use '--help' option for help.")
-    sys.exit()
 
-names = list(zip(*options))[0]
-if not ('-m' in names or '--model-type' in names or "-h" in names or "--help" in names):
-    print("Error: model type has to be specified. Available options: "
-          + "'Intravenous', 'Subcutaneous'. Choose '--help' option for help")
-    sys.exit()
+def main():
+    """Parses the command-line options and runs the model, or a batch of scenarios
+    """
+    CL = 1.0
+    dose = 1.0
+    dose_on = 0
+    dose_off = 0
+    Vc = 1.0
+    N = 1
+    Vp = None
+    Qp = None
+    V0 = 1.0
+    absorption = 1.0
+    run_time = 1.0
+    t = 1.0
+    plot = "/plots"
+    title = ""
+    render = True
+    headless = False
+    profile = False
+    scenarios = None
+    output = None
+    workers = None
+
+    argv = sys.argv[1:]
+    try:
+        options, args = getopt.getopt(argv, "hm:c:d:s:e:v:n:V:Q:D:a:r:t:f:T:",
+                                      [
+                                          "help",
+                                          "model-type=",
+                                          "clearance=",
+                                          "dose-rate=",
+                                          "dose-on=",
+                                          "dose-off=",
+                                          "V-central=",
+                                          "n-peripheries=",
+                                          "V-peripheries=",
+                                          "Q-peripheries=",
+                                          "drug-volume=",
+                                          "drug-absorption=",
+                                          "run-time=",
+                                          "time-step=",
+                                          "plot-folder=",
+                                          "title=",
+                                          "no-plot",
+                                          "headless",
+                                          "profile",
+                                          "scenarios=",
+                                          "output=",
+                                          "workers=",
+                                      ])
+    except:
+        print("Error: incorrect arguments provided. Use '--help' option for help.")
+        sys.exit()
+    if len(options) == 0:
+        print("Error: incorrect arguments provided. Use '--help' option for help.")
+        sys.exit()
 
-for name, value in options:
-    if name in ['-h', '--help']:
+    names = list(zip(*options))[0]
+    if "-h" in names or "--help" in names:
         with open(dirname + "/docs.txt", "r") as file:
-            text = file.read()
+            print(file.read())
         sys.exit()
-    elif name in ['-m', '--model-type']:
-        if value in ["Intravenous", "Subcutaneous"]:
-            m = value
-        else:
-            print("Error: unrecognised model type. Available options: 'Intravenous', 'Subcutaneous'")
-            sys.exit()
-    elif name in ['-c', '--clearance']:
-        try:
-            CL = float(value)
-        except:
-            print("Error: clearance value should be Int or Float")
-            sys.exit()
-    elif name in ['-d', '--dose-rate']:
-        try:
-            dose = float(value)
-        except:
-            print("Error: dose rate value should be Int or Float")
-            sys.exit()
-    elif name in ['-s', '--dose-on']:
-        try:
-            dose_on = int(value)
-        except:
-            print("Error: dose on value should be Int")
-            sys.exit()
-    elif name in ['-e', '--dose-off']:
-        try:
-            dose_off = int(value)
-        except:
-            print("Error: dose off value should be Int")
-            sys.exit()
-    elif name in ['-v', '--V-central']:
-        try:
-            Vc = float(value)
-        except:
-            print("Error: volume of the central compartment should be Int or Float")
-            sys.exit()
-    elif name in ['-n', '--n-peripheries']:
-        try:
-            print("V", value)
-            N = int(value)
-        except:
-            print("Error: number of peripheries value should be Int")
-            sys.exit()
-    elif name in ['-V', '--V-peripheries']:
-        if bool(re.search(list_regex, value)):
-            Vp = eval(value)
-        else:
-            print("Error: expected a list of Floats or Ints for compartment volumes")
-            sys.exit()
-    elif name in ['-Q', '--Q-peripheries']:
-        if bool(re.search(list_regex, value)):
-            Qp = eval(value)
-        else:
-            print("Error: expected a list of Floats or Ints for flux rates")
-            sys.exit()
-    elif name in ['-D', '--drug-volume']:
-        try:
-            V0 = float(value)
-        except:
-            print("Error: volume of the drug compartment should be Int or Float")
-            sys.exit()
-    elif name in ['-a', '--drug-absorption']:
-        try:
-            absorption = float(value)
-        except:
-            print("Error: drug absorption rate value should be Int or Float")
-            sys.exit()
-    elif name in ['-r', '--run-time']:
-        try:
-            run_time = float(value)
-        except:
-            print("Error: run time length should be Int or Float")
-            sys.exit()
-    elif name in ['-t', '--time-step']:
+    if not ('-m' in names or '--model-type' in names or '--scenarios' in names):
+        print("Error: model type has to be specified. Available options: "
+              + "'Intravenous', 'Subcutaneous'. Choose '--help' option for help")
+        sys.exit()
+
+    # The solver and plotting dependencies are only imported once a model is actually going to be run
+    from pkmodel.main import run_model
+    from pkmodel.instrumentation import add_callback
+
+    # With --profile, the runs are profiled and the report is printed along with the statistics of each solve
+    profiler = cProfile.Profile()
+    stats = []
+    if "--profile" in names:
+        profile = True
+        add_callback(stats.append)
+        profiler.enable()
+
+    for name, value in options:
+        if name in ['-m', '--model-type']:
+            if value in ["Intravenous", "Subcutaneous"]:
+                m = value
+            else:
+                print("Error: unrecognised model type. Available options: 'Intravenous', 'Subcutaneous'")
+                sys.exit()
+        elif name in ['-c', '--clearance']:
+            try:
+                CL = float(value)
+            except:
+                print("Error: clearance value should be Int or Float")
+                sys.exit()
+        elif name in ['-d', '--dose-rate']:
+            try:
+                dose = float(value)
+            except:
+                print("Error: dose rate value should be Int or Float")
+                sys.exit()
+        elif name in ['-s', '--dose-on']:
+            try:
+                dose_on = int(value)
+            except:
+                print("Error: dose on value should be Int")
+                sys.exit()
+        elif name in ['-e', '--dose-off']:
+            try:
+                dose_off = int(value)
+            except:
+                print("Error: dose off value should be Int")
+                sys.exit()
+        elif name in ['-v', '--V-central']:
+            try:
+                Vc = float(value)
+            except:
+                print("Error: volume of the central compartment should be Int or Float")
+                sys.exit()
+        elif name in ['-n', '--n-peripheries']:
+            try:
+                print("V", value)
+                N = int(value)
+            except:
+                print("Error: number of peripheries value should be Int")
+                sys.exit()
+        elif name in ['-V', '--V-peripheries']:
+            if bool(re.search(list_regex, value)):
+                Vp = json.loads(value)
+            else:
+                print("Error: expected a list of Floats or Ints for compartment volumes")
+                sys.exit()
+        elif name in ['-Q', '--Q-peripheries']:
+            if bool(re.search(list_regex, value)):
+                Qp = json.loads(value)
+            else:
+                print("Error: expected a list of Floats or Ints for flux rates")
+                sys.exit()
+        elif name in ['-D', '--drug-volume']:
+            try:
+                V0 = float(value)
+            except:
+                print("Error: volume of the drug compartment should be Int or Float")
+                sys.exit()
+        elif name in ['-a', '--drug-absorption']:
+            try:
+                absorption = float(value)
+            except:
+                print("Error: drug absorption rate value should be Int or Float")
+                sys.exit()
+        elif name in ['-r', '--run-time']:
+            try:
+                run_time = float(value)
+            except:
+                print("Error: run time length should be Int or Float")
+                sys.exit()
+        elif name in ['-t', '--time-step']:
+            try:
+                t = float(value)
+            except:
+                print("Error: time step size should be Int or Float")
+                sys.exit()
+        elif name in ['-f', '--plot-folder']:
+            plot = value
+        elif name in ['-T', '--title']:
+            title = value
+        elif name == '--no-plot':
+            render = False
+        elif name == '--headless':
+            headless = True
+        elif name == '--scenarios':
+            scenarios = value
+        elif name == '--output':
+            output = value
+        elif name == '--workers':
+            try:
+                workers = int(value)
+            except:
+                print("Error: number of workers should be Int")
+                sys.exit()
+
+    if scenarios is None:
+        run_model(model_type=m, clearance=CL, dose_rate=dose, dose_on=dose_on, dose_off=dose_off,
+                  V_central=Vc, n_peripheries=N, V_peripheries=Vp, Q_peripheries=Qp,
+                  drug_volume=V0, drug_absorption=absorption, run_time=run_time, time_step=t,
+                  plot_folder=dirname + "/" + plot, title=title, render=render, headless=headless)
+    else:
+        # In batch mode, the options given on the command line are the defaults of every scenario in the file
+        from pkmodel.scenarios import load_scenarios, run_scenarios, validate_scenarios
+
+        defaults = dict(clearance=CL, dose_rate=dose, dose_on=dose_on, dose_off=dose_off, V_central=Vc,
+                        n_peripheries=N, V_peripheries=Vp, Q_peripheries=Qp, drug_volume=V0,
+                        drug_absorption=absorption, run_time=run_time, time_step=t)
+        if '-m' in names or '--model-type' in names:
+            defaults["model_type"] = m
+        if output is None:
+            output = os.path.splitext(scenarios)[0] + "_results.csv"
         try:
-            t = float(value)
-        except:
-            print("Error: time step size should be Int or Float")
-            sys.exit()
-    elif name in ['-f', '--plot-folder']:
-        plot = value
-    elif name in ['-T', '--title']:
-        title = value
+            batch = validate_scenarios(load_scenarios(scenarios), defaults)
+            failures = run_scenarios(batch, output, plot_folder=dirname + "/" + plot if render else None,
+                                     max_workers=workers)
+        except (OSError, ValueError) as error:
+            print("Error: " + str(error))
+            sys.exit(1)
+        for index, message in failures.items():
+            print("Error: scenario {} failed. {}".format(index, message))
+        print("Ran {} scenarios, results written to {}".format(len(batch) - len(failures), output))
+
+    if profile:
+        profiler.disable()
+        for solve in stats:
+            print(solve)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+
 
-    run_model(model_type=m, clearance=CL, dose_rate=dose, dose_on=dose_on, dose_off=dose_off,
-              V_central=Vc, n_peripheries=N, V_peripheries=Vp, Q_peripheries=Qp,
-              drug_volume=V0, drug_absorption=absorption, run_time=run_time, time_step=t,
-              plot_folder=dirname + "/" + plot, title=title)
+# The scenario workers re-import this script under the spawn and forkserver start methods, so nothing may run on import
+if __name__ == "__main__":
+    main()
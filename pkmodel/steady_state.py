@@ -0,0 +1,126 @@
+#
+# Steady-state and superposition engine for periodic dosing
+#
+import numpy as np
+from pkmodel.analytic import LinearPropagator
+from pkmodel.dosing import Bolus
+from pkmodel.model import Model
+
+
+def cycle_map(model: Model) -> np.ndarray:
+    """The exact affine map of one dosing cycle, y((k + 1) T) = Phi y(k T) + c, where y(k T) is the state at the
+    start of cycle k, just before its doses
+
+    :param model: A model with a periodic dosing schedule
+    :return: The (n + 1) x (n + 1) numpy array [[Phi, c], [0, 1]]
+    """
+    import scipy.linalg
+
+    schedule = model.dosing_schedule
+    if schedule.period is None:
+        raise ValueError("A dosing cycle requires a periodic dosing schedule")
+
+    A, b = model.system_matrix(), model.dose_vector()
+    n = len(b)
+    boundaries, rates, bolus_amounts = schedule.pieces(0.0, schedule.period)
+
+    # The map is built up piece by piece from the augmented system [[A, b u], [0, 0]], whose last
+    # column carries the dosing input. The bolus at the end of the period belongs to the next cycle
+    cycle = np.eye(n + 1)
+    for i in range(len(boundaries) - 1):
+        jump = np.eye(n + 1)
+        jump[:n, n] = b * bolus_amounts[i]
+        M = np.zeros((n + 1, n + 1))
+        M[:n, :n] = A
+        M[:n, n] = b * rates[i]
+        cycle = scipy.linalg.expm(M * (boundaries[i + 1] - boundaries[i])) @ jump @ cycle
+    return cycle
+
+
+def state_after_cycles(model: Model, num_cycles: int, y0: np.ndarray = None) -> np.ndarray:
+    """The state at the start of cycle `num_cycles`, from the geometric series
+    y(k T) = Phi^k y0 + (I + Phi + ... + Phi^(k - 1)) c, evaluated with a matrix power of the cycle map
+
+    :param model: A model with a periodic dosing schedule
+    :param num_cycles: The number of complete dosing cycles
+    :param y0: The state at time 0. Defaults to None, in which case the model's initial state is used
+    :return: A numpy array with the drug amount in each compartment
+    """
+    if not isinstance(num_cycles, int):
+        raise TypeError("num_cycles must be an int")
+    if num_cycles < 0:
+        raise ValueError("num_cycles must be non-negative")
+    if y0 is None:
+        y0 = model.initial_state()
+
+    cycle = np.linalg.matrix_power(cycle_map(model), num_cycles)
+    return cycle[:-1, :-1] @ y0 + cycle[:-1, -1]
+
+
+def periodic_steady_state(model: Model) -> np.ndarray:
+    """The state at the start of every dosing cycle once the drug has accumulated to its periodic steady state,
+    y_ss = (I - Phi)^-1 c, which is the limit of the geometric series of `state_after_cycles`. For a single
+    infusion that never stops, this is the constant steady state -A^-1 b u
+
+    :param model: A model with a periodic dosing schedule that repeats indefinitely, or a constant infusion
+    :return: A numpy array with the drug amount in each compartment, just before the doses of a cycle
+    """
+    schedule = model.dosing_schedule
+    if schedule.num_cycles is not None:
+        raise ValueError("A steady state requires the dosing cycles to repeat indefinitely, without num_cycles")
+    if schedule.period is None:
+        starts, stops, rates = schedule.infusions(0.0, np.inf)
+        times, _ = schedule.boluses(0.0, np.inf)
+        if len(times) > 0 or len(rates) != 1 or starts[0] != 0 or np.isfinite(stops[0]):
+            raise ValueError("A steady state requires a periodic dosing schedule or a constant infusion")
+        Phi, c = model.system_matrix(), model.dose_vector() * rates[0]
+        identity = np.zeros_like(Phi)
+    else:
+        cycle = cycle_map(model)
+        Phi, c = cycle[:-1, :-1], cycle[:-1, -1]
+        identity = np.eye(len(c))
+
+    # Without elimination from every compartment, the drug accumulates without bound
+    if model.CL == 0 or np.linalg.cond(identity - Phi) > 1e12:
+        raise ValueError("The model has no steady state, as the drug is not eliminated")
+    return np.linalg.solve(identity - Phi, c)
+
+
+def steady_state_cycle(model: Model, t_eval: np.ndarray = None) -> dict:
+    """Solves one dosing cycle at the periodic steady state
+
+    :param model: A model with a periodic dosing schedule
+    :param t_eval: The times (h) within the cycle at which to evaluate the solution. Defaults to None, in which
+    case one point per time step of the model is used, from 0 to the period inclusive
+    :return: A dictionary like that of `solve_equations`, over one cycle
+    """
+    period = model.dosing_schedule.period
+    if period is None:
+        raise ValueError("A dosing cycle requires a periodic dosing schedule")
+    if t_eval is None:
+        t_eval = np.linspace(0.0, period, 1 + max(int(round(period * 3600 / model.time_step_length)), 1))
+
+    y = model.integrate(np.asarray(t_eval, dtype=float), periodic_steady_state(model), method="analytic")
+    return model.solution_dict(t_eval, y)
+
+
+def superpose(model: Model, doses: list[Bolus], t_eval: np.ndarray) -> dict:
+    """Superposes the single-dose responses of the model to a train of boluses. The model is linear, so the
+    drug amounts are sum_i a_i exp(A (t - t_i)) b over the doses given at times t_i <= t
+
+    :param model: The model whose system matrix and dosed compartment are used. Its dosing schedule is ignored
+    :param doses: A list of `Bolus` objects, with arbitrary times and amounts
+    :param t_eval: A sorted 1D numpy array of times (h) at which to evaluate the solution
+    :return: A dictionary like that of `solve_equations`
+    """
+    if not all(isinstance(dose, Bolus) for dose in doses):
+        raise TypeError("doses must be a list of Bolus objects")
+    t_eval = np.asarray(t_eval, dtype=float)
+    propagator = LinearPropagator(model.system_matrix(), model.dose_vector())
+
+    y = np.zeros(model.initial_state().shape + t_eval.shape)
+    for dose in doses:
+        lo = np.searchsorted(t_eval, dose.time, side="left")
+        if lo < len(t_eval):
+            y[:, lo:] += dose.amount * propagator.evaluate(propagator.b, 0.0, t_eval[lo:] - dose.time)
+    return model.solution_dict(t_eval, y)
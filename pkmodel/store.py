@@ -0,0 +1,108 @@
+#
+# Columnar result store
+#
+import json
+import os
+import tempfile
+import numpy as np
+
+
+class ResultStore:
+    """An appendable on-disk store of solutions, read back as memory-mapped arrays.
+
+    The store is a directory with one row group per solution. Each column of a solution ("t", "Central",
+    "Peripheries", "Dose") is a file of raw little-endian values, stored with the time axis first so that a
+    solution can be written block by block as it is computed. A JSON manifest records the dtype and shape of
+    every column and the metadata of each row group, and is replaced atomically after each append, so readers
+    never see a partially written row group. A store should have a single writer at a time.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, directory: str, dtype: str = "float64"):
+        """
+        :param directory: The directory of the store. It is created if it does not exist, and an existing store
+        in it is opened for reading and appending
+        :param dtype: "float64", or "float32" to halve the size of the drug amounts. Times are always stored as
+        float64, as float32 cannot resolve one-second steps over long runs
+        """
+        if np.dtype(dtype) not in (np.float64, np.float32):
+            raise ValueError("dtype must be float64 or float32")
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        path = os.path.join(directory, self.MANIFEST)
+        if os.path.exists(path):
+            with open(path) as file:
+                self._groups = json.load(file)["groups"]
+        else:
+            self._groups = []
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __getitem__(self, index: int) -> dict:
+        """The solution of a row group, as read-only memory-mapped arrays with the layout of `solve_equations`
+        """
+        group = self._groups[index]
+        solution = {}
+        for name, column in group["columns"].items():
+            shape = tuple(column["shape"])
+            path = os.path.join(self.directory, group["name"], name + ".bin")
+            if 0 in shape:
+                # An empty column, such as the Peripheries of a model without any, has no bytes to map
+                values = np.zeros(shape, dtype=column["dtype"])
+                values.flags.writeable = False
+            else:
+                values = np.memmap(path, dtype=column["dtype"], mode="r", shape=shape)
+            solution[name] = np.moveaxis(values, 0, -1)
+        return solution
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def metadata(self, index: int) -> dict:
+        """The metadata stored with a row group
+        """
+        return self._groups[index]["metadata"]
+
+    def append(self, solution, metadata: dict = None) -> int:
+        """Writes a solution as a new row group
+
+        :param solution: A dictionary of results from `solve_equations`, or an iterable of such dictionaries
+        covering consecutive blocks of time steps, as from `iter_solution`, which are written as they arrive
+        :param metadata: A JSON-serialisable dictionary stored with the row group, e.g. `model.parameters()`
+        :return: The index of the new row group
+        """
+        if isinstance(solution, dict):
+            solution = [solution]
+        name = "{:06d}".format(len(self._groups))
+        os.makedirs(os.path.join(self.directory, name), exist_ok=True)
+
+        files, columns = {}, {}
+        try:
+            for block in solution:
+                for key, value in block.items():
+                    if key not in files:
+                        dtype = np.dtype("<f8") if key == "t" else self.dtype
+                        files[key] = open(os.path.join(self.directory, name, key + ".bin"), "wb")
+                        columns[key] = {"dtype": dtype.str, "shape": [0] + list(np.shape(value)[:-1])}
+                    values = np.moveaxis(np.asarray(value), -1, 0)
+                    files[key].write(np.ascontiguousarray(values, dtype=columns[key]["dtype"]).tobytes())
+                    columns[key]["shape"][0] += values.shape[0]
+        finally:
+            for file in files.values():
+                file.close()
+
+        self._groups.append({"name": name, "columns": columns, "metadata": metadata or {}})
+        self._save_manifest()
+        return len(self._groups) - 1
+
+    def _save_manifest(self) -> None:
+        """Writes the manifest under a temporary name and then renames it, as in `SolutionCache`
+        """
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".json.tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump({"version": 1, "groups": self._groups}, file)
+        os.replace(temporary, os.path.join(self.directory, self.MANIFEST))
@@ -1,11 +1,12 @@
 import numpy as np
-import scipy
-from model import Model
+from pkmodel.model import Model
+from pkmodel.continuation import SolverState
 
 #
 # Subcutaneous class
 #
 from pkmodel.compartment import Dose
+from pkmodel.dosing import DosingSchedule
 
 
 class Subcutaneous(Model):
@@ -16,7 +17,7 @@ class Subcutaneous(Model):
                  dose_off: int = 0, V_c: float = 1.0, num_peripheries: int = 1,
                  V_p_list: list[float] = None, Q_p_list: list[float] = None,
                  V_0: float = 1.0, absorption_rate: float = 1.0,
-                 run_time: float = 1.0, time_step_length: float = 1.0):
+                 run_time: float = 1.0, time_step_length: float = 1.0, dosing_schedule: DosingSchedule = None):
         """
         :param V_0: The volume (mL) of the Dose compartment
         :param absorption_rate: The rate (/h) at which the substance is absorbed from the
@@ -33,7 +34,12 @@ class Subcutaneous(Model):
             raise TypeError("Dose compartment volume and absorption rate must be floats")
 
         super().__init__(clearance_rate, dose_per_time_step, dose_on, dose_off, V_c, num_peripheries, V_p_list,
-                         Q_p_list, run_time, time_step_length)
+                         Q_p_list, run_time, time_step_length, dosing_schedule)
+
+    def parameters(self) -> dict:
+        """The validated parameters of the model, including those of the Dose compartment
+        """
+        return dict(super().parameters(), V_0=self.V_0, k_a=self.k_a)
 
     def add_compartments(self) -> None:
 
@@ -42,52 +48,102 @@ class Subcutaneous(Model):
         self.compartments["Dose"] = Dose(self.V_0, self.k_a)
 
     def rhs_ode(self, t: np.array, y: list[np.array]):
-        """This method returns a list of right-hand sides for the ODEs defined in the intravenous
+        """This method returns the right-hand sides for the ODEs defined in the intravenous
         model. This will include one central compartment equation and some periphery equations
 
         :param t: A numpy array of time steps for the problem
         :param y: A list of numpy arrays for each compartment. The first element is for the Dose compartment,
         the second is for the Central compartment and the last elements are for Periphery data
-        :return:
+        :return: A numpy array with the rate of change of the drug amount in each compartment
         """
-        q_0, q_c, q_p_list = y[0], y[1], y[2:]
-        X = self.X
-
-        # This is adapting prototype.py to make a list of transitions for each periphery compartment
-        # instead of just one transition, using a list comprehension
-        transition_list = [self.Q_p_list[i] * (q_c / self.V_c - q_p_list[i] / self.V_p_list[i])
-                           for i in range(len(q_p_list))]
-
-        # The dose_on compartment ODE
-        dq0_dt = self.dosing(t, X) - self.k_a * q_0
-
-        # The central compartment ODE
-        dqc_dt = self.k_a * q_0 - q_c / self.V_c * self.CL - sum(transition_list)
-
-        # A list of periphery compartment ODEs
-        dqp_dt_list = transition_list
-        return [dq0_dt] + [dqc_dt] + dqp_dt_list
+        # The ODEs are linear, so the right-hand side is a single matrix-vector product with the system matrix,
+        # plus the dosing rate into the first compartment
+        dy_dt = self.rhs_operator() @ y
+        dy_dt[0] += self.dosing(t)
+        return dy_dt
 
-    def solve_equations(self) -> dict:
-        """Here we use the Intravenous ODE model to solve the problem
+    def initial_state(self) -> np.ndarray:
+        """All compartments initially contain no drug
 
-        :return: A dictionary of numpy arrays containing the amount of drug in each compartment for each time step
+        :return: A numpy array with zeros for the Dose, Central and each Periphery compartment
         """
-        # Here we set up the time steps, and we set all initial compartment drug amount to zero
+        return np.zeros(2 + self.num_peripheries)
 
-        num_time_steps = int(self.run_time * 3600 / self.time_step_length)
-        t_eval = np.linspace(0, self.run_time, num_time_steps)
+    def system_matrix(self) -> np.ndarray:
+        """The subcutaneous ODEs are linear in the compartment amounts, dy/dt = A y + dosing(t) e_0, where the
+        state y is ordered as in `rhs_ode`
 
-        # This must contain initial data for all the peripheries
-        y0 = np.array([0.0] * (2 + self.num_peripheries))
+        :return: The matrix A of the Dose, Central and Periphery compartments
+        """
+        return self.batch_system_matrix(self.CL, self.V_c, self.V_p_list, self.Q_p_list, self.k_a)
+
+    def solve_equations(self, method: str = "RK45", start: SolverState = None) -> dict:
+        """Here we use the Subcutaneous ODE model to solve the problem
+
+        :param method: "analytic" for the exact matrix-exponential solution, "fixed-step" for the exact solution at
+        multiples of time_step_length, or a `scipy.integrate.solve_ivp` method
+        :param start: A `SolverState` to continue from, such as the `state` of an earlier solve. The run then
+        covers run_time hours from start.t, and its first time step is the start state. Defaults to None, which
+        starts from no drug at time 0
+        :return: A dictionary of numpy arrays containing the amount of drug in each compartment for each time step.
+        The statistics of the solve are left in `stats` and passed to the instrumentation callbacks, and the state
+        at the last time step is left in `state`
+        """
+        t_eval, y = self._run(method, start)
+        return self._output(t_eval, y)
 
-        solution = scipy.integrate.solve_ivp(
-            fun=lambda t, y: self.rhs_ode(t, y),
-            t_span=[t_eval[0], t_eval[-1]],
-            y0=y0, t_eval=t_eval
-        )
+    def solution_dict(self, t: np.ndarray, y: np.ndarray) -> dict:
+        """This returns the solution as a dictionary containing the time steps and the
+        different drug amounts over time for each compartment
 
-        # This returns the solution as a dictionary containing the time steps and the
-        # different drug amounts over time for each compartment
-        return {"t": solution.t, "Dose": solution.y[0], "Central": solution.y[1],
-                "Peripheries": solution.y[2:]}
+        :param t: A numpy array of time steps
+        :param y: A numpy array of drug amounts, of shape (..., compartments, time steps)
+        """
+        return {"t": t, "Dose": y[..., 0, :], "Central": y[..., 1, :],
+                "Peripheries": y[..., 2:, :]}
+
+    @classmethod
+    def solve_population(cls, CL, V_c, V_p=None, Q_p=None, k_a=1.0, dose_per_time_step: float = 1.0,
+                         dose_on: int = 0, dose_off: int = 0, run_time: float = 1.0, time_step_length: float = 1.0,
+                         dosing_schedule: DosingSchedule = None, chunk_size: int = 1024) -> dict:
+        """Solves the Subcutaneous model exactly for a population of N subjects in one call. The parameter arrays
+        are validated as a whole, and all subjects are propagated together with array operations instead of
+        constructing and solving one model per subject
+
+        :param CL: The clearance rates (mL/h), a float or an array of shape (N,)
+        :param V_c: The central compartment volumes (mL), a float or an array of shape (N,)
+        :param V_p: The periphery compartment volumes (mL), an array of shape (N, P). Defaults to no peripheries
+        :param Q_p: The periphery transition rates (mL/h), an array of shape (N, P)
+        :param k_a: The absorption rates (/h), a float or an array of shape (N,)
+        :param chunk_size: The number of subjects propagated together, which bounds the temporary memory
+        :return: A dictionary like that of `solve_equations`, whose entries are views of a single
+        (N, compartments, time steps) array: "Dose" and "Central" have shape (N, T) and "Peripheries" (N, P, T)
+        """
+        k_a = np.asarray(k_a)
+        if k_a.dtype.kind not in "iuf":
+            raise TypeError("Dose compartment volume and absorption rate must be floats")
+        if k_a.ndim > 1 or not np.all(k_a >= 0) or not np.all(np.isfinite(k_a)):
+            raise ValueError("Fluxes must be non-negative and volumes must be positive")
+        CL, V_c, V_p, Q_p = cls.population_arrays(CL, V_c, V_p, Q_p, k_a.shape)
+        k_a = np.broadcast_to(k_a.astype(float), CL.shape)
+
+        template = cls(dose_per_time_step=dose_per_time_step, dose_on=dose_on, dose_off=dose_off,
+                       num_peripheries=V_p.shape[-1], run_time=run_time, time_step_length=time_step_length,
+                       dosing_schedule=dosing_schedule)
+        A = cls.batch_system_matrix(CL, V_c, V_p, Q_p, k_a)
+        return cls._solve_population(template, A, chunk_size)
+
+    @classmethod
+    def batch_system_matrix(cls, CL: np.ndarray, V_c: np.ndarray, V_p: np.ndarray, Q_p: np.ndarray,
+                            k_a: np.ndarray) -> np.ndarray:
+        """Builds the Dose, Central and Periphery system matrices for many parameter sets at once
+
+        :return: A numpy array of shape (N, 2 + num_peripheries, 2 + num_peripheries)
+        """
+        k_a = np.asarray(k_a, dtype=float)
+        n = 2 + np.shape(V_p)[-1]
+        A = np.zeros(k_a.shape + (n, n))
+        A[..., 0, 0] = -k_a
+        A[..., 1, 0] = k_a
+        A[..., 1:, 1:] = cls.batch_central_matrix(CL, V_c, V_p, Q_p)
+        return A
@@ -0,0 +1,143 @@
+#
+# Parallel parameter sweeps
+#
+import concurrent.futures
+import itertools
+import os
+import numpy as np
+from pkmodel.intravenous import Intravenous
+from pkmodel.subcutaneous import Subcutaneous
+
+
+MODEL_TYPES = {"Intravenous": Intravenous, "Subcutaneous": Subcutaneous}
+
+
+class SweepResult:
+    """The stacked solutions of a parameter sweep
+    """
+
+    def __init__(self, parameters: list[dict], t: np.ndarray, data: dict, errors: dict):
+        """
+        :param parameters: The parameter dictionaries of the sweep, in order
+        :param t: The time steps shared by every solution
+        :param data: A dictionary with the keys of `solve_equations` (other than "t"), each holding an array with
+        a leading axis of length len(parameters). The rows of failed parameter sets are filled with NaN
+        :param errors: A dictionary from the index of each failed parameter set to its error message
+        """
+        self.parameters = parameters
+        self.t = t
+        self.data = data
+        self.errors = errors
+
+    @property
+    def succeeded(self) -> np.ndarray:
+        """A boolean numpy array which is True for the parameter sets that were solved
+        """
+        succeeded = np.ones(len(self.parameters), dtype=bool)
+        succeeded[list(self.errors)] = False
+        return succeeded
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        if key == "t":
+            return self.t
+        return self.data[key]
+
+
+def parameter_grid(**axes) -> list[dict]:
+    """Builds the list of parameter dictionaries for every combination of the given values
+
+    :param axes: Model constructor arguments, each with a list of values, e.g.
+    parameter_grid(clearance_rate=[1.0, 2.0], V_c=[1.0, 2.0, 3.0]) gives 6 parameter dictionaries
+    :return: A list of parameter dictionaries, with the last argument varying fastest
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def run_sweep(model_type: str, parameters, method: str = "RK45", max_workers: int = None,
+              chunksize: int = None, progress=None) -> SweepResult:
+    """Solves a model for many parameter sets across a pool of processes
+
+    Parameter sets which the model rejects with a TypeError or ValueError do not stop the sweep, but are
+    recorded in the `errors` of the result.
+
+    :param model_type: "Intravenous" or "Subcutaneous"
+    :param parameters: A list of dictionaries of model constructor arguments, or a dictionary of lists of
+    values, which is expanded with `parameter_grid`
+    :param method: The solver method, passed to `solve_equations`
+    :param max_workers: The number of worker processes. Defaults to None, which uses one per CPU. With 1, the
+    sweep runs in the current process
+    :param chunksize: The number of parameter sets sent to a worker at a time. Defaults to None, which
+    spreads the parameter sets over about four chunks per worker
+    :param progress: An optional function called as progress(done, total) after each chunk completes
+    :return: A `SweepResult` with the solutions stacked along a leading parameter-set axis
+    """
+    if model_type not in MODEL_TYPES:
+        raise ValueError("Unrecognised model type. Available options: " + ", ".join(MODEL_TYPES))
+    if isinstance(parameters, dict):
+        parameters = parameter_grid(**parameters)
+    parameters = list(parameters)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(parameters) // (4 * max_workers))
+    indexed = list(enumerate(parameters))
+    chunks = [indexed[lo:lo + chunksize] for lo in range(0, len(indexed), chunksize)]
+
+    outcomes = []
+    if max_workers == 1:
+        for chunk in chunks:
+            outcomes.extend(_solve_chunk(model_type, chunk, method))
+            if progress is not None:
+                progress(len(outcomes), len(parameters))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_solve_chunk, model_type, chunk, method) for chunk in chunks]
+            for future in concurrent.futures.as_completed(futures):
+                outcomes.extend(future.result())
+                if progress is not None:
+                    progress(len(outcomes), len(parameters))
+
+    return _stack(parameters, sorted(outcomes, key=lambda outcome: outcome[0]))
+
+
+def _solve_chunk(model_type: str, chunk: list[tuple[int, dict]], method: str) -> list[tuple[int, dict, str]]:
+    """Solves a chunk of (index, parameters) pairs in a worker process
+
+    :return: A list of (index, solution, error message) tuples, where either the solution or the message is None
+    """
+    outcomes = []
+    for index, parameters in chunk:
+        try:
+            model = MODEL_TYPES[model_type](**parameters)
+        except (TypeError, ValueError) as error:
+            outcomes.append((index, None, "{}: {}".format(type(error).__name__, error)))
+        else:
+            outcomes.append((index, model.solve_equations(method=method), None))
+    return outcomes
+
+
+def _stack(parameters: list[dict], outcomes: list[tuple[int, dict, str]]) -> SweepResult:
+    """Stacks the solutions of a sweep into one array per compartment
+    """
+    errors = {index: message for index, _, message in outcomes if message is not None}
+    solutions = [solution for _, solution, _ in outcomes if solution is not None]
+    if len(solutions) == 0:
+        return SweepResult(parameters, np.zeros(0), {}, errors)
+
+    reference = solutions[0]
+    if any(solution["Peripheries"].shape != reference["Peripheries"].shape
+           or not np.array_equal(solution["t"], reference["t"]) for solution in solutions):
+        raise ValueError("Every parameter set of a sweep must have the same run_time, time_step_length "
+                         + "and num_peripheries to stack the solutions")
+
+    data = {}
+    for key, value in reference.items():
+        if key == "t":
+            continue
+        data[key] = np.full((len(parameters),) + value.shape, np.nan)
+        for index, solution, _ in outcomes:
+            if solution is not None:
+                data[key][index] = solution[key]
+    return SweepResult(parameters, reference["t"], data, errors)
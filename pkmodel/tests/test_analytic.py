@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import scipy
+import scipy.sparse
+import pkmodel as pk
+
+
+def test_intravenous_bolus_matches_closed_form():
+    """Test if a single dose into one compartment decays exponentially at the rate CL / V_c
+    """
+    model = pk.Intravenous(clearance_rate=2.0, dose_per_time_step=3.0, V_c=4.0, num_peripheries=0)
+    solution = model.solve_equations(method="analytic")
+    expected = 3.0 * np.exp(-0.5 * solution["t"])
+    np.testing.assert_allclose(solution["Central"], expected, rtol=1e-12)
+
+
+def test_subcutaneous_repeated_rates_matches_closed_form():
+    """Test if the solver copes with a defective system matrix, where k_a equals CL / V_c
+    """
+    model = pk.Subcutaneous(num_peripheries=0)
+    solution = model.solve_equations(method="analytic")
+    t = solution["t"]
+    np.testing.assert_allclose(solution["Dose"], np.exp(-t), atol=1e-12)
+    np.testing.assert_allclose(solution["Central"], t * np.exp(-t), atol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        pk.Intravenous(dose_on=1, dose_off=0, num_peripheries=2, V_p_list=[1.0, 2.0], Q_p_list=[1.0, 3.0]),
+        pk.Intravenous(clearance_rate=0, dose_on=4, dose_off=2, time_step_length=20),
+        pk.Subcutaneous(dose_on=3, dose_off=5, num_peripheries=1, time_step_length=10),
+        pk.Subcutaneous(dose_on=1, dose_off=0, num_peripheries=2, absorption_rate=5.0),
+    ]
+)
+def test_analytic_matches_tight_numerical_solution(model):
+    """Test if the analytic solution agrees with a tightly converged numerical integration
+    """
+    solution = model.solve_equations(method="analytic")
+    t = solution["t"]
+    reference = scipy.integrate.solve_ivp(
+        fun=model.rhs_ode, t_span=[t[0], t[-1]], y0=model.initial_state(), t_eval=t,
+        max_step=1e-3, rtol=1e-10, atol=1e-12
+    )
+    np.testing.assert_allclose(solution["Central"], reference.y[-1 - model.num_peripheries], atol=1e-8)
+
+
+@pytest.mark.parametrize("num_peripheries", [12, 150])
+def test_many_peripheries(num_peripheries):
+    """Test if models with many tissue compartments, including ones with a sparse right-hand side, are solved
+    consistently by the numerical and analytic solvers
+    """
+    V_p_list = list(np.linspace(0.5, 5.0, num_peripheries))
+    Q_p_list = list(np.linspace(0.1, 2.0, num_peripheries))
+    model = pk.Intravenous(dose_on=1, num_peripheries=num_peripheries, V_p_list=V_p_list, Q_p_list=Q_p_list,
+                           time_step_length=60)
+    assert scipy.sparse.issparse(model.rhs_operator()) == (num_peripheries >= 128)
+
+    numerical = model.solve_equations(method="LSODA")
+    exact = model.solve_equations(method="analytic")
+    assert exact["Peripheries"].shape == (num_peripheries, 60)
+    np.testing.assert_allclose(numerical["Central"], exact["Central"], atol=1e-4)
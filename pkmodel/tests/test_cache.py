@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.cache import SolutionCache, solution_key
+
+
+def test_key_depends_on_parameters_schedule_and_solver():
+    """Test if identical runs share a key, and any change of model, dosing or solver changes it
+    """
+    key = solution_key(pk.Intravenous(clearance_rate=1), method="RK45")
+    assert key == solution_key(pk.Intravenous(clearance_rate=1.0), method="RK45")
+    assert key != solution_key(pk.Intravenous(clearance_rate=2.0), method="RK45")
+    assert key != solution_key(pk.Subcutaneous(clearance_rate=1.0), method="RK45")
+    assert key != solution_key(pk.Intravenous(clearance_rate=1.0), method="analytic")
+    schedule = pk.DosingSchedule([pk.Bolus(0.5, 1.0)])
+    assert key != solution_key(pk.Intravenous(clearance_rate=1.0, dosing_schedule=schedule), method="RK45")
+
+
+def test_memory_hits_and_lru_eviction():
+    """Test if repeated runs are served from memory, and the least recently used solution is evicted first
+    """
+    models = [pk.Intravenous(clearance_rate=rate, time_step_length=60) for rate in [1.0, 2.0, 3.0]]
+    size = sum(value.nbytes for value in models[0].solve_equations(method="analytic").values())
+    cache = SolutionCache(max_bytes=2 * size)
+
+    first = cache.solve(models[0], method="analytic")
+    assert cache.solve(models[0], method="analytic") is first
+    cache.solve(models[1], method="analytic")
+    cache.solve(models[0], method="analytic")
+    cache.solve(models[2], method="analytic")
+
+    stats = cache.stats
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 3, 1, 2)
+    assert stats["bytes"] == 2 * size
+    cache.solve(models[1], method="analytic")
+    assert cache.stats["misses"] == 4
+    with pytest.raises(ValueError):
+        first["Central"][0] = 1.0
+
+
+def test_disk_store_is_shared_between_caches(tmp_path):
+    """Test if a solution stored on disk by one cache is found by another one
+    """
+    model = pk.Subcutaneous(time_step_length=60)
+    expected = SolutionCache(directory=str(tmp_path)).solve(model, method="analytic")
+
+    other = SolutionCache(directory=str(tmp_path))
+    solution = other.solve(model, method="analytic")
+    assert other.stats["disk_hits"] == 1
+    assert other.stats["misses"] == 0
+    for name in expected:
+        np.testing.assert_array_equal(solution[name], expected[name])
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_cached_run_can_be_continued(tmp_path, on_disk):
+    """Test if a hit restores the model's state, and a continuation from a SolverState is cached under its own key
+    """
+    schedule = pk.DosingSchedule([pk.Bolus(0.0, 1.0)], period=0.5)
+    model = pk.Intravenous(time_step_length=60, dosing_schedule=schedule)
+    cache = SolutionCache(directory=str(tmp_path))
+    cache.solve(model, method="analytic")
+    first = model.state
+    if on_disk:
+        cache.clear()
+
+    model.state = None
+    cache.solve(model, method="analytic")
+    assert model.state.t == first.t and model.state.dosing_time == first.dosing_time
+    np.testing.assert_array_equal(model.state.y, first.y)
+
+    continued = cache.solve(model, method="analytic", start=model.state)
+    expected = pk.Intravenous(time_step_length=60, dosing_schedule=schedule)
+    expected.solve_equations(method="analytic")
+    expected = expected.solve_equations(method="analytic", start=expected.state)
+    np.testing.assert_allclose(continued["Central"], expected["Central"])
+    assert solution_key(model, start=first) != solution_key(model, start=first.restart_dosing())
+    assert solution_key(model, method="analytic", rtol=np.float64(1e-6)) == \
+        solution_key(model, method="analytic", rtol=1e-6)
+
+
+def test_unhashable_solver_setting_is_rejected():
+    """Test if a setting that cannot identify a run is rejected with a clear error
+    """
+    with pytest.raises(TypeError, match="cannot be part of a cache key"):
+        solution_key(pk.Intravenous(), method=object())
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path, monkeypatch):
+    """Test if the temporary file is removed when a solution cannot be written
+    """
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(np, "savez", fail)
+    with pytest.raises(OSError):
+        SolutionCache(directory=str(tmp_path)).solve(pk.Intravenous(time_step_length=60), method="analytic")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+import scipy.linalg
+import pkmodel as pk
+from pkmodel.continuation import SolverState
+
+
+@pytest.mark.parametrize("method", ["analytic", "fixed-step", "RK45"])
+@pytest.mark.parametrize(
+    "model",
+    [
+        pk.Intravenous(num_peripheries=2, V_p_list=[1.0, 2.0], Q_p_list=[2.0, 0.5], dose_on=70, dose_off=110,
+                       time_step_length=60, run_time=2.0),
+        pk.Subcutaneous(num_peripheries=1, time_step_length=60, run_time=2.0,
+                        dosing_schedule=pk.DosingSchedule([pk.Bolus(0.0, 2.0)], period=1.5)),
+    ]
+)
+def test_extended_run_matches_single_run(model, method):
+    """Test if continuing from the state of a finished run gives the solution of one run over both, keeping the
+    dosing cycles in phase and applying boluses at the checkpoint only once
+    """
+    first = model.solve_equations(method=method)
+    checkpoint = model.state
+    assert checkpoint.t == first["t"][-1] == 2.0 and checkpoint.dosing_time == 2.0
+    np.testing.assert_array_equal(checkpoint.y[-1], first["Peripheries"][-1, -1])
+
+    second = model.solve_equations(method=method, start=checkpoint)
+    t = second["t"]
+    assert t[0] == 2.0 and t[-1] == 4.0 and model.state.t == 4.0
+
+    y = model.integrate(np.insert(t, 0, 0.0), model.initial_state(), method="analytic")[:, 1:]
+    expected = model.solution_dict(t, y)
+    tolerance = {"rtol": 1e-9, "atol": 1e-12} if method != "RK45" else {"rtol": 1e-3, "atol": 1e-5}
+    for name, values in expected.items():
+        np.testing.assert_allclose(second[name], values, **tolerance)
+
+
+def test_branch_restarts_dosing_at_checkpoint():
+    """Test if a different regimen started from a checkpoint gives its bolus at the checkpoint and then decays
+    """
+    model = pk.Intravenous(num_peripheries=1, dose_on=30, dose_off=30, time_step_length=60, run_time=3.0)
+    model.solve_equations(method="analytic")
+    branch = pk.Intravenous(num_peripheries=1, dose_per_time_step=5.0, time_step_length=60, run_time=1.0)
+    solution = branch.solve_equations(method="analytic", start=model.state.restart_dosing())
+
+    y0 = model.state.y + np.array([5.0, 0.0])
+    expected = np.stack([scipy.linalg.expm(branch.system_matrix() * (t - 3.0)) @ y0 for t in solution["t"]], -1)
+    np.testing.assert_allclose(solution["Central"], expected[0], rtol=1e-10)
+    assert branch.state.dosing_time == pytest.approx(1.0)
+
+
+def test_iter_solution_continues_like_solve_equations():
+    """Test if streaming from a checkpoint gives the same blocks and final state as solving from it at once
+    """
+    model = pk.Subcutaneous(dose_on=20, dose_off=50, time_step_length=30, run_time=1.0)
+    model.solve_equations(method="analytic")
+    checkpoint = model.state
+    solution = model.solve_equations(method="analytic", start=checkpoint)
+    final = model.state
+
+    blocks = list(model.iter_solution(chunk_size=25, method="analytic", start=checkpoint))
+    for name, values in solution.items():
+        np.testing.assert_allclose(np.concatenate([block[name] for block in blocks], axis=-1), values,
+                                   rtol=1e-12, atol=1e-15)
+    assert model.state.t == pytest.approx(final.t)
+    np.testing.assert_allclose(model.state.y, final.y, rtol=1e-12)
+
+
+def test_dosing_phase_and_invalid_start():
+    """Test if the dosing phase locates a state within its cycle, and if a state of the wrong size is rejected
+    """
+    state = SolverState(5.0, np.zeros(2), 3.5)
+    assert state.dosing_phase(pk.DosingSchedule([pk.Bolus(0.0, 1.0)], period=1.0)) == pytest.approx(0.5)
+    assert state.dosing_phase(pk.DosingSchedule([pk.Bolus(0.0, 1.0)])) == 3.5
+    with pytest.raises(ValueError):
+        pk.Subcutaneous().solve_equations(start=state)
+    with pytest.raises(TypeError):
+        pk.Intravenous().solve_equations(start=np.zeros(2))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.decimate import decimate, lttb_indices
+
+
+@pytest.fixture(scope="module")
+def cyclic():
+    model = pk.Subcutaneous(num_peripheries=2, dose_on=300, dose_off=1500, time_step_length=1, run_time=12.0)
+    return model.solve_equations(method="fixed-step")
+
+
+def test_minmax_keeps_every_cycle_peak_and_trough(cyclic):
+    """Test if min/max downsampling keeps the ends, the extremes of every line in every pixel column, and the peak
+    of every dosing cycle
+    """
+    reduced = decimate(cyclic, pixels=500)
+    assert len(reduced["t"]) <= 4 * 500 * 4
+    assert reduced["t"][0] == cyclic["t"][0] and reduced["t"][-1] == cyclic["t"][-1]
+    assert reduced["Peripheries"].shape == (2, len(reduced["t"]))
+
+    size = -(-len(cyclic["t"]) // 500)
+    columns, kept_columns = np.arange(len(cyclic["t"])) // size, np.searchsorted(cyclic["t"], reduced["t"]) // size
+    for name in ["Dose", "Central"]:
+        for column in range(columns[-1] + 1):
+            values, kept = cyclic[name][columns == column], reduced[name][kept_columns == column]
+            assert kept.max() == values.max() and kept.min() == values.min()
+
+    cycles = np.floor(cyclic["t"] / 0.5)
+    peaks = [np.max(cyclic["Dose"][cycles == cycle]) for cycle in range(24)]
+    assert set(peaks) <= set(reduced["Dose"])
+
+
+def test_lttb_keeps_the_requested_number_of_points(cyclic):
+    """Test if LTTB keeps the end points and one point per bucket, and decimation leaves short data unchanged
+    """
+    indices = lttb_indices(cyclic["t"], cyclic["Central"], 200)
+    assert len(indices) == 200 and indices[0] == 0 and indices[-1] == len(cyclic["t"]) - 1
+    assert np.all(np.diff(indices) > 0)
+
+    reduced = decimate(cyclic, pixels=200, method="lttb")
+    assert len(reduced["t"]) <= 4 * 200
+    short = pk.Intravenous(time_step_length=60).solve_equations()
+    assert decimate(short, pixels=100) is short
+
+
+def test_invalid_decimation(cyclic):
+    """Test if unknown methods and non-positive widths are rejected
+    """
+    with pytest.raises(ValueError):
+        decimate(cyclic, method="mean")
+    with pytest.raises(ValueError):
+        decimate(cyclic, pixels=0)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+
+
+def test_schedule_from_time_steps():
+    """Test if the Model dosing parameters are turned into boluses and cyclic infusions of time steps
+    """
+    bolus = pk.DosingSchedule.from_time_steps(2.0, 0, 0, 1.0)
+    times, amounts = bolus.boluses(0.0, 1.0)
+    np.testing.assert_array_equal(times, [0.0])
+    np.testing.assert_array_equal(amounts, [2.0])
+    assert bolus.rate(0.0) == 0.0
+
+    cyclic = pk.DosingSchedule.from_time_steps(2.0, 2, 1, 36.0)
+    np.testing.assert_allclose(cyclic.rate([0.0, 0.019, 0.021, 0.029, 0.031]), [2.0, 2.0, 0.0, 0.0, 2.0])
+    np.testing.assert_allclose(cyclic.event_times(0.0, 0.05), [0.02, 0.03])
+
+
+def test_cycles_are_limited_by_num_cycles():
+    """Test if a schedule stops repeating after num_cycles
+    """
+    schedule = pk.DosingSchedule([pk.Bolus(0.5, 1.0), pk.Infusion(0.0, 0.25, 3.0)], period=1.0, num_cycles=2)
+    times, _ = schedule.boluses(0.0, 10.0)
+    np.testing.assert_array_equal(times, [0.5, 1.5])
+    np.testing.assert_array_equal(schedule.rate([0.1, 1.1, 2.1]), [3.0, 3.0, 0.0])
+
+
+@pytest.mark.parametrize("method", ["RK45", "LSODA", "analytic"])
+def test_bolus_is_not_lost(method):
+    """Test if a single dose at time 0 is applied as a jump in the state, whatever the solver
+    """
+    model = pk.Intravenous(clearance_rate=2.0, dose_per_time_step=3.0, num_peripheries=0, time_step_length=60)
+    solution = model.solve_equations(method=method)
+    np.testing.assert_allclose(solution["Central"], 3.0 * np.exp(-2.0 * solution["t"]), rtol=1e-2)
+
+
+def test_model_uses_dosing_schedule():
+    """Test if a dosing schedule given to the model replaces the dose_on and dose_off parameters
+    """
+    schedule = pk.DosingSchedule([pk.Infusion(0.0, 0.5, 1.0)])
+    model = pk.Intravenous(clearance_rate=0.0, num_peripheries=0, dose_on=1, dosing_schedule=schedule)
+    solution = model.solve_equations(method="analytic")
+    np.testing.assert_allclose(solution["Central"], np.minimum(solution["t"], 0.5), atol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "build, error",
+    [
+        (lambda: pk.Bolus("0", 1.0), TypeError),
+        (lambda: pk.Bolus(-1.0, 1.0), ValueError),
+        (lambda: pk.Infusion(1.0, 1.0, 1.0), ValueError),
+        (lambda: pk.DosingSchedule([1.0]), TypeError),
+        (lambda: pk.DosingSchedule([pk.Infusion(0.0, 2.0, 1.0)], period=1.0), ValueError),
+        (lambda: pk.Model(dosing_schedule=[pk.Bolus(0.0, 1.0)]), TypeError),
+    ]
+)
+def test_reject_invalid_doses(build, error):
+    """Test if invalid doses and schedules raise the appropriate error
+    """
+    with pytest.raises(error):
+        build()
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.fit import _parameter_vector, _predict, fit
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        pk.Intravenous(clearance_rate=1.5, V_c=2.0, num_peripheries=2, V_p_list=[1.0, 3.0], Q_p_list=[2.0, 0.5],
+                       dose_on=3, dose_off=2, time_step_length=60),
+        pk.Subcutaneous(clearance_rate=1.5, V_c=2.0, num_peripheries=1, V_p_list=[1.0], Q_p_list=[2.0],
+                        absorption_rate=3.0),
+    ]
+)
+def test_sensitivities_match_finite_differences(model):
+    """Test if the forward sensitivities equal central finite differences of the predicted concentrations
+    """
+    theta = np.log(_parameter_vector(model))[None]
+    t = np.linspace(0.1, 1.0, 10)
+    _, sensitivity = _predict(model, theta, t, chunk_size=8)
+
+    for j in range(theta.shape[-1]):
+        h = np.zeros_like(theta)
+        h[0, j] = 1e-6
+        difference = (_predict(model, theta + h, t, 8)[0] - _predict(model, theta - h, t, 8)[0]) / 2e-6
+        np.testing.assert_allclose(sensitivity[..., j], difference, atol=1e-8)
+
+
+def test_batched_fit_recovers_parameters():
+    """Test if every subject of a batch is fitted to the parameters that generated its concentrations
+    """
+    CL, V_c = np.array([1.0, 2.0, 0.7]), np.array([2.0, 1.0, 1.5])
+    V_p, Q_p = np.array([[1.0], [3.0], [2.0]]), np.array([[2.0], [0.5], [1.0]])
+    population = pk.Intravenous.solve_population(CL, V_c, V_p, Q_p, run_time=4.0, time_step_length=60)
+    concentrations = population["Central"] / V_c[:, None]
+
+    guess = pk.Intravenous(clearance_rate=1.2, V_c=1.5, num_peripheries=1, V_p_list=[1.5], Q_p_list=[1.0])
+    result = fit(guess, population["t"], concentrations)
+
+    assert np.all(result.converged)
+    np.testing.assert_allclose(result["CL"], CL, rtol=1e-6)
+    np.testing.assert_allclose(result["V_c"], V_c, rtol=1e-6)
+    np.testing.assert_allclose(result["V_p"], V_p, rtol=1e-6)
+    np.testing.assert_allclose(result["Q_p"], Q_p, rtol=1e-6)
+
+
+def test_fit_absorption_with_missing_observations():
+    """Test if k_a is fitted for the Subcutaneous model when some observations are missing
+    """
+    model = pk.Subcutaneous(clearance_rate=0.8, V_c=2.0, num_peripheries=0, absorption_rate=3.0, run_time=6.0,
+                            time_step_length=60)
+    solution = model.solve_equations(method="analytic")
+    concentrations = solution["Central"] / 2.0
+    concentrations[::3] = np.nan
+
+    guess = pk.Subcutaneous(clearance_rate=1.0, V_c=1.5, num_peripheries=0, absorption_rate=2.0)
+    result = fit(guess, solution["t"], concentrations)
+    np.testing.assert_allclose([result["CL"][0], result["V_c"][0], result["k_a"][0]], [0.8, 2.0, 3.0], rtol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "model, t, concentrations",
+    [
+        (pk.Intravenous(), [0.0, 1.0], [[1.0, 1.0, 1.0]]),
+        (pk.Intravenous(), [1.0, 0.0], [1.0, 1.0]),
+        (pk.Intravenous(num_peripheries=1, Q_p_list=[0.0]), [0.0, 1.0], [1.0, 1.0]),
+    ]
+)
+def test_reject_invalid_fit(model, t, concentrations):
+    """Test if mismatched observations, unsorted times and non-positive initial parameters raise a ValueError
+    """
+    with pytest.raises(ValueError):
+        fit(model, t, concentrations)
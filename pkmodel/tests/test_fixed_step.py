@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        pk.Intravenous(num_peripheries=2, V_p_list=[1.0, 2.0], Q_p_list=[2.0, 0.5], dose_on=50, dose_off=100,
+                       time_step_length=6, run_time=2.0),
+        pk.Subcutaneous(num_peripheries=1, dose_on=0, dose_off=0, time_step_length=60, run_time=3.0),
+        pk.Subcutaneous(clearance_rate=1.0, V_c=1.0, absorption_rate=1.0, dose_on=3, dose_off=2,
+                        time_step_length=60),
+    ]
+)
+def test_fixed_step_matches_analytic(model):
+    """Test if the fixed-step method gives the exact solution at every time step, including for boluses,
+    cyclic infusions and defective system matrices
+    """
+    solution = model.solve_equations(method="fixed-step")
+    t = solution["t"]
+    np.testing.assert_allclose(np.diff(t), model.time_step_length / 3600)
+    assert t[-1] == pytest.approx(model.run_time)
+    assert model.stats.steps == len(t) - 1
+
+    expected = model.solution_dict(t, model.integrate(t, model.initial_state(), method="analytic"))
+    for name, values in expected.items():
+        np.testing.assert_allclose(solution[name], values, rtol=1e-9, atol=1e-12)
+
+
+def test_fixed_step_iter_solution():
+    """Test if streaming the fixed-step method in chunks gives the same solution as solving it at once
+    """
+    model = pk.Intravenous(num_peripheries=1, dose_on=20, dose_off=40, time_step_length=6)
+    solution = model.solve_equations(method="fixed-step")
+    blocks = list(model.iter_solution(chunk_size=100, method="fixed-step"))
+    for name, values in solution.items():
+        np.testing.assert_allclose(np.concatenate([block[name] for block in blocks], axis=-1), values,
+                                   rtol=1e-12, atol=1e-15)
+
+
+def test_fixed_step_rejects_unaligned_grids():
+    """Test if the fixed-step method refuses time points or dosing events which are not on its time steps
+    """
+    model = pk.Intravenous(dose_on=10, dose_off=20, time_step_length=6)
+    with pytest.raises(ValueError):
+        model.integrate(np.linspace(0, 1, 50), model.initial_state(), method="fixed-step")
+    with pytest.raises(ValueError):
+        model.integrate(np.arange(100) * (5 / 3600), model.initial_state(), method="fixed-step")
@@ -0,0 +1,57 @@
+import pytest
+import pkmodel as pk
+from pkmodel.instrumentation import add_callback, collect, remove_callback, set_step_counting
+
+
+@pytest.mark.parametrize("method", ["RK45", "RK23", "BDF", "analytic"])
+def test_solve_reports_stats(method):
+    """Test if every solve reports its timings, evaluation counts and dosing segments
+    """
+    model = pk.Intravenous(num_peripheries=1, dose_on=50, dose_off=50, time_step_length=6)
+    with collect() as stats:
+        model.solve_equations(method=method)
+
+    assert stats == [model.stats]
+    assert stats[0].method == method and stats[0].model == "Intravenous"
+    assert stats[0].segments == 12 and stats[0].boluses == 0
+    assert min(stats[0].construction_time, stats[0].integration_time, stats[0].output_time) >= 0
+    if method == "analytic":
+        assert stats[0].nfev == 0 and stats[0].steps == 0
+    else:
+        assert stats[0].nfev > 0 and stats[0].steps >= stats[0].segments
+    if method == "BDF":
+        assert stats[0].njev > 0 and stats[0].nlu > 0 and stats[0].rejected_steps is None
+
+
+def test_runge_kutta_step_counts_add_up():
+    """Test if the accepted and rejected steps of RK45 account for all its right-hand side evaluations
+    """
+    model = pk.Subcutaneous(clearance_rate=50.0, absorption_rate=200.0, time_step_length=6)
+    set_step_counting(True)
+    try:
+        model.solve_equations(method="RK45")
+    finally:
+        set_step_counting(False)
+    stats = model.stats
+    assert stats.rejected_steps >= 0
+    assert stats.nfev == 2 * stats.segments + 6 * (stats.steps + stats.rejected_steps)
+
+
+def test_callbacks_can_be_removed():
+    """Test if a callback stops receiving statistics once it is removed
+    """
+    received = []
+    add_callback(received.append)
+    pk.Intravenous().solve_equations(method="analytic")
+    remove_callback(received.append)
+    pk.Intravenous().solve_equations(method="analytic")
+    assert len(received) == 1
+    assert received[0].as_dict()["method"] == "analytic"
+
+
+def test_steps_are_only_counted_on_request():
+    """Test if a numerical solve skips the step-counting event when nobody reads the statistics
+    """
+    model = pk.Intravenous(time_step_length=6)
+    model.solve_equations(method="RK45")
+    assert model.stats.nfev > 0 and model.stats.steps == 0 and model.stats.rejected_steps is None
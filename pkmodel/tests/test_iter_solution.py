@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+
+
+@pytest.mark.parametrize("model_type", [pk.Intravenous, pk.Subcutaneous])
+@pytest.mark.parametrize("chunk_size, method, rtol", [(1, "analytic", 1e-10), (7, "analytic", 1e-10),
+                                                      (1000, "analytic", 1e-10), (16, "RK45", 1e-2)])
+def test_blocks_match_solve_equations(model_type, chunk_size, method, rtol):
+    """Test if the concatenated blocks of iter_solution match the solution of solve_equations
+    """
+    schedule = pk.DosingSchedule([pk.Bolus(0.0, 1.0), pk.Infusion(0.1, 0.15, 5.0)], period=0.25)
+    model = model_type(clearance_rate=2.0, num_peripheries=1, V_p_list=[1.0], Q_p_list=[3.0],
+                       time_step_length=36, dosing_schedule=schedule)
+    expected = model.solve_equations(method=method)
+    blocks = list(model.iter_solution(chunk_size=chunk_size, method=method))
+
+    assert all(len(block["t"]) == chunk_size for block in blocks[:-1])
+    np.testing.assert_array_equal(np.concatenate([block["t"] for block in blocks]), expected["t"])
+    for key in expected:
+        streamed = np.concatenate([block[key] for block in blocks], axis=-1)
+        np.testing.assert_allclose(streamed, expected[key], rtol=rtol, atol=1e-3 * rtol)
+
+
+def test_continuation_does_not_repeat_bolus():
+    """Test if a state which already includes a bolus is not dosed again when the integration continues from it
+    """
+    model = pk.Intravenous(clearance_rate=1.0, num_peripheries=0, dose_per_time_step=2.0)
+    y = model.integrate(np.array([0.0, 0.5]), np.array([2.0]), method="analytic", initial_bolus=False)
+    np.testing.assert_allclose(y[0], 2.0 * np.exp(-np.array([0.0, 0.5])))
+
+
+def test_reject_invalid_chunk_size():
+    """Test if a chunk size which is not a positive int raises the appropriate error
+    """
+    model = pk.Intravenous()
+    with pytest.raises(TypeError):
+        next(model.iter_solution(chunk_size=1.5))
+    with pytest.raises(ValueError):
+        next(model.iter_solution(chunk_size=0))
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        pk.Intravenous(clearance_rate=2.0, V_c=0.5, num_peripheries=2, V_p_list=[1.0, 3.0], Q_p_list=[2.0, 0.5]),
+        pk.Subcutaneous(absorption_rate=4.0, num_peripheries=1, V_p_list=[2.0], Q_p_list=[3.0]),
+    ]
+)
+def test_jacobian_matches_finite_differences(model):
+    """Test if the constant Jacobian agrees with finite differences of the right-hand side
+    """
+    y = np.linspace(1.0, 2.0, len(model.initial_state()))
+    f0 = np.array(model.rhs_ode(0.1, y))
+    columns = [(np.array(model.rhs_ode(0.1, y + 1e-6 * e)) - f0) / 1e-6 for e in np.eye(len(y))]
+    np.testing.assert_allclose(model.jacobian(), np.array(columns).T, atol=1e-6)
+
+
+def test_auto_method_chooses_implicit_integration_for_stiff_models():
+    """Test if a fast absorption rate and a small central volume make `auto` integrate implicitly, and accurately
+    """
+    stiff = pk.Subcutaneous(V_c=0.01, absorption_rate=5000.0, num_peripheries=2, V_p_list=[1.0, 10.0],
+                            Q_p_list=[50.0, 1.0], dose_on=1, run_time=24, time_step_length=60)
+    assert stiff.stiffness_ratio() > 1000
+    assert stiff.select_method() == "BDF"
+    solution = stiff.solve_equations(method="auto")
+    exact = stiff.solve_equations(method="analytic")
+    np.testing.assert_allclose(solution["Central"], exact["Central"], rtol=1e-3, atol=1e-6)
+
+
+def test_auto_method_chooses_explicit_integration_for_default_models():
+    """Test if the default models are not considered stiff
+    """
+    assert pk.Intravenous().select_method() == "RK45"
+    assert pk.Intravenous(clearance_rate=0, num_peripheries=0).stiffness_ratio() == 1.0
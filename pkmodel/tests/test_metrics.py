@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.metrics import NCAMetrics, compute_metrics
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000])
+def test_streamed_metrics_match_dense_solution(chunk_size):
+    """Test if the metrics accumulated block by block match those of the full solution
+    """
+    schedule = pk.DosingSchedule([pk.Bolus(0.0, 1.0), pk.Infusion(0.05, 0.1, 4.0)], period=0.25)
+    model = pk.Subcutaneous(clearance_rate=2.0, V_c=2.0, num_peripheries=1, time_step_length=36,
+                            dosing_schedule=schedule)
+    dense = model.solve_equations(method="analytic")
+    t, c = dense["t"], dense["Central"] / 2.0
+    result = compute_metrics(model, chunk_size=chunk_size, method="analytic")
+
+    np.testing.assert_allclose(result["AUC"], np.sum(np.diff(t) * (c[1:] + c[:-1]) / 2), rtol=1e-12)
+    np.testing.assert_allclose(result["Cmax"], c.max(), rtol=1e-12)
+    assert result["Tmax"] == t[np.argmax(c)]
+    cycles = np.floor(t / 0.25)
+    np.testing.assert_allclose(result["troughs"], [c[cycles == k].min() for k in range(4)], rtol=1e-12, atol=1e-15)
+
+
+def test_single_bolus_metrics():
+    """Test if the exact AUC and terminal half-life of one compartment match their closed forms
+    """
+    model = pk.Intravenous(clearance_rate=2.0, V_c=4.0, dose_per_time_step=3.0, num_peripheries=0,
+                           run_time=2.0, time_step_length=60)
+    result = compute_metrics(model, auc="exact", chunk_size=16, method="analytic")
+
+    np.testing.assert_allclose(result["AUC"], 3.0 / 2.0 * (1 - np.exp(-0.5 * 2.0)), rtol=1e-10)
+    np.testing.assert_allclose(result["half_life"], np.log(2) * 4.0 / 2.0, rtol=1e-8)
+    assert result["Cmax"] == 0.75 and result["Tmax"] == 0.0
+    assert len(result["troughs"]) == 0
+
+
+def test_exact_auc_with_peripheries_and_infusion():
+    """Test if the exact AUC agrees with a fine trapezoidal AUC for a cyclic infusion into a two-compartment model
+    """
+    model = pk.Intravenous(clearance_rate=1.0, num_peripheries=1, V_p_list=[2.0], Q_p_list=[1.5], dose_on=50,
+                           dose_off=50, time_step_length=1.0)
+    exact = compute_metrics(model, auc="exact", method="analytic")
+    trapezoidal = compute_metrics(model, method="analytic")
+    np.testing.assert_allclose(exact["AUC"], trapezoidal["AUC"], rtol=1e-5)
+
+
+def test_rising_tail_has_no_half_life():
+    """Test if the half-life is NaN while the concentration is still rising
+    """
+    metrics = NCAMetrics(V_c=1.0)
+    metrics.update(np.linspace(0.0, 1.0, 10), np.linspace(0.0, 1.0, 10))
+    assert np.isnan(metrics.result()["half_life"])
+
+
+@pytest.mark.parametrize(
+    "build, error",
+    [
+        (lambda: NCAMetrics(V_c=1.0, tail_points=2), ValueError),
+        (lambda: NCAMetrics(V_c=1.0, tail_points=3.0), TypeError),
+        (lambda: compute_metrics(pk.Intravenous(), auc="log"), ValueError),
+        (lambda: compute_metrics(pk.Intravenous(clearance_rate=0.0), auc="exact"), ValueError),
+        (lambda: compute_metrics(pk.Subcutaneous(absorption_rate=0.0), auc="exact"), ValueError),
+    ]
+)
+def test_reject_invalid_settings(build, error):
+    """Test if invalid metric settings raise the appropriate error
+    """
+    with pytest.raises(error):
+        build()
@@ -11,6 +11,8 @@ import pkmodel as pk
         (0.1, 0.1, 0, 0, 1, 1, [0.1], [0.2], 2, 60),
         (0.1, 0.1, 1, 1, 0.1, 2, [1, 2], [0.2, 0.2], 2, 2),
         (0.1, 0.1, 1, 1, 0.1, 1, [0.1], [2], 1, 1),
+        (0.1, 0.1, 1, 1, 0.1, 3, [0.1, 0.1, 0.1], [0.2, 0.2, 0.2], 1, 1),
+        (0.1, 0.1, 1, 1, 0.1, 40, [0.1] * 40, [0.2] * 40, 1, 1),
     ]
 )
 def test_accept_input(test):
@@ -49,7 +51,6 @@ def test_reject_input_with_type_error(test):
         (0.1, 0.1, 1, 1, 0.1, 1, [0], [-0.2], 1, 1),
         (0.1, 0.1, 1, 1, 0.1, -1, [0.1], [0.2], 1, 1),
         (0.1, 0.1, 1, 1, 0.1, 3, [0.1], [0.2], 1, 1),
-        (0.1, 0.1, 1, 1, 0.1, 3, [0.1, 0.1, 0.1], [0.2, 0.2, 0.2], 1, 1),
         (0.1, 0.1, 1, 1, 0.1, 1, [0.1, 0.1], [0.2], 1, 1),
         (0.1, 0.1, -1, 1, 0.1, 1, [0.1], [0.2], 1.0, 1.0),
         (0.1, 0.1, 1, -1, 0.1, 1, [0.1], [0.2], 1.0, 1.0),
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.compartment import Periphery
+
+
+@pytest.mark.parametrize("model_type", [pk.Intravenous, pk.Subcutaneous])
+def test_params_build_the_same_models(model_type):
+    """Test if the models built from validated columns have the parameters and solutions of models built one by one
+    """
+    records = [{"clearance_rate": 1.0 + i, "dose_on": i, "dose_off": 2, "num_peripheries": 2,
+                "V_p_list": [1.0, 2.0 + i], "Q_p_list": [0.5, 1], "time_step_length": 60} for i in range(3)]
+    params = pk.ModelParams.from_records(model_type, records)
+    assert len(params) == 3
+
+    for model, record in zip(params, records):
+        expected = model_type(**record)
+        assert type(model) is model_type
+        assert model.parameters() == expected.parameters()
+        np.testing.assert_array_equal(model.solve_equations()["Central"], expected.solve_equations()["Central"])
+    assert params[2].parameters() == model_type(**records[2]).parameters()
+
+
+def test_params_broadcast_shared_values():
+    """Test if single values and rows are shared by every model
+    """
+    params = pk.ModelParams(pk.Subcutaneous, clearance_rate=np.linspace(1.0, 2.0, 5), num_peripheries=2,
+                            V_p_list=[1.0, 3.0], absorption_rate=2)
+    models = params.models()
+    assert [model.CL for model in models] == list(np.linspace(1.0, 2.0, 5))
+    assert all(model.V_p_list == [1.0, 3.0] and model.k_a == 2.0 for model in models)
+    assert models[0].dosing_schedule is models[4].dosing_schedule
+
+
+@pytest.mark.parametrize(
+    "arguments, error",
+    [
+        ({"clearance_rate": ["1.0"]}, TypeError),
+        ({"clearance_rate": [1.0, -1.0]}, ValueError),
+        ({"dose_on": [1.5]}, TypeError),
+        ({"dose_off": [0, -1]}, ValueError),
+        ({"num_peripheries": 2, "V_p_list": [1.0]}, ValueError),
+        ({"V_p_list": [[1.0], [0.0]]}, ValueError),
+        ({"time_step_length": [30, 90]}, ValueError),
+        ({"run_time": 0}, ValueError),
+        ({"clearance_rate": [1.0, 2.0], "V_c": [1.0, 2.0, 3.0]}, ValueError),
+    ]
+)
+def test_params_validate_columns(arguments, error):
+    """Test if invalid columns are rejected with the errors of the model constructors
+    """
+    with pytest.raises(error):
+        pk.ModelParams(pk.Intravenous, **arguments)
+
+
+def test_compartments_are_built_on_demand():
+    """Test if the compartment objects are only built when they are read, and are stored in slots
+    """
+    model = pk.ModelParams(pk.Intravenous, V_p_list=[2.0], Q_p_list=[3.0])[0]
+    assert model._compartments is None
+    periphery = model.compartments["Peripheries"][0]
+    assert (periphery.volume, periphery.transition_rate) == (2.0, 3.0)
+    assert not hasattr(periphery, "__dict__") and not hasattr(Periphery(1.0, 1.0), "__dict__")
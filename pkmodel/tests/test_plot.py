@@ -0,0 +1,35 @@
+import os
+import matplotlib.pylab as plt
+import pytest
+import pkmodel as pk
+from pkmodel.main import run_model
+from pkmodel.plot import plot, plot_many
+
+
+def test_headless_plot_leaves_no_open_figures(tmp_path):
+    """Test if a headless plot saves a png without creating pyplot figures
+    """
+    data = pk.Subcutaneous(time_step_length=60).solve_equations()
+    destination = plot(data, str(tmp_path), "headless", headless=True)
+    assert destination == str(tmp_path) + "/subcutaneous_headless.png"
+    assert os.path.exists(destination)
+    assert plt.get_fignums() == []
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_plot_many(tmp_path, max_workers):
+    """Test if many outcomes are rendered to separate files, in order
+    """
+    data = [pk.Intravenous(clearance_rate=rate, time_step_length=60).solve_equations() for rate in [1.0, 2.0, 3.0]]
+    destinations = plot_many(data, str(tmp_path), max_workers=max_workers)
+    assert destinations == [str(tmp_path) + "/intravenous_" + str(i) + ".png" for i in range(3)]
+    assert all(os.path.exists(destination) for destination in destinations)
+
+
+def test_run_model_without_rendering(tmp_path):
+    """Test if run_model returns the results without saving a plot when rendering is skipped
+    """
+    results = run_model("Intravenous", 1.0, 1.0, 0, 0, 1.0, 1, [1.0], [1.0], 1.0, 1.0, 1.0, 60.0,
+                        str(tmp_path / "plots"), "", render=False)
+    assert results["Central"].shape == (60,)
+    assert not os.path.exists(tmp_path / "plots")
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+
+
+def test_intravenous_population_matches_individual_models():
+    """Test if each subject of a population solve equals the analytic solution of its own model
+    """
+    CL, V_c = np.array([0.5, 1.0, 2.0]), np.array([1.0, 2.0, 0.5])
+    V_p, Q_p = np.array([[1.0, 2.0], [0.5, 1.0], [2.0, 2.0]]), np.array([[1.0, 3.0], [0.2, 0.4], [1.0, 1.0]])
+    population = pk.Intravenous.solve_population(CL, V_c, V_p, Q_p, dose_on=2, dose_off=3, time_step_length=30)
+
+    assert population["Central"].shape == (3, 120)
+    assert population["Peripheries"].shape == (3, 2, 120)
+    for i in range(3):
+        model = pk.Intravenous(clearance_rate=CL[i], V_c=V_c[i], num_peripheries=2, V_p_list=list(V_p[i]),
+                               Q_p_list=list(Q_p[i]), dose_on=2, dose_off=3, time_step_length=30)
+        solution = model.solve_equations(method="analytic")
+        np.testing.assert_allclose(population["Central"][i], solution["Central"], atol=1e-12)
+        np.testing.assert_allclose(population["Peripheries"][i], solution["Peripheries"], atol=1e-12)
+
+
+def test_subcutaneous_population_with_defective_subject():
+    """Test if subjects with a defective system matrix are solved alongside diagonalisable ones
+    """
+    population = pk.Subcutaneous.solve_population(CL=[1.0, 2.0], V_c=1.0, k_a=[1.0, 1.0], time_step_length=60)
+    t = population["t"]
+    np.testing.assert_allclose(population["Central"][0], t * np.exp(-t), atol=1e-12)
+    np.testing.assert_allclose(population["Central"][1], np.exp(-t) - np.exp(-2 * t), atol=1e-12)
+
+
+def test_subcutaneous_population_with_per_subject_absorption():
+    """Test if the absorption rates alone can set the number of subjects
+    """
+    population = pk.Subcutaneous.solve_population(CL=1.0, V_c=1.0, k_a=[1.0, 2.0], time_step_length=60)
+    assert population["Central"].shape[0] == 2
+    for i, k_a in enumerate([1.0, 2.0]):
+        model = pk.Subcutaneous(clearance_rate=1.0, absorption_rate=k_a, num_peripheries=0, time_step_length=60)
+        np.testing.assert_allclose(population["Central"][i], model.solve_equations(method="analytic")["Central"],
+                                   atol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "columns, error",
+    [
+        ({"CL": ["1.0"], "V_c": [1.0]}, TypeError),
+        ({"CL": [1.0, -1.0], "V_c": [1.0, 1.0]}, ValueError),
+        ({"CL": [1.0], "V_c": [0.0]}, ValueError),
+        ({"CL": [1.0], "V_c": [1.0], "V_p": [[1.0]], "Q_p": [[1.0, 1.0]]}, ValueError),
+        ({"CL": [1.0, 1.0], "V_c": [1.0, 1.0, 1.0]}, ValueError),
+    ]
+)
+def test_population_rejects_invalid_columns(columns, error):
+    """Test if invalid parameter columns are rejected with the same error types as Model.__init__
+    """
+    with pytest.raises(error):
+        pk.Intravenous.solve_population(**columns)
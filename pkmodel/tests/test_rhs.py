@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        pk.Intravenous(num_peripheries=2, V_p_list=[1.0, 2.0], Q_p_list=[0.5, 3.0], dose_on=1, dose_off=0),
+        pk.Subcutaneous(num_peripheries=1, dose_on=1, dose_off=0),
+        pk.Intravenous(num_peripheries=130, V_p_list=[1.0] * 130, Q_p_list=[0.1] * 130, dose_on=1, dose_off=0),
+    ]
+)
+def test_specialised_rhs_matches_rhs_ode(model):
+    """Test if the specialised right-hand side equals rhs_ode, for single states, stacks of states and
+    preallocated outputs
+    """
+    rng = np.random.default_rng(0)
+    y = rng.random(model.initial_state().shape)
+    rhs = model.make_rhs(model.dosing(0.5))
+    expected = model.rhs_ode(0.5, y)
+    np.testing.assert_allclose(rhs(0.5, y), expected, rtol=1e-12)
+
+    out = np.empty_like(y)
+    assert rhs(0.5, y, out=out) is out
+    np.testing.assert_allclose(out, expected, rtol=1e-12)
+
+    stack = rng.random(y.shape + (4,))
+    columns = np.stack([model.rhs_ode(0.5, stack[:, k]) for k in range(4)], axis=-1)
+    np.testing.assert_allclose(rhs(0.5, stack), columns, rtol=1e-12)
+
+
+def test_rhs_returns_new_arrays():
+    """Test if each call without a preallocated output returns a new array, as solve_ivp keeps the derivatives
+    """
+    rhs = pk.Intravenous().make_rhs(1.0)
+    y = np.ones(2)
+    assert rhs(0.0, y) is not rhs(0.0, y)
@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.scenarios import load_scenarios, run_scenarios, validate_scenarios
+
+
+def test_load_csv_and_json_scenarios(tmp_path):
+    """Test if CSV and JSON scenario files give the same validated scenarios, with CSV strings converted
+    """
+    scenarios = [{"model_type": "Intravenous", "clearance": 2.0, "n_peripheries": 2,
+                  "V_peripheries": [1.0, 2.0], "Q_peripheries": [0.5, 1.0]},
+                 {"model_type": "Subcutaneous", "n_peripheries": 0, "title": "sc"}]
+    (tmp_path / "s.json").write_text(json.dumps(scenarios))
+    (tmp_path / "s.csv").write_text("model_type,clearance,n_peripheries,V_peripheries,Q_peripheries,title\n"
+                                    + 'Intravenous,2,2,"[1.0, 2.0]","[0.5, 1.0]",\n'
+                                    + "Subcutaneous,,0,,,sc\n")
+
+    from_json = validate_scenarios(load_scenarios(str(tmp_path / "s.json")))
+    from_csv = validate_scenarios(load_scenarios(str(tmp_path / "s.csv")))
+    assert from_json == from_csv
+    assert from_csv[0]["clearance"] == 2.0 and from_csv[0]["n_peripheries"] == 2
+    assert from_csv[0]["title"] == "scenario_0" and from_csv[1]["title"] == "sc"
+
+
+def test_validation_reports_every_problem():
+    """Test if validation reports the problems of all scenarios together, before running any of them
+    """
+    scenarios = [{"model_type": "Oral"}, {"clearance": "fast"}, {"colour": "red"},
+                 {"model_type": "Intravenous", "V_central": -1.0}, {"model_type": "Intravenous"}]
+    with pytest.raises(ValueError) as error:
+        validate_scenarios(scenarios)
+    message = str(error.value)
+    assert all("Scenario {}".format(i) in message for i in range(4))
+    assert "Scenario 4" not in message
+
+    assert validate_scenarios([{"clearance": "3"}], {"model_type": "Intravenous"})[0]["clearance"] == 3.0
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_run_scenarios_writes_one_results_file(tmp_path, max_workers):
+    """Test if a batch run writes the solutions of every scenario, in order, to one file
+    """
+    scenarios = validate_scenarios([{"model_type": "Intravenous", "time_step": 60},
+                                    {"model_type": "Subcutaneous", "clearance": 2.0, "time_step": 60,
+                                     "n_peripheries": 0}])
+    failures = run_scenarios(scenarios, str(tmp_path / "results.csv"), max_workers=max_workers, chunksize=1)
+    assert failures == {}
+
+    table = np.genfromtxt(tmp_path / "results.csv", delimiter=",", names=True)
+    expected = pk.Subcutaneous(clearance_rate=2.0, num_peripheries=0, time_step_length=60).solve_equations()
+    rows = table["scenario"] == 1
+    np.testing.assert_allclose(table["Central"][rows], expected["Central"], rtol=1e-9)
+    np.testing.assert_allclose(table["Dose"][rows], expected["Dose"], rtol=1e-9)
+    assert np.all(np.isnan(table["Dose"][table["scenario"] == 0]))
+
+    run_scenarios(scenarios, str(tmp_path / "results.npz"), max_workers=max_workers)
+    with np.load(tmp_path / "results.npz") as results:
+        np.testing.assert_array_equal(results["1/Central"], expected["Central"])
+        assert json.loads(str(results["scenarios"])) == scenarios
+
+
+def test_unwritable_plot_folder_fails_only_its_scenarios(tmp_path):
+    """Test if a scenario whose plot cannot be written is reported as failed, and the batch still writes its results
+    """
+    (tmp_path / "file").write_text("")
+    scenarios = validate_scenarios([{"model_type": "Intravenous", "time_step": 60}])
+    failures = run_scenarios(scenarios, str(tmp_path / "results.csv"), plot_folder=str(tmp_path / "file" / "plots"),
+                             max_workers=1)
+    assert list(failures) == [0] and "Error" in failures[0]
+    assert (tmp_path / "results.csv").exists()
+
+
+def test_command_line_batch_with_spawned_workers(tmp_path):
+    """Test if simulation.py runs a batch in worker processes started with spawn, which re-import the script
+    """
+    (tmp_path / "sitecustomize.py").write_text("import multiprocessing\nmultiprocessing.set_start_method('spawn')\n")
+    (tmp_path / "s.json").write_text(json.dumps([{"model_type": "Intravenous", "clearance": 1.0},
+                                                 {"model_type": "Subcutaneous", "clearance": 2.0}]))
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), root]))
+    script = os.path.join(root, "pkmodel", "simulation.py")
+    subprocess.run([sys.executable, script, "--scenarios=" + str(tmp_path / "s.json"),
+                    "--output=" + str(tmp_path / "out.csv"), "--workers=2", "--no-plot", "-t", "60"],
+                   check=True, capture_output=True, env=environment, timeout=120)
+    assert (tmp_path / "out.csv").exists()
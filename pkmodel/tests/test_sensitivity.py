@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.sensitivity import SensitivityAnalysis
+
+
+def linear_output(solution, parameters):
+    return parameters["CL"] + 2.0 * parameters["Q_p"][:, 0]
+
+
+def test_indices_of_linear_output():
+    """Test if the Sobol and Morris indices of an additive output match their exact values
+    """
+    model = pk.Intravenous(num_peripheries=1, time_step_length=60)
+    analysis = SensitivityAnalysis(model, {"CL": (1.0, 2.0), "Q_p_1": (1.0, 2.0), "V_c": (1.0, 2.0)},
+                                   output=linear_output)
+
+    sobol = analysis.sobol(num_samples=1024, seed=1)
+    assert sobol["names"] == ["CL", "Q_p_1", "V_c"]
+    np.testing.assert_allclose(sobol["S1"], [0.2, 0.8, 0.0], atol=0.02)
+    np.testing.assert_allclose(sobol["ST"], [0.2, 0.8, 0.0], atol=0.02)
+    assert np.all(sobol["S1_conf"][:, 0] <= sobol["S1_conf"][:, 1])
+
+    morris = analysis.morris(num_trajectories=10, seed=1)
+    np.testing.assert_allclose(morris["mu_star"], [1.0, 2.0, 0.0], atol=1e-12)
+    np.testing.assert_allclose(morris["sigma"], [0.0, 0.0, 0.0], atol=1e-12)
+
+
+def test_clearance_drives_exposure():
+    """Test if the clearance rate is ranked above the absorption rate for the AUC of a long Subcutaneous run
+    """
+    model = pk.Subcutaneous(num_peripheries=0, run_time=10.0, time_step_length=60)
+    analysis = SensitivityAnalysis(model, {"CL": (0.5, 2.0), "k_a": (2.0, 4.0)})
+    sobol = analysis.sobol(num_samples=256, num_bootstrap=20, seed=0)
+    assert sobol["ST"][0] > 0.9 and sobol["ST"][1] < 0.1
+
+
+def test_evaluations_are_cached():
+    """Test if repeating an analysis reuses every cached evaluation
+    """
+    model = pk.Intravenous(num_peripheries=0, time_step_length=60)
+    analysis = SensitivityAnalysis(model, {"CL": (1.0, 2.0), "V_c": (1.0, 2.0)})
+    first = analysis.morris(num_trajectories=8, seed=3)
+    misses = analysis.stats["misses"]
+
+    second = analysis.morris(num_trajectories=8, seed=3)
+    assert analysis.stats["misses"] == misses
+    assert analysis.stats["hits"] >= 8 * 3
+    np.testing.assert_array_equal(first["mu_star"], second["mu_star"])
+
+
+@pytest.mark.parametrize(
+    "model, bounds",
+    [
+        (pk.Intravenous(), {"k_a": (1.0, 2.0)}),
+        (pk.Intravenous(num_peripheries=1), {"V_p_2": (1.0, 2.0)}),
+        (pk.Intravenous(), {"CL": (2.0, 1.0)}),
+        (pk.Intravenous(), {}),
+    ]
+)
+def test_reject_invalid_bounds(model, bounds):
+    """Test if unknown parameters and empty ranges raise a ValueError
+    """
+    with pytest.raises(ValueError):
+        SensitivityAnalysis(model, bounds)
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import numpy as np
+from pkmodel import Intravenous, Subcutaneous
+from pkmodel.main import run_model
+from pkmodel.service import SimulationClient, SimulationService, solve_batch
+from pkmodel.scenarios import validate_scenarios
+
+
+def request(**parameters):
+    return dict({"model_type": "Intravenous", "dose_rate": 2.0, "dose_on": 600, "dose_off": 1800, "run_time": 2.0,
+                 "time_step": 10.0, "n_peripheries": 1}, **parameters)
+
+
+async def serve(requests, **options):
+    """Starts a service on a Unix socket, sends the requests concurrently from one client and returns the
+    solutions, or the exceptions raised, with the service
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        async with SimulationService(**options) as service:
+            await service.start(path=os.path.join(folder, "pkmodel.sock"))
+            client = await SimulationClient.connect(service.address)
+            try:
+                results = await asyncio.gather(*(client.simulate(parameters) for parameters in requests),
+                                               return_exceptions=True)
+            finally:
+                await client.close()
+    return results, service
+
+
+class ServiceTest(unittest.TestCase):
+    """
+    Tests the :class:`SimulationService` and :class:`SimulationClient`.
+    """
+
+    def test_concurrent_requests_are_batched(self):
+        requests = [request(clearance=0.5 + 0.1 * i, V_central=1.0 + i) for i in range(12)]
+        requests.append(request(model_type="Subcutaneous", drug_absorption=2.0))
+        results, service = asyncio.run(serve(requests, window=0.05, max_workers=1, chunk_size=100))
+
+        batch_sizes = [metrics["batch_size"] for metrics in service.metrics]
+        self.assertEqual(sorted(batch_sizes), [1] + [12] * 12)
+        for parameters, result in zip(requests, results):
+            model_type = Subcutaneous if parameters["model_type"] == "Subcutaneous" else Intravenous
+            extra = {"k_a": [parameters["drug_absorption"]]} if model_type is Subcutaneous else {}
+            expected = model_type.solve_population(
+                CL=[parameters.get("clearance", 1.0)], V_c=[parameters.get("V_central", 1.0)], V_p=[[1.0]],
+                Q_p=[[1.0]], dose_per_time_step=2.0, dose_on=600, dose_off=1800, run_time=2.0,
+                time_step_length=10.0, **extra
+            )
+            self.assertEqual(set(result), set(expected))
+            for key in expected:
+                np.testing.assert_allclose(result[key], expected[key][0] if key != "t" else expected[key])
+
+        summary = service.latency_summary()
+        self.assertEqual(summary["count"], len(requests))
+        self.assertTrue(0 < summary["p50"] <= summary["p95"] <= summary["max"])
+
+    def test_matches_run_model(self):
+        # The service solves exactly, while run_model integrates with RK45 to its default tolerances
+        parameters = request(n_peripheries=2, V_peripheries=[2.0, 3.0], Q_peripheries=[0.5, 1.5])
+        results, _ = asyncio.run(serve([parameters], window=0, max_workers=1))
+        scenario = validate_scenarios([parameters])[0]
+        del scenario["title"]
+        expected = run_model(**scenario, plot_folder="", title="", render=False)
+        self.assertEqual(set(results[0]), set(expected))
+        for key in expected:
+            np.testing.assert_allclose(results[0][key], expected[key], rtol=1e-3, atol=1e-3)
+
+    def test_invalid_request_is_rejected(self):
+        results, service = asyncio.run(serve([request(clearance=-1.0), request(foo=1), request()], max_workers=1))
+        self.assertIsInstance(results[0], ValueError)
+        self.assertIn("negative", str(results[0]))
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIn("unknown parameters foo", str(results[1]))
+        self.assertIsInstance(results[2], dict)
+        self.assertEqual(len(service.metrics), 1)
+
+    def test_backpressure(self):
+        # With one pending slot and batches of one, every request still completes
+        requests = [request(clearance=0.1 * (i + 1)) for i in range(8)]
+        results, service = asyncio.run(serve(requests, window=0, max_batch=1, max_pending=1, max_workers=1))
+        self.assertTrue(all(isinstance(result, dict) for result in results))
+        self.assertEqual([metrics["batch_size"] for metrics in service.metrics], [1] * 8)
+
+    def test_process_pool_over_tcp(self):
+        async def run():
+            async with SimulationService(window=0.02, max_workers=2) as service:
+                await service.start(port=0)
+                client = await SimulationClient.connect(service.address)
+                blocks = [block async for block in client.stream(request(time_step=1.0))]
+                await client.close()
+            return blocks, client.last_metrics
+        blocks, metrics = asyncio.run(run())
+        self.assertEqual(sum(len(block["t"]) for block in blocks), 7200)
+        self.assertEqual(len(blocks), 2)
+        self.assertGreaterEqual(metrics["latency"], metrics["solve_time"])
+
+    def test_solve_batch(self):
+        scenarios = validate_scenarios([request(model_type="Subcutaneous", clearance=c, drug_absorption=k)
+                                        for c, k in [(0.5, 1.0), (1.5, 3.0)]])
+        solutions = solve_batch(scenarios)
+        for scenario, solution in zip(scenarios, solutions):
+            model = Subcutaneous(scenario["clearance"], 2.0, 600, 1800, 1.0, 1, [1.0], [1.0], 1.0,
+                                 scenario["drug_absorption"], 2.0, 10.0)
+            expected = model.solve_equations("analytic")
+            for key in expected:
+                np.testing.assert_allclose(solution[key], expected[key], rtol=1e-9, atol=1e-12)
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            SimulationService(window=-1)
+        with self.assertRaises(ValueError):
+            SimulationService(max_batch=0)
+
+    def test_waiting_requests_fail_when_the_connection_closes(self):
+        async def run():
+            # A server which reads requests but never answers, and then hangs up
+            async def handle(reader, writer):
+                await reader.readline()
+                writer.close()
+
+            server = await asyncio.start_server(handle, host="127.0.0.1", port=0)
+            client = await SimulationClient.connect(server.sockets[0].getsockname()[:2])
+            self.assertIsNone(client.last_metrics)
+            pending = asyncio.ensure_future(client.simulate(request()))
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(pending, timeout=5)
+            with self.assertRaises(ConnectionError):
+                await client.simulate(request())
+            await client.close()
+            server.close()
+            await server.wait_closed()
+        asyncio.run(run())
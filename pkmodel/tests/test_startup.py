@@ -0,0 +1,12 @@
+import subprocess
+import sys
+import pytest
+
+
+@pytest.mark.parametrize("module", ["pkmodel", "pkmodel.main", "pkmodel.sweep", "pkmodel.scenarios"])
+def test_import_does_not_load_heavy_dependencies(module):
+    """Test if importing the library leaves matplotlib and scipy.integrate to be loaded when they are needed
+    """
+    code = "import sys, {}; print([m for m in ('matplotlib', 'scipy.integrate') if m in sys.modules])".format(module)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    assert output.stdout.strip() == "[]"
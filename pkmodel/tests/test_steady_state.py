@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.steady_state import periodic_steady_state, state_after_cycles, steady_state_cycle, superpose
+
+
+def test_repeated_bolus_accumulates_geometrically():
+    """Test if the state after n cycles of a bolus, and its limit, match the geometric series of one compartment
+    """
+    schedule = pk.DosingSchedule([pk.Bolus(0.0, 2.0)], period=0.5)
+    model = pk.Intravenous(clearance_rate=3.0, num_peripheries=0, dosing_schedule=schedule)
+    decay = np.exp(-3.0 * 0.5)
+
+    for n in [0, 1, 4, 30]:
+        expected = 2.0 * sum(decay ** (n - j) for j in range(n))
+        np.testing.assert_allclose(state_after_cycles(model, n), [expected], rtol=1e-10, atol=1e-15)
+    np.testing.assert_allclose(periodic_steady_state(model), [2.0 * decay / (1 - decay)], rtol=1e-10)
+
+
+@pytest.mark.parametrize("model_type", [pk.Intravenous, pk.Subcutaneous])
+def test_steady_state_matches_long_run(model_type):
+    """Test if the periodic steady state of a cyclic infusion matches a long run of the analytic solver
+    """
+    schedule = pk.DosingSchedule([pk.Infusion(0.0, 0.25, 4.0)], period=1.0)
+    model = model_type(clearance_rate=1.5, V_c=2.0, num_peripheries=2, V_p_list=[1.0, 3.0],
+                       Q_p_list=[2.0, 0.5], dosing_schedule=schedule)
+    long_run = model.integrate(np.arange(0.0, 200.5, 0.5), model.initial_state(), method="analytic")
+
+    np.testing.assert_allclose(state_after_cycles(model, 7), long_run[:, 14], rtol=1e-8)
+    np.testing.assert_allclose(periodic_steady_state(model), long_run[:, -1], rtol=1e-6)
+
+    cycle = steady_state_cycle(model, np.array([0.0, 0.5, 1.0]))
+    last_cycle = model.solution_dict(np.array([0.0, 0.5, 1.0]), long_run[:, -3:])
+    np.testing.assert_allclose(cycle["Central"], last_cycle["Central"], rtol=1e-6)
+
+
+def test_constant_infusion_steady_state():
+    """Test if an infusion which never stops reaches the steady state rate * V_c / CL in the central compartment
+    """
+    model = pk.Intravenous(clearance_rate=2.0, dose_per_time_step=3.0, V_c=5.0, num_peripheries=1,
+                           V_p_list=[1.0], Q_p_list=[1.0], dose_on=1, dose_off=0)
+    np.testing.assert_allclose(periodic_steady_state(model), [7.5, 1.5], rtol=1e-10)
+
+
+def test_superposition_matches_schedule():
+    """Test if superposing single-dose responses gives the solution of the same train of boluses
+    """
+    doses = [pk.Bolus(0.0, 1.0), pk.Bolus(0.3, 2.5), pk.Bolus(0.7, 0.5)]
+    model = pk.Subcutaneous(clearance_rate=2.0, num_peripheries=1, V_p_list=[2.0], Q_p_list=[1.0],
+                            dosing_schedule=pk.DosingSchedule(doses))
+    t = np.linspace(0.0, 1.0, 101)
+
+    expected = model.solution_dict(t, model.integrate(t, model.initial_state(), method="analytic"))
+    superposed = superpose(model, doses, t)
+    for key in ["Dose", "Central", "Peripheries"]:
+        np.testing.assert_allclose(superposed[key], expected[key], rtol=1e-10, atol=1e-14)
+
+
+@pytest.mark.parametrize(
+    "schedule, clearance_rate",
+    [
+        (pk.DosingSchedule([pk.Bolus(0.0, 1.0)]), 1.0),
+        (pk.DosingSchedule([pk.Infusion(0.0, 0.5, 1.0)]), 1.0),
+        (pk.DosingSchedule([pk.Bolus(0.0, 1.0)], period=1.0), 0.0),
+        (pk.DosingSchedule([pk.Bolus(0.0, 1.0)], period=1.0, num_cycles=3), 1.0),
+    ]
+)
+def test_reject_no_steady_state(schedule, clearance_rate):
+    """Test if schedules that are not periodic or stop repeating, and models without elimination, raise a ValueError
+    """
+    model = pk.Intravenous(clearance_rate=clearance_rate, num_peripheries=1, V_p_list=[1.0], Q_p_list=[1.0],
+                           dosing_schedule=schedule)
+    with pytest.raises(ValueError):
+        periodic_steady_state(model)
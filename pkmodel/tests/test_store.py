@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.store import ResultStore
+
+
+@pytest.mark.parametrize("model_type", [pk.Intravenous, pk.Subcutaneous])
+def test_round_trip(tmp_path, model_type):
+    """Test if a stored solution is read back, memory-mapped and read-only, after reopening the store
+    """
+    model = model_type(num_peripheries=2, V_p_list=[1.0, 2.0], Q_p_list=[1.0, 0.5], time_step_length=60)
+    solution = model.solve_equations(method="analytic")
+    ResultStore(str(tmp_path)).append(solution, metadata=model.parameters())
+
+    store = ResultStore(str(tmp_path))
+    assert len(store) == 1
+    assert store.metadata(0) == model.parameters()
+    for key, value in store[0].items():
+        assert isinstance(value.base, np.memmap) or isinstance(value, np.memmap)
+        assert not value.flags.writeable
+        np.testing.assert_array_equal(value, solution[key])
+
+
+def test_round_trip_without_peripheries(tmp_path):
+    """Test if a solution with an empty Peripheries column is read back
+    """
+    solution = pk.Intravenous(num_peripheries=0, time_step_length=60).solve_equations(method="analytic")
+    ResultStore(str(tmp_path)).append(solution)
+
+    stored = ResultStore(str(tmp_path))[0]
+    assert stored["Peripheries"].shape == solution["Peripheries"].shape == (0, 60)
+    assert not stored["Peripheries"].flags.writeable
+    np.testing.assert_array_equal(stored["Central"], solution["Central"])
+
+
+def test_float32_and_streamed_blocks(tmp_path):
+    """Test if blocks from iter_solution are appended as one row group, with float32 amounts and float64 times
+    """
+    model = pk.Intravenous(num_peripheries=1, time_step_length=36, dose_on=2, dose_off=3)
+    store = ResultStore(str(tmp_path), dtype="float32")
+    store.append(model.solve_equations(method="analytic"))
+    index = store.append(model.iter_solution(chunk_size=7, method="analytic"))
+
+    assert index == 1
+    first, second = store[0], store[1]
+    assert second["t"].dtype == np.float64 and second["Central"].dtype == np.float32
+    assert second["Peripheries"].shape == (1, 100)
+    for key in first:
+        np.testing.assert_array_equal(first[key], second[key])
+
+
+def test_reject_invalid_dtype(tmp_path):
+    """Test if a dtype other than float64 or float32 raises a ValueError
+    """
+    with pytest.raises(ValueError):
+        ResultStore(str(tmp_path), dtype="int32")
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.sweep import parameter_grid, run_sweep
+
+
+def test_parameter_grid():
+    """Test if the grid contains every combination, with the last argument varying fastest
+    """
+    grid = parameter_grid(clearance_rate=[1.0, 2.0], V_c=[1.0, 2.0, 3.0])
+    assert len(grid) == 6
+    assert grid[0] == {"clearance_rate": 1.0, "V_c": 1.0}
+    assert grid[1] == {"clearance_rate": 1.0, "V_c": 2.0}
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_sweep_stacks_solutions_and_records_errors(max_workers):
+    """Test if a sweep stacks the solutions in order, and records invalid parameter sets without failing
+    """
+    parameters = [{"clearance_rate": 1.0, "time_step_length": 60},
+                  {"clearance_rate": -1.0, "time_step_length": 60},
+                  {"clearance_rate": 2.0, "time_step_length": 60}]
+    progress = []
+    result = run_sweep("Intravenous", parameters, method="analytic", max_workers=max_workers, chunksize=1,
+                       progress=lambda done, total: progress.append((done, total)))
+
+    assert result["Central"].shape == (3, 60)
+    assert result["Peripheries"].shape == (3, 1, 60)
+    np.testing.assert_array_equal(result.succeeded, [True, False, True])
+    assert list(result.errors) == [1]
+    assert np.all(np.isnan(result["Central"][1]))
+    expected = pk.Intravenous(clearance_rate=2.0, time_step_length=60).solve_equations(method="analytic")
+    np.testing.assert_allclose(result["Central"][2], expected["Central"])
+    if max_workers == 1:
+        assert progress == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_sweep_rejects_unknown_model_type():
+    """Test if an unknown model type is rejected before any work is submitted
+    """
+    with pytest.raises(ValueError):
+        run_sweep("Oral", [{}])
+
+
+def test_sweep_rejects_different_time_grids():
+    """Test if solutions with the same number of time steps but different grids are not stacked under one t
+    """
+    with pytest.raises(ValueError):
+        run_sweep("Intravenous", [{"run_time": 1.0, "time_step_length": 60},
+                                  {"run_time": 0.5, "time_step_length": 30}], method="analytic", max_workers=1)
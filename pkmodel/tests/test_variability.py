@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import pkmodel as pk
+from pkmodel.variability import simulate_variability
+
+
+def test_bands_match_log_normal_clearance():
+    """Test if the bands of a one-compartment bolus follow the percentiles of a log-normal clearance rate, as the
+    concentration decreases monotonically with the clearance rate
+    """
+    model = pk.Intravenous(clearance_rate=2.0, V_c=1.5, num_peripheries=0, time_step_length=60)
+    result = simulate_variability(model, {"CL": 0.3}, num_draws=20000, seed=0)
+
+    t = result["t"]
+    z = np.array([1.6449, 0.0, -1.6449])
+    expected = np.exp(-2.0 * np.exp(0.3 * z)[:, None] * t / 1.5) / 1.5
+    np.testing.assert_allclose(result["bands"], expected, rtol=0.02)
+    assert result["bands"].shape == (3, len(t)) and result["num_draws"] == 20000
+
+
+def test_bands_do_not_depend_on_workers():
+    """Test if the same seed gives the same bands for any number of worker processes
+    """
+    model = pk.Subcutaneous(num_peripheries=1, dose_on=50, dose_off=50, time_step_length=60)
+    omega = {"CL": 0.3, "V_c": 0.2, "k_a": 0.5}
+    correlation = [[1.0, 0.6, 0.0], [0.6, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    serial = simulate_variability(model, omega, correlation, num_draws=1000, chunk_size=100, seed=5)
+    parallel = simulate_variability(model, omega, correlation, num_draws=1000, chunk_size=100, seed=5,
+                                    max_workers=2)
+    np.testing.assert_array_equal(serial["bands"], parallel["bands"])
+    assert np.all(np.diff(serial["bands"], axis=0) >= 0)
+
+
+def test_no_variability_gives_typical_concentration():
+    """Test if every band equals the template solution when the parameters do not vary
+    """
+    model = pk.Intravenous(num_peripheries=1, dose_on=20, dose_off=40, time_step_length=60)
+    result = simulate_variability(model, {"CL": 0.0}, num_draws=50, seed=1)
+    expected = model.solve_equations(method="analytic")["Central"] / model.V_c
+    np.testing.assert_allclose(result["bands"], np.tile(expected, (3, 1)), rtol=1e-12, atol=1e-15)
+
+
+@pytest.mark.parametrize(
+    "omega, correlation",
+    [
+        ({"k_a": 0.1}, None),
+        ({"CL": -0.1}, None),
+        ({"CL": 0.1, "V_c": 0.1}, [[1.0, 0.5], [0.4, 1.0]]),
+        ({"CL": 0.1, "V_c": 0.1}, [[1.0, 1.5], [1.5, 1.0]]),
+    ]
+)
+def test_invalid_variability(omega, correlation):
+    """Test if unknown parameters, negative deviations and invalid correlation matrices are rejected
+    """
+    with pytest.raises(ValueError):
+        simulate_variability(pk.Intravenous(time_step_length=60), omega, correlation, num_draws=10)
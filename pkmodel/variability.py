@@ -0,0 +1,204 @@
+#
+# Monte Carlo inter-individual variability
+#
+import concurrent.futures
+import os
+import numpy as np
+from pkmodel.model import Model
+from pkmodel.sensitivity import parameter_names, population_parameters
+
+
+def simulate_variability(model: Model, omega: dict, correlation: np.ndarray = None, num_draws: int = 1000,
+                         percentiles=(5, 50, 95), num_bins: int = 512, chunk_size: int = 1024,
+                         max_workers: int = 1, seed: int = None) -> dict:
+    """Percentile bands of the central concentration over a population with log-normal inter-individual
+    variability, as for a visual predictive check
+
+    Each subject has the parameters theta_i = theta exp(eta_i) of the template model, where eta_i is normal with
+    mean zero, standard deviations `omega` and the given correlation matrix. The draws are simulated in blocks of
+    `chunk_size` subjects with `solve_population`, and each block is reduced into a histogram of log-concentration
+    at every time step before the next is drawn, so memory does not grow with the number of draws. The bins are
+    placed from the first block. The percentiles are interpolated within the bins, so their accuracy is about
+    the width of a bin.
+
+    Every block draws from its own stream, spawned with `numpy.random.SeedSequence`, and the histograms are sums of
+    integer counts, so the bands are the same for any number of workers.
+
+    :param model: The template model, whose type, dosing, time settings and typical parameter values are used
+    :param omega: A dictionary from each varied parameter name to the standard deviation of its logarithm. The names
+    are those of `parameter_names`, "CL", "V_c", "V_p_1", "Q_p_1", ..., and "k_a" for the Subcutaneous model
+    :param correlation: The correlation matrix of the log-parameters, in the order of `omega`. Defaults to None,
+    which means they are independent
+    :param num_draws: The number of subjects drawn
+    :param percentiles: The percentiles (0 to 100) of the bands
+    :param num_bins: The number of histogram bins at each time step
+    :param chunk_size: The number of subjects drawn and solved together, which bounds the memory
+    :param max_workers: The number of worker processes. With 1, the default, the blocks run in the current process,
+    and None uses one per CPU
+    :param seed: The seed of the `SeedSequence` from which the stream of each block is spawned
+    :return: A dictionary with the time steps "t", the "percentiles", the concentration "bands" of shape
+    (len(percentiles), T), one row per percentile, and "num_draws"
+    """
+    allowed = parameter_names(model)
+    if len(omega) == 0 or any(name not in allowed for name in omega):
+        raise ValueError("Parameters to vary must be chosen from " + ", ".join(allowed))
+    scale = np.array(list(omega.values()), dtype=float)
+    if np.any(scale < 0) or not np.all(np.isfinite(scale)):
+        raise ValueError("The standard deviations of the log-parameters must be non-negative")
+    d = len(scale)
+    correlation = np.eye(d) if correlation is None else np.asarray(correlation, dtype=float)
+    if correlation.shape != (d, d) or not np.allclose(correlation, correlation.T) \
+            or not np.allclose(np.diag(correlation), 1.0):
+        raise ValueError("The correlation matrix must be symmetric with a unit diagonal, and one row per parameter")
+    try:
+        cholesky = scale[:, None] * np.linalg.cholesky(correlation)
+    except np.linalg.LinAlgError:
+        raise ValueError("The correlation matrix must be positive definite")
+    if num_draws < 1 or chunk_size < 1 or num_bins < 1:
+        raise ValueError("num_draws, chunk_size and num_bins must be positive")
+    percentiles = np.asarray(percentiles, dtype=float)
+    if np.any(percentiles < 0) or np.any(percentiles > 100):
+        raise ValueError("Percentiles must be between 0 and 100")
+
+    names = list(omega)
+    typical = np.array([_typical_value(model, name) for name in names])
+    sizes = [min(chunk_size, num_draws - lo) for lo in range(0, num_draws, chunk_size)]
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    sample = (model, names, typical, cholesky)
+
+    # The first block places the bins, and is then counted like the others
+    t, first = _simulate_block(*sample, sizes[0], streams[0])
+    histogram = _Histogram(first, num_bins)
+    histogram.add(first)
+
+    blocks = list(zip(sizes[1:], streams[1:]))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers == 1 or len(blocks) == 0:
+        for size, stream in blocks:
+            histogram.add(_simulate_block(*sample, size, stream)[1])
+    else:
+        chunks = [blocks[i::max_workers] for i in range(max_workers)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_count_blocks, sample, chunk, histogram.empty()) for chunk in chunks if chunk]
+            for future in concurrent.futures.as_completed(futures):
+                histogram.merge(future.result())
+
+    return {"t": t, "percentiles": percentiles, "bands": histogram.percentiles(percentiles), "num_draws": num_draws}
+
+
+def _typical_value(model: Model, name: str) -> float:
+    """The value of a named parameter in the template model
+    """
+    if name[:3] in ("V_p", "Q_p"):
+        values = model.V_p_list if name[:3] == "V_p" else model.Q_p_list
+        return float(values[int(name[4:]) - 1])
+    return float(getattr(model, name))
+
+
+def _simulate_block(model: Model, names: list[str], typical: np.ndarray, cholesky: np.ndarray, size: int,
+                    stream: np.random.SeedSequence) -> tuple[np.ndarray, np.ndarray]:
+    """Draws and solves one block of subjects
+
+    :return: The time steps, and the central concentrations of shape (size, T)
+    """
+    eta = np.random.default_rng(stream).standard_normal((size, len(names))) @ cholesky.T
+    parameters = population_parameters(model, names, typical * np.exp(eta))
+    solution = type(model).solve_population(
+        **parameters, run_time=model.run_time, time_step_length=model.time_step_length,
+        dosing_schedule=model.dosing_schedule, chunk_size=size
+    )
+    return solution["t"], solution["Central"] / parameters["V_c"][:, None]
+
+
+def _count_blocks(sample: tuple, blocks: list, histogram: "_Histogram") -> "_Histogram":
+    """Simulates blocks in a worker process and counts them into an empty histogram
+    """
+    for size, stream in blocks:
+        histogram.add(_simulate_block(*sample, size, stream)[1])
+    return histogram
+
+
+class _Histogram:
+    """Counts of log-concentration in fixed bins at each time step, with the smallest and largest values. Values
+    outside the bins, including zeros, are counted in an underflow and an overflow bin
+    """
+
+    def __init__(self, pilot: np.ndarray, num_bins: int):
+        """
+        :param pilot: Concentrations of shape (N, T) from which the bins are placed, widened by half their range
+        on each side
+        :param num_bins: The number of bins at each time step
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            logs = np.log(pilot)
+        positive = pilot > 0
+        lower = np.where(positive, logs, np.inf).min(axis=0)
+        upper = np.where(positive, logs, -np.inf).max(axis=0)
+        empty = ~np.isfinite(lower)
+        lower[empty], upper[empty] = 0.0, 0.0
+        margin = 0.5 * (upper - lower) + 0.1
+
+        T = pilot.shape[1]
+        self.num_bins = num_bins
+        self.lower = lower - margin
+        self.width = (upper - lower + 2 * margin) / num_bins
+        self.counts = np.zeros((T, num_bins + 2), dtype=np.int64)
+        self.minimum = np.full(T, np.inf)
+        self.maximum = np.full(T, -np.inf)
+
+    def empty(self) -> "_Histogram":
+        """A histogram with the same bins and no counts
+        """
+        histogram = object.__new__(_Histogram)
+        histogram.__dict__.update(self.__dict__)
+        histogram.counts = np.zeros_like(self.counts)
+        histogram.minimum = np.full_like(self.minimum, np.inf)
+        histogram.maximum = np.full_like(self.maximum, -np.inf)
+        return histogram
+
+    def add(self, c: np.ndarray) -> None:
+        """Counts the concentrations c of shape (N, T)
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            index = np.floor((np.log(c) - self.lower) / self.width) + 1
+        index = np.nan_to_num(index, nan=0, posinf=self.num_bins + 1, neginf=0)
+        index = np.clip(index, 0, self.num_bins + 1).astype(np.intp)
+        T = c.shape[1]
+        flat = (index + (self.num_bins + 2) * np.arange(T)).ravel()
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        np.minimum(self.minimum, c.min(axis=0), out=self.minimum)
+        np.maximum(self.maximum, c.max(axis=0), out=self.maximum)
+
+    def merge(self, other: "_Histogram") -> None:
+        """Adds the counts of a histogram with the same bins
+        """
+        self.counts += other.counts
+        np.minimum(self.minimum, other.minimum, out=self.minimum)
+        np.maximum(self.maximum, other.maximum, out=self.maximum)
+
+    def percentiles(self, percentiles: np.ndarray) -> np.ndarray:
+        """The percentiles of the counted values at each time step, interpolated within their bins
+
+        :return: A numpy array of shape (len(percentiles), T)
+        """
+        N = self.counts[0].sum()
+        cumulative = np.cumsum(self.counts, axis=1)
+        rows = np.arange(len(self.counts))
+        bands = np.empty((len(percentiles), len(self.counts)))
+        for k, percentile in enumerate(percentiles):
+            # The rank of the percentile among the N values, from 1 to N
+            rank = 1 + percentile / 100 * (N - 1)
+            index = np.argmax(cumulative >= rank - 1e-9, axis=1)
+            count = self.counts[rows, index]
+            fraction = (rank - (cumulative[rows, index] - count)) / np.maximum(count, 1)
+
+            edge = self.lower + (index - 1) * self.width
+            value = np.exp(edge + fraction * self.width)
+            # The underflow and overflow bins are interpolated linearly out to the smallest and largest values
+            below = np.minimum(np.exp(self.lower), self.maximum)
+            above = np.maximum(np.exp(self.lower + self.num_bins * self.width), self.minimum)
+            value = np.where(index == 0, self.minimum + fraction * (below - self.minimum), value)
+            value = np.where(index == self.num_bins + 1, above + fraction * (self.maximum - above), value)
+            bands[k] = np.clip(value, self.minimum, self.maximum)
+        return bands